@@ -4,29 +4,59 @@ En FastAPI, una "dependencia" es una funcion que le entrega algo a un endpoint.
 En vez de que cada endpoint busque el pipeline por su cuenta, esta funcion se lo da.
 """
 
-from typing import Generator
+import secrets
+from typing import Optional
 
+from fastapi import Header, HTTPException
+from starlette.requests import HTTPConnection
+
+from app.config import settings
 from app.core import get_logger
 from app.ml import SentimentPipeline, sentiment_pipeline
 
 logger = get_logger(__name__)
 
 
-def get_sentiment_pipeline() -> Generator[SentimentPipeline, None, None]:
+async def get_sentiment_pipeline() -> SentimentPipeline:
     """
     Dependency que provee el pipeline de sentimientos.
     FastAPI llama a esta funcion ANTES de ejecutar el endpoint,
     y le pasa el resultado (sentiment_pipeline) como parametro.
 
+    Es async a proposito: FastAPI corre las dependencias sincronicas (y los generadores)
+    en el threadpool, y ese salto de hilo se pagaria en CADA request.
+
     Uso en endpoints:
         @app.post("/analyze")
-        def analyze(
+        async def analyze(
             request: SentimentRequest,
             pipeline: SentimentPipeline = Depends(get_sentiment_pipeline)
         ):
-            return pipeline.analyze(request)
+            return await pipeline.analyze_async(request)
+    """
+    return sentiment_pipeline
+
+
+async def get_client_id(connection: HTTPConnection) -> str:
+    """
+    Identidad del cliente para el reparto justo de la cola de inferencia.
+    Sale del header CLIENT_ID_HEADER (ej: el API key o el nombre del servicio que llama);
+    sin header, se usa la IP. Sirve tanto para requests HTTP como para WebSockets.
+    Async por lo mismo que get_sentiment_pipeline (sin salto al threadpool).
+    """
+    client_id = connection.headers.get(settings.CLIENT_ID_HEADER)
+    if client_id:
+        return client_id[:128]  # el id termina en las metricas: se acota el largo
+    return f"ip:{connection.client.host}" if connection.client else "anonymous"
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """
+    Protege los endpoints de /admin: exige el header X-Admin-Token igual a ADMIN_TOKEN.
+    Si ADMIN_TOKEN no esta configurado, los endpoints de admin quedan desactivados.
     """
-    logger.debug("Obteniendo pipeline de sentimientos")
-    # yield = "prestame esto mientras dure el request"
-    # Cuando el request termina, FastAPI vuelve aca (por si hubiera que limpiar algo)
-    yield sentiment_pipeline
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoints de admin desactivados")
+    # compare_digest compara en tiempo constante (no filtra el token por timing)
+    if not secrets.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de admin invalido")
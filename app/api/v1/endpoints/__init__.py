@@ -1,5 +1,5 @@
 """API v1 endpoints."""
 
-from app.api.v1.endpoints import health, sentiment
+from app.api.v1.endpoints import admin, health, sentiment
 
-__all__ = ["health", "sentiment"]
+__all__ = ["admin", "health", "sentiment"]
@@ -0,0 +1,197 @@
+"""
+Endpoints de administracion.
+Operaciones que no son para clientes normales: requieren el header X-Admin-Token.
+"""
+
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.api.dependencies import require_admin
+from app.core import get_logger
+from app.ml import inference_batcher
+from app.ml.stages import staged_inference
+from app.schemas import (
+    AutotunerStatus,
+    MemoryStatus,
+    ModelSwapRequest,
+    ModelSwapStatus,
+    ProfileRequest,
+    ProfileStatus,
+    SchedulerStatus,
+    TracemallocEntry,
+)
+from app.services.gc_tuning import gc_monitor
+from app.services.memory import memory_guard, tracemalloc_top
+from app.services.model_swap import model_swapper
+from app.services.profiler import request_profiler
+
+logger = get_logger(__name__)
+
+# Todas las rutas de este router pasan por require_admin
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# -------- POST /admin/model/swap --------
+@router.post(
+    "/model/swap",
+    response_model=ModelSwapStatus,
+    status_code=status.HTTP_202_ACCEPTED,  # 202 = aceptado, se procesa en segundo plano
+    summary="Reemplazar el modelo en caliente",
+    description=(
+        "Carga el modelo pedido al lado del actual, lo calienta y lo pone en servicio sin cortar "
+        "el trafico. El modelo anterior se libera cuando terminan los requests que lo usaban. "
+        "El progreso se consulta con GET /admin/model/swap."
+    ),
+)
+async def start_model_swap(request: ModelSwapRequest) -> ModelSwapStatus:
+    """Arranca el swap en segundo plano y devuelve enseguida."""
+    if not model_swapper.start(request.model_name, request.variant):
+        raise HTTPException(status_code=409, detail="Ya hay un cambio de modelo en curso")
+
+    logger.info(f"Swap de modelo pedido: {request.model_name} ({request.variant})")
+    return ModelSwapStatus(**model_swapper.status())
+
+
+# -------- GET /admin/model/swap --------
+@router.get(
+    "/model/swap",
+    response_model=ModelSwapStatus,
+    summary="Estado del cambio de modelo",
+    description="Estado del ultimo hot swap y la version del modelo en servicio",
+)
+async def get_model_swap_status() -> ModelSwapStatus:
+    return ModelSwapStatus(**model_swapper.status())
+
+
+# -------- POST /admin/profile --------
+@router.post(
+    "/profile",
+    response_model=ProfileStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Perfilar el servicio en vivo",
+    description=(
+        "Perfila los proximos N requests y/o una ventana de tiempo. El resultado (tiempo por "
+        "componente y funciones mas costosas) se consulta con GET /admin/profile, y los stacks "
+        "colapsados para un flamegraph con GET /admin/profile/collapsed."
+    ),
+)
+async def start_profile(request: ProfileRequest) -> ProfileStatus:
+    if not request_profiler.start(
+        mode=request.mode,
+        requests=request.requests,
+        duration_s=request.duration_s,
+        interval_ms=request.interval_ms,
+    ):
+        raise HTTPException(status_code=409, detail="Ya hay un profiling en curso")
+    return ProfileStatus(**request_profiler.status())
+
+
+# -------- GET /admin/profile --------
+@router.get(
+    "/profile",
+    response_model=ProfileStatus,
+    summary="Resultado del profiling",
+    description="Estado de la sesion de profiling y, si termino, el resultado agregado",
+)
+async def get_profile() -> ProfileStatus:
+    return ProfileStatus(**request_profiler.status())
+
+
+# -------- GET /admin/profile/collapsed --------
+@router.get(
+    "/profile/collapsed",
+    response_class=PlainTextResponse,
+    summary="Stacks colapsados del profiling",
+    description=(
+        "Una linea por stack (raiz;...;hoja cantidad), lista para flamegraph.pl o speedscope. "
+        "Solo en modo sampling."
+    ),
+)
+async def get_profile_collapsed() -> PlainTextResponse:
+    return PlainTextResponse(request_profiler.collapsed())
+
+
+# -------- GET /admin/memory --------
+@router.get(
+    "/memory",
+    response_model=MemoryStatus,
+    summary="Uso de memoria",
+    description=(
+        "RSS del proceso, allocator de torch, los requests que mas memoria usaron, el estado "
+        "de la guardia de MEMORY_BUDGET_MB y las pausas del GC por generacion"
+    ),
+)
+async def get_memory() -> MemoryStatus:
+    return MemoryStatus(**memory_guard.status(), gc=gc_monitor.stats())
+
+
+# -------- GET /admin/memory/tracemalloc --------
+@router.get(
+    "/memory/tracemalloc",
+    response_model=List[TracemallocEntry],
+    summary="Snapshot de tracemalloc",
+    description=(
+        "Prende tracemalloc durante duration_s (mientras se atiende trafico normal) y devuelve "
+        "las lineas de codigo que mas memoria reservaron. Tiene overhead mientras corre."
+    ),
+)
+async def get_tracemalloc(
+    top: int = Query(20, ge=1, le=200),
+    duration_s: float = Query(5.0, gt=0, le=60),
+) -> List[TracemallocEntry]:
+    return [TracemallocEntry(**entry) for entry in await tracemalloc_top(top, duration_s)]
+
+
+# -------- GET /admin/scheduler --------
+@router.get(
+    "/scheduler",
+    response_model=SchedulerStatus,
+    summary="Reparto de la cola de inferencia",
+    description=(
+        "Por cliente: peso, textos en cola, textos y tokens atendidos, y cuanto esperaron "
+        "en la cola (p50/p99)"
+    ),
+)
+async def get_scheduler() -> SchedulerStatus:
+    scheduler = inference_batcher.scheduler
+    return SchedulerStatus(queued=len(scheduler), clients=scheduler.stats())
+
+
+# -------- GET /admin/stages --------
+@router.get(
+    "/stages",
+    summary="Utilizacion de las etapas de inferencia",
+    description=(
+        "Por etapa (tokenize, forward, postprocess): batches, textos, tiempo ocupado, "
+        "utilizacion y batches en cola. La etapa con utilizacion cerca de 1 es el cuello de "
+        "botella. microbatch = cola compartida de los endpoints; batch = camino sincronico."
+    ),
+)
+async def get_stages() -> Dict[str, Dict[str, Dict[str, float]]]:
+    return {
+        "microbatch": inference_batcher.stages.stats(),
+        "batch": staged_inference.stats(),
+    }
+
+
+# -------- GET /admin/autotuner --------
+@router.get(
+    "/autotuner",
+    response_model=AutotunerStatus,
+    summary="Autoajuste del micro-batching",
+    description=(
+        "Tamaño de batch y espera vigentes, p99 del ultimo intervalo contra SLO_P99_MS y las "
+        "ultimas decisiones del controlador"
+    ),
+)
+async def get_autotuner() -> AutotunerStatus:
+    autotuner = inference_batcher.autotuner
+    if autotuner is None:
+        return AutotunerStatus(
+            enabled=False,
+            max_batch_size=inference_batcher.max_batch_size,
+            max_wait_ms=inference_batcher.max_wait_ms,
+        )
+    return AutotunerStatus(enabled=True, **autotuner.stats())
@@ -4,14 +4,16 @@ Son las URLs que responden "estoy vivo" o "estoy listo".
 Los usan herramientas de monitoreo, Kubernetes, balanceadores de carga, etc.
 """
 
+import os
 import time
 
 from fastapi import APIRouter, status
 
 from app.config import settings
 from app.core import get_logger
-from app.ml import sentiment_model
+from app.ml import canary_monitor, cpu_planner, head_pruning, model_registry, sentiment_model
 from app.schemas import ComponentHealth, DetailedHealthResponse, HealthResponse
+from app.services.memory import memory_guard
 
 logger = get_logger(__name__)
 
@@ -66,6 +68,88 @@ async def detailed_health_check() -> DetailedHealthResponse:
         )
     )
 
+    # Registro de modelos: memoria de cada uno y ultimos eventos de carga/desalojo.
+    # Un modelo secundario sin cargar no es un problema (se carga al primer uso)
+    registry_status = model_registry.status()
+    components.append(
+        ComponentHealth(
+            name="model_registry",
+            status="healthy",
+            message=f"{sum(m['loaded'] for m in registry_status)} modelo(s) cargado(s)",
+            details={
+                "budget_mb": settings.MODEL_MEMORY_BUDGET_MB or None,
+                "models": registry_status,
+                "events": model_registry.events(),
+            },
+        )
+    )
+
+    # Latencia de inferencia: canary en segundo plano + trafico real, p50/p99 ya calculados.
+    # Aca solo se lee el reporte (O(1)): el health check nunca corre el modelo
+    latency = canary_monitor.report
+    latency_ok = canary_monitor.is_healthy()
+    components.append(
+        ComponentHealth(
+            name="inference_latency",
+            status="healthy" if latency_ok else "degraded",
+            message=(
+                f"canary p50={latency['canary']['p50_ms']}ms p99={latency['canary']['p99_ms']}ms"
+                if "canary" in latency
+                else "Canary sin datos todavia"
+            ),
+            details=latency,
+        )
+    )
+    if not latency_ok and overall_status == "healthy":
+        overall_status = "degraded"
+
+    # Memoria del proceso contra MEMORY_BUDGET_MB. Bajo presion el servicio sigue andando,
+    # pero con batches mas chicos y rechazando requests batch
+    memory = memory_guard.status()
+    components.append(
+        ComponentHealth(
+            name="memory",
+            status="healthy" if memory["pressure"] == "ok" else "degraded",
+            message=f"RSS {memory['rss_mb']} MB, presion {memory['pressure']}",
+            details={k: memory[k] for k in ("rss_mb", "peak_rss_mb", "budget_mb", "torch")},
+        )
+    )
+    if memory["pressure"] != "ok" and overall_status == "healthy":
+        overall_status = "degraded"
+
+    # Plan de CPU con el que arranco el proceso (workers × threads de torch, de donde salio)
+    plan = cpu_planner.active_plan
+    if plan is not None:
+        components.append(
+            ComponentHealth(
+                name="cpu_plan",
+                status="healthy",
+                message=(
+                    f"{plan.profile}: {plan.workers} worker(s) × {plan.torch_threads} thread(s) "
+                    f"en {plan.cpus} core(s) ({plan.source})"
+                ),
+                details=plan.to_dict(),
+            )
+        )
+
+    # Modelos con cabezas de atencion podadas (python -m app.cli prune-heads), con el speedup
+    # medido al podarlos. Se sirven con MODEL_NAME=<path>. La lista se lee del disco al
+    # arrancar: aca no hay I/O
+    serving = os.path.abspath(sentiment_model.model_name)
+    pruned = [
+        {**model, "serving": os.path.abspath(model["path"]) == serving}
+        for model in head_pruning.list_pruned_models()
+    ]
+    if pruned:
+        components.append(
+            ComponentHealth(
+                name="pruned_models",
+                status="healthy",
+                message=f"{len(pruned)} modelo(s) podado(s)",
+                details={"models": pruned},
+            )
+        )
+
     # Aca van otros componentes: base de datos, cache, servicios externos
 
     return DetailedHealthResponse(
@@ -1,12 +1,40 @@
 """
 Endpoints de analisis de sentimientos.
-Define las URLs POST /analyze y /analyze/batch para analizar texto.
+Define las URLs POST /analyze y /analyze/batch para analizar texto,
+las variantes GET cacheables (por texto y por hash, con ETag) para un proxy como nginx,
+y el WebSocket /stream para clientes que mandan un flujo continuo de textos.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import hashlib
+import json
+from typing import Any, Optional, Set, Tuple
 
-from app.api.dependencies import get_sentiment_pipeline
-from app.core import SentimentAPIException, get_logger
+import anyio.to_thread
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from app.api.dependencies import get_client_id, get_sentiment_pipeline
+from app.config import settings
+from app.core import (
+    MemoryPressureError,
+    ResultNotFoundError,
+    SentimentAPIException,
+    UnknownModelError,
+    get_logger,
+)
 from app.ml import SentimentPipeline
 from app.schemas import (
     BatchSentimentRequest,
@@ -14,12 +42,25 @@ from app.schemas import (
     ErrorResponse,
     SentimentRequest,
     SentimentResponse,
+    SentimentScore,
+    StoredSentimentResponse,
 )
+from app.services.memory import memory_guard
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
+def _json_response(model: BaseModel) -> Response:
+    """
+    Serializa la respuesta directo a JSON (pydantic-core, en Rust).
+    Devolviendo un Response, FastAPI no vuelve a validar el objeto contra response_model
+    ni lo pasa por jsonable_encoder: la respuesta ya la armo el pipeline con el schema correcto.
+    response_model se deja en el decorador para la documentacion (OpenAPI).
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
 # -------- POST /analyze - Analiza UN texto --------
 @router.post(
     "/analyze",
@@ -36,13 +77,24 @@ router = APIRouter()
 async def analyze_sentiment(
     request: SentimentRequest,
     pipeline: SentimentPipeline = Depends(get_sentiment_pipeline),  # FastAPI inyecta el pipeline
-) -> SentimentResponse:
+    client_id: str = Depends(get_client_id),  # quien llama (reparto justo de la cola)
+) -> Response:
     """Analiza el sentimiento de un texto unico."""
-    logger.info(f"Recibido request de analisis: {len(request.text)} caracteres")
+    # Formato con %: el mensaje se arma solo si el log se escribe (no en cada request).
+    # DEBUG: el pipeline ya deja UNA linea INFO por analisis
+    logger.debug("Recibido request de analisis: %d caracteres", len(request.text))
 
     try:
-        response = pipeline.analyze(request)  # delega todo al pipeline de ML
-        return response
+        # Delega todo al pipeline de ML; el texto pasa por la cola compartida de inferencia
+        response = await pipeline.analyze_async(request, client_id)
+        return _json_response(response)
+
+    except UnknownModelError as e:
+        # El cliente pidio un modelo que no existe: es un error del request, no del servicio
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.error_code, "message": e.message, "details": e.details},
+        )
 
     except SentimentAPIException as e:
         # Errores conocidos: modelo no cargado, texto muy largo, etc.
@@ -70,14 +122,26 @@ async def analyze_sentiment(
     description="Analiza el sentimiento de multiples textos en una sola llamada",
 )
 async def analyze_sentiment_batch(
-    request: BatchSentimentRequest, pipeline: SentimentPipeline = Depends(get_sentiment_pipeline)
-) -> BatchSentimentResponse:
+    request: BatchSentimentRequest,
+    pipeline: SentimentPipeline = Depends(get_sentiment_pipeline),
+    client_id: str = Depends(get_client_id),
+) -> Response:
     """Analiza multiples textos en batch."""
-    logger.info(f"Recibido request batch: {len(request.texts)} textos")
+    logger.info("Recibido request batch: %d textos", len(request.texts))
 
     try:
-        response = pipeline.analyze_batch(request)
-        return response
+        # Cerca del limite de memoria se rechazan los batches (503) para no terminar en un OOM
+        if memory_guard.shed_bulk:
+            raise MemoryPressureError(memory_guard.pressure)
+
+        response = await pipeline.analyze_batch_async(request, client_id)
+        return _json_response(response)
+
+    except UnknownModelError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": e.error_code, "message": e.message, "details": e.details},
+        )
 
     except SentimentAPIException as e:
         logger.error(f"Error de aplicacion: {e.message}")
@@ -92,3 +156,293 @@ async def analyze_sentiment_batch(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={"error": "INTERNAL_ERROR", "message": "Error interno del servidor"},
         )
+
+
+# -------- GET cacheables: el mismo analisis, pero un proxy (nginx) lo puede cachear --------
+# El ETag identifica el resultado sin correr el modelo: hash del texto preprocesado + version
+# del modelo. Con If-None-Match igual se responde 304 sin inferencia; si cambia el modelo
+# (hot swap), cambia el ETag y el proxy recibe el resultado nuevo.
+
+
+def _etag(text_hash: str, model_version: str) -> str:
+    """ETag fuerte (entre comillas, sin W/)."""
+    return '"' + hashlib.sha256(f"{text_hash}:{model_version}".encode()).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match puede traer "*" o una lista de ETags (la comparacion ignora el W/)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _cache_headers(etag: str, text_hash: str) -> dict:
+    max_age = settings.HTTP_CACHE_MAX_AGE_S
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache",
+        "X-Text-Hash": text_hash,  # para pedir despues el mismo resultado por /analyze/by-hash
+    }
+
+
+def _error_status(e: SentimentAPIException) -> int:
+    if isinstance(e, UnknownModelError):
+        return status.HTTP_400_BAD_REQUEST
+    if isinstance(e, ResultNotFoundError):
+        return status.HTTP_404_NOT_FOUND
+    return status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+@router.get(
+    "/analyze",
+    response_model=SentimentResponse,
+    summary="Analizar un texto (GET cacheable)",
+    description=(
+        "Igual que POST /analyze, con el texto en la URL. Devuelve ETag y Cache-Control; "
+        "con If-None-Match responde 304 sin correr el modelo"
+    ),
+    responses={
+        304: {"description": "El resultado no cambio (If-None-Match)"},
+        400: {"description": "Request invalido", "model": ErrorResponse},
+        503: {"description": "Servicio no disponible (modelo no cargado)", "model": ErrorResponse},
+    },
+)
+async def analyze_sentiment_get(
+    text: str = Query(..., description="Texto a analizar"),
+    language: str = Query("en", description="Codigo de idioma (ISO 639-1)"),
+    model: Optional[str] = Query(None, description="Modelo a usar explicitamente"),
+    if_none_match: Optional[str] = Header(None),
+    pipeline: SentimentPipeline = Depends(get_sentiment_pipeline),
+    client_id: str = Depends(get_client_id),
+) -> Response:
+    """Analiza un texto pasado por query string, con ETag para caches HTTP."""
+    try:
+        # Mismas reglas que el body del POST (largo, vacio, etc.)
+        request = SentimentRequest(text=text, language=language, model=model)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+    try:
+        text_hash, model_version = pipeline.fingerprint(
+            request.text, request.language, request.model
+        )
+        etag = _etag(text_hash, model_version)
+        headers = _cache_headers(etag, text_hash)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = await pipeline.analyze_async(request, client_id)
+        # Un hot swap en el medio: el resultado es del modelo nuevo, el ETag tambien
+        if response.model_version != model_version:
+            headers = _cache_headers(_etag(text_hash, response.model_version), text_hash)
+        return Response(
+            content=response.model_dump_json(), media_type="application/json", headers=headers
+        )
+
+    except SentimentAPIException as e:
+        if not isinstance(e, UnknownModelError):
+            logger.error(f"Error de aplicacion: {e.message}")
+        raise HTTPException(
+            status_code=_error_status(e),
+            detail={"error": e.error_code, "message": e.message, "details": e.details},
+        )
+
+    except Exception as e:
+        logger.exception(f"Error inesperado: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "INTERNAL_ERROR", "message": "Error interno del servidor"},
+        )
+
+
+@router.get(
+    "/analyze/by-hash/{text_hash}",
+    response_model=StoredSentimentResponse,
+    summary="Resultado guardado por hash del texto",
+    description=(
+        "Busca por SHA-256 del texto preprocesado (el header X-Text-Hash de GET /analyze) un "
+        "resultado ya calculado, sin mandar el texto. Necesita el result store (RESULT_STORE_PATH)"
+    ),
+    responses={
+        304: {"description": "El resultado no cambio (If-None-Match)"},
+        404: {"description": "No hay un resultado guardado para ese hash", "model": ErrorResponse},
+    },
+)
+async def analyze_sentiment_by_hash(
+    text_hash: str = Path(..., pattern="^[0-9a-f]{64}$", description="SHA-256 del texto"),
+    language: str = Query("en", description="Codigo de idioma (ISO 639-1)"),
+    model: Optional[str] = Query(None, description="Modelo a usar explicitamente"),
+    if_none_match: Optional[str] = Header(None),
+    pipeline: SentimentPipeline = Depends(get_sentiment_pipeline),
+) -> Response:
+    """Resultado content-addressed: la URL depende solo del contenido del texto."""
+    try:
+        # SQLite en un hilo: la lectura del disco no frena el event loop
+        prediction, model_version = await anyio.to_thread.run_sync(
+            pipeline.lookup_hash, text_hash, language, model
+        )
+        # Sin resultado guardado es 404 aunque el ETag coincida (el ETag solo depende del hash)
+        if prediction is None:
+            raise ResultNotFoundError(text_hash)
+        etag = _etag(text_hash, model_version)
+        headers = _cache_headers(etag, text_hash)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = StoredSentimentResponse.model_construct(
+            text_hash=text_hash,
+            sentiment=prediction["sentiment"],
+            confidence=prediction["confidence"],
+            scores=[
+                SentimentScore.model_construct(label=s["label"], score=s["score"])
+                for s in prediction["scores"]
+            ],
+            model_version=model_version,
+        )
+        return Response(
+            content=response.model_dump_json(), media_type="application/json", headers=headers
+        )
+
+    except SentimentAPIException as e:
+        raise HTTPException(
+            status_code=_error_status(e),
+            detail={"error": e.error_code, "message": e.message, "details": e.details},
+        )
+
+
+# -------- WebSocket /stream - Flujo continuo de textos por UNA conexion --------
+
+# Mismo limite que SentimentRequest.text, pero validado a mano (sin pydantic por mensaje)
+MAX_STREAM_TEXT_LENGTH = 5000
+
+
+def _parse_stream_message(raw: str) -> Tuple[Optional[Any], Optional[str], dict, Optional[str]]:
+    """
+    Parsea un mensaje del socket. Acepta JSON {"id": ..., "text": ..., "language": ..., "model": ...}
+    o texto plano. Devuelve (id, texto, opciones, error). Si hay error, el texto es None.
+    """
+    message_id = None
+    text = raw
+    options: dict = {}
+
+    # Si parece un objeto JSON, lo parsea; si no, el mensaje entero es el texto
+    if raw.lstrip().startswith("{"):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None, None, options, "JSON invalido"
+        if not isinstance(payload, dict):
+            return None, None, options, "El mensaje debe ser un objeto JSON"
+        message_id = payload.get("id")
+        text = payload.get("text")
+        options = {k: payload[k] for k in ("language", "model") if isinstance(payload.get(k), str)}
+
+    if not isinstance(text, str) or not text.strip():
+        return message_id, None, options, "El texto no puede estar vacio"
+    if len(text) > MAX_STREAM_TEXT_LENGTH:
+        return message_id, None, options, f"El texto excede {MAX_STREAM_TEXT_LENGTH} caracteres"
+
+    return message_id, text.strip(), options, None
+
+
+@router.websocket("/stream")
+async def stream_sentiment(
+    websocket: WebSocket,
+    pipeline: SentimentPipeline = Depends(get_sentiment_pipeline),
+    client_id: str = Depends(get_client_id),
+) -> None:
+    """
+    Analisis de sentimiento en streaming.
+    El cliente manda textos (opcionalmente con un "id" de correlacion) y recibe cada resultado
+    apenas esta listo, posiblemente fuera de orden. Los textos de todos los sockets se juntan
+    en la misma cola de micro-batching.
+
+    Control de flujo: cada conexion puede tener hasta WS_MAX_INFLIGHT textos pendientes.
+    Al llegar al limite se deja de leer del socket, asi el backpressure de TCP frena al cliente
+    en vez de acumular mensajes en la memoria del servidor.
+    """
+    await websocket.accept()
+
+    inflight = asyncio.Semaphore(settings.WS_MAX_INFLIGHT)
+    send_lock = asyncio.Lock()  # evita que dos tareas escriban en el socket a la vez
+    pending: Set[asyncio.Task] = set()
+
+    async def send(payload: dict) -> None:
+        async with send_lock:
+            await websocket.send_json(payload)
+
+    async def handle(message_id: Any, text: str, options: dict) -> None:
+        try:
+            try:
+                result = await pipeline.analyze_text_async(text, client_id=client_id, **options)
+                payload = {
+                    "id": message_id,
+                    "sentiment": result["sentiment"].value,
+                    "confidence": result["confidence"],
+                    "scores": [
+                        {"label": s["label"].value, "score": s["score"]} for s in result["scores"]
+                    ],
+                    "processing_time_ms": result["processing_time_ms"],
+                    "model_version": result["model_version"],
+                    "near_duplicate": result.get("near_duplicate", False),
+                    "exit_layer": result.get("exit_layer"),
+                }
+            except SentimentAPIException as e:
+                payload = {"id": message_id, "error": e.error_code, "message": e.message}
+            except Exception as e:
+                # Sin esto la tarea muere en silencio y el cliente nunca recibe respuesta para este id
+                logger.exception(f"Error inesperado en el stream: {e}")
+                payload = {
+                    "id": message_id,
+                    "error": "INTERNAL_ERROR",
+                    "message": "Error interno del servidor",
+                }
+            await send(payload)
+        except (WebSocketDisconnect, RuntimeError):
+            # El cliente ya se fue (starlette lanza RuntimeError si el socket ya esta cerrado):
+            # no hay a quien responder, y la tarea no debe terminar con una excepcion
+            pass
+        finally:
+            inflight.release()
+
+    try:
+        while True:
+            # Espera un "lugar libre" ANTES de leer el proximo mensaje (control de flujo)
+            await inflight.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            raw = message.get("text")
+            if raw is None:
+                # Frame binario: receive_text() lanzaria KeyError y cortaria la conexion
+                inflight.release()
+                await send(
+                    {
+                        "id": None,
+                        "error": "VALIDATION_ERROR",
+                        "message": "Solo se aceptan mensajes de texto",
+                    }
+                )
+                continue
+
+            message_id, text, options, error = _parse_stream_message(raw)
+            if error is not None:
+                inflight.release()
+                await send({"id": message_id, "error": "VALIDATION_ERROR", "message": error})
+                continue
+
+            assert text is not None
+            task = asyncio.create_task(handle(message_id, text, options))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    except WebSocketDisconnect:
+        logger.debug("Cliente de streaming desconectado")
+
+    finally:
+        # Si el cliente se fue, no tiene sentido seguir procesando sus textos
+        for task in pending:
+            task.cancel()
@@ -6,7 +6,7 @@ Es como una "tabla de contenidos" de todas las URLs disponibles en v1.
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import health, sentiment
+from app.api.v1.endpoints import admin, health, sentiment
 
 # Router contenedor que agrupa todos los endpoints de la version 1
 api_router = APIRouter()
@@ -24,3 +24,10 @@ api_router.include_router(
     prefix="/sentiment",  # todas las URLs de sentiment empiezan con /sentiment
     tags=["Sentiment Analysis"],
 )
+
+# Endpoints de administracion (protegidos con X-Admin-Token)
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["Admin"],
+)
@@ -0,0 +1,528 @@
+"""
+CLI para scoring offline de archivos grandes (backfills), sin levantar el servidor.
+Tambien calibra las optimizaciones del modelo que se arman con textos propios (early exit,
+poda de cabezas de atencion, poda del vocabulario).
+
+Lee un JSONL o CSV por bloques grandes (opcionalmente con mmap), parsea y preprocesa los
+bloques en varios procesos, corre el modelo en batches y escribe los resultados a medida que
+avanza. Guarda un checkpoint despues de cada bloque: con --resume sigue donde quedo.
+
+Uso:
+    python -m app.cli score reviews.jsonl scores.jsonl --text-field review --id-field id
+    python -m app.cli score comments.csv scores.csv --text-field comment --resume
+    python -m app.cli early-exit reviews.jsonl --text-field review --limit 5000
+    python -m app.cli prune-heads reviews.jsonl --text-field review --floor 0.99
+    python -m app.cli prune-vocab reviews.jsonl --text-field review --min-count 2
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from app.core import get_logger, setup_logging
+from app.ml import early_exit, head_pruning, vocab_pruning
+from app.ml.model import SentimentModel, sentiment_model
+from app.ml.preprocessor import TextPreprocessor
+
+logger = get_logger(__name__)
+
+# Tamaño de cada bloque leido del archivo de entrada
+DEFAULT_CHUNK_MB = 4.0
+
+# Preprocesador de cada proceso worker (se crea una vez por proceso, en _init_worker)
+_worker_preprocessor: Optional[TextPreprocessor] = None
+
+
+# ============================================================
+# Lectura del archivo de entrada por bloques
+# ============================================================
+
+
+def _jsonl_split_point(buffer: bytes) -> int:
+    """Hasta donde hay lineas completas (despues del ultimo salto de linea)."""
+    return buffer.rfind(b"\n") + 1
+
+
+def _csv_split_point(buffer: bytes) -> int:
+    """
+    Hasta donde hay registros CSV completos. Un campo entre comillas puede tener saltos de
+    linea: un salto de linea solo cierra un registro si la cantidad de comillas es par.
+    """
+    split = 0
+    quotes = 0
+    start = 0
+    while True:
+        newline = buffer.find(b"\n", start)
+        if newline < 0:
+            return split
+        quotes += buffer.count(b'"', start, newline)
+        if quotes % 2 == 0:
+            split = newline + 1
+        start = newline + 1
+
+
+def _read_blocks(
+    path: str, start: int, chunk_bytes: int, csv_mode: bool, use_mmap: bool
+) -> Iterator[Tuple[bytes, int]]:
+    """
+    Lee el archivo desde el byte start en bloques de ~chunk_bytes que terminan en un
+    registro completo. Devuelve (bloque, offset donde termina el bloque).
+    """
+    split_point = _csv_split_point if csv_mode else _jsonl_split_point
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or start >= size:
+            return
+
+        # mmap: el kernel lee el archivo directo a memoria, sin copias por cada read()
+        source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else None
+        try:
+            offset = start
+            pending = b""
+            while offset < size:
+                if source is not None:
+                    data = source[offset : offset + chunk_bytes]
+                else:
+                    f.seek(offset)
+                    data = f.read(chunk_bytes)
+                offset += len(data)
+                buffer = pending + data
+
+                split = split_point(buffer) if offset < size else len(buffer)
+                if split == 0:
+                    pending = buffer  # un registro mas largo que el bloque: sigue leyendo
+                    continue
+                pending = buffer[split:]
+                yield buffer[:split], offset - len(pending)
+        finally:
+            if source is not None:
+                source.close()
+
+
+def _read_csv_header(path: str) -> Tuple[List[str], int]:
+    """Columnas del CSV y el offset donde empiezan los datos."""
+    with open(path, "rb") as f:
+        line = f.readline()
+    header = next(csv.reader([line.decode("utf-8-sig")]))
+    return header, len(line)
+
+
+# ============================================================
+# Trabajo de los procesos worker: parsear + preprocesar un bloque
+# ============================================================
+
+
+def _init_worker() -> None:
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor()
+
+
+def _prepare_block(
+    block: bytes,
+    csv_header: Optional[List[str]],
+    text_field: str,
+    id_field: Optional[str],
+) -> List[Tuple[object, Optional[str], Optional[str]]]:
+    """
+    Corre en un proceso worker. Devuelve por registro (id, texto preprocesado, error).
+    Un registro invalido no frena el scoring: se devuelve con su error.
+    """
+    preprocessor = _worker_preprocessor or TextPreprocessor()
+    text = block.decode("utf-8")
+
+    if csv_header is not None:
+        rows = (dict(zip(csv_header, row)) for row in csv.reader(io.StringIO(text)) if row)
+    else:
+        rows = (_parse_json_line(line) for line in text.splitlines() if line.strip())
+
+    prepared = []
+    for row in rows:
+        if isinstance(row, str):  # error de parseo
+            prepared.append((None, None, row))
+            continue
+        record_id = row.get(id_field) if id_field else None
+        value = row.get(text_field)
+        if not isinstance(value, str):
+            prepared.append((record_id, None, f"campo '{text_field}' faltante o no es texto"))
+            continue
+        prepared.append((record_id, preprocessor.preprocess(value), None))
+    return prepared
+
+
+def _parse_json_line(line: str):
+    """Parsea una linea JSONL. Si no es un objeto JSON valido devuelve el error (str)."""
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return f"JSON invalido: {e}"
+    return row if isinstance(row, dict) else "la linea no es un objeto JSON"
+
+
+# ============================================================
+# Inferencia y salida
+# ============================================================
+
+
+def _score(model, texts: List[str], batch_size: int) -> List[dict]:
+    """
+    Predice en batches. Los textos se ordenan por largo para que cada batch tenga textos
+    parecidos (menos padding = forward pass mas barato) y despues se vuelve al orden original.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results: List[Optional[dict]] = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        indices = order[start : start + batch_size]
+        for i, prediction in zip(indices, model.predict_batch([texts[i] for i in indices])):
+            results[i] = prediction
+    return results  # type: ignore[return-value]
+
+
+class _OutputWriter:
+    """Escribe los resultados en JSONL o CSV (segun la extension del archivo de salida)."""
+
+    CSV_COLUMNS = ["row", "id", "sentiment", "confidence", "error"]
+
+    def __init__(self, path: str, resume_offset: Optional[int]):
+        self.csv_mode = path.lower().endswith(".csv")
+        if resume_offset is not None and os.path.exists(path):
+            self.file = open(path, "r+b")
+            # Lo escrito despues del ultimo checkpoint se descarta (se vuelve a generar)
+            self.file.seek(resume_offset)
+            self.file.truncate()
+        else:
+            self.file = open(path, "wb")
+            if self.csv_mode:
+                self._write_rows([self.CSV_COLUMNS])
+
+    def _write_rows(self, rows: List[list]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        self.file.write(buffer.getvalue().encode("utf-8"))
+
+    def write(self, first_row: int, records: list, predictions: List[Optional[dict]]) -> None:
+        rows = []
+        for n, ((record_id, _, error), prediction) in enumerate(zip(records, predictions)):
+            row = {"row": first_row + n, "id": record_id}
+            if prediction is None:
+                row["error"] = error
+            else:
+                row["sentiment"] = prediction["sentiment"].value
+                row["confidence"] = round(prediction["confidence"], 6)
+                row["scores"] = {
+                    s["label"].value: round(s["score"], 6) for s in prediction["scores"]
+                }
+            rows.append(row)
+
+        if self.csv_mode:
+            self._write_rows([[row.get(col) for col in self.CSV_COLUMNS] for row in rows])
+        else:
+            lines = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            self.file.write(lines.encode("utf-8"))
+        self.file.flush()
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+# ============================================================
+# Checkpoint
+# ============================================================
+
+
+def _checkpoint_path(output: str) -> str:
+    return f"{output}.checkpoint.json"
+
+
+def _load_checkpoint(output: str, input_path: str) -> Optional[dict]:
+    try:
+        with open(_checkpoint_path(output)) as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        logger.warning("El checkpoint es de otro archivo de entrada, se empieza de cero")
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(output: str, data: dict) -> None:
+    """Escribe a un temporal y renombra: un corte a mitad nunca deja un checkpoint roto."""
+    path = _checkpoint_path(output)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# Comando score
+# ============================================================
+
+
+class _Progress:
+    """Muestra filas procesadas, throughput y porcentaje en stderr (una vez por segundo)."""
+
+    def __init__(self, total_bytes: int, start_bytes: int, start_rows: int):
+        self.total_bytes = max(total_bytes, 1)
+        self.start_rows = start_rows
+        self.started = time.time()
+        self.last_print = 0.0
+        self.rows = start_rows
+        self.offset = start_bytes
+
+    def update(self, rows: int, offset: int, force: bool = False) -> None:
+        self.rows, self.offset = rows, offset
+        now = time.time()
+        if not force and now - self.last_print < 1.0:
+            return
+        self.last_print = now
+        elapsed = max(now - self.started, 1e-9)
+        rate = (rows - self.start_rows) / elapsed
+        pct = 100 * offset / self.total_bytes
+        sys.stderr.write(f"\r{rows:,} filas | {rate:,.0f} filas/s | {pct:5.1f}%   ")
+        sys.stderr.flush()
+
+
+def score(args: argparse.Namespace) -> int:
+    """Scorea el archivo de entrada completo. Devuelve el codigo de salida del proceso."""
+    csv_mode = args.format == "csv" or (args.format is None and args.input.lower().endswith(".csv"))
+    csv_header, data_start = _read_csv_header(args.input) if csv_mode else (None, 0)
+
+    checkpoint = _load_checkpoint(args.output, args.input) if args.resume else None
+    input_offset = checkpoint["input_offset"] if checkpoint else data_start
+    rows_done = checkpoint["rows"] if checkpoint else 0
+    if checkpoint:
+        logger.info("Retomando desde la fila %d (byte %d)", rows_done, input_offset)
+
+    model = SentimentModel(args.model) if args.model else sentiment_model
+    model.load()
+
+    writer = _OutputWriter(args.output, checkpoint["output_offset"] if checkpoint else None)
+    progress = _Progress(os.path.getsize(args.input), input_offset, rows_done)
+    workers = args.workers or max(1, (os.cpu_count() or 2) - 1)
+    chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+
+    # Los workers parsean/preprocesan los proximos bloques mientras el modelo corre el actual
+    pending: Deque[Tuple[Future, int]] = deque()
+    blocks = _read_blocks(args.input, input_offset, chunk_bytes, csv_mode, not args.no_mmap)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < workers * 2:
+                    try:
+                        block, end_offset = next(blocks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = pool.submit(
+                        _prepare_block, block, csv_header, args.text_field, args.id_field
+                    )
+                    pending.append((future, end_offset))
+                if not pending:
+                    break
+
+                future, end_offset = pending.popleft()
+                records = future.result()
+
+                valid = [i for i, (_, text, _) in enumerate(records) if text is not None]
+                predictions: List[Optional[dict]] = [None] * len(records)
+                scored = _score(model, [records[i][1] for i in valid], args.batch_size)
+                for i, prediction in zip(valid, scored):
+                    predictions[i] = prediction
+
+                writer.write(rows_done, records, predictions)
+                rows_done += len(records)
+                _save_checkpoint(
+                    args.output,
+                    {
+                        "input": os.path.abspath(args.input),
+                        "input_offset": end_offset,
+                        "output_offset": writer.tell(),
+                        "rows": rows_done,
+                    },
+                )
+                progress.update(rows_done, end_offset)
+    finally:
+        writer.close()
+
+    progress.update(rows_done, progress.total_bytes, force=True)
+    sys.stderr.write("\n")
+    # Termino bien: el checkpoint ya no sirve (con una entrada vacia nunca se escribio)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_checkpoint_path(args.output))
+    logger.info("Scoring terminado: %d filas en %s", rows_done, args.output)
+    return 0
+
+
+# ============================================================
+# Comandos de calibracion (textos propios, sin etiquetas)
+# ============================================================
+
+
+def _read_corpus(path: str, text_field: str, limit: Optional[int]) -> List[str]:
+    """
+    Textos preprocesados de un .jsonl/.csv (campo text_field) o de un archivo de texto plano
+    (uno por linea), hasta limit. Se preprocesan igual que en produccion.
+    """
+    texts: List[str] = []
+    lower = path.lower()
+    if lower.endswith((".jsonl", ".csv")):
+        csv_mode = lower.endswith(".csv")
+        csv_header, data_start = _read_csv_header(path) if csv_mode else (None, 0)
+        chunk_bytes = int(DEFAULT_CHUNK_MB * 1024 * 1024)
+        for block, _ in _read_blocks(path, data_start, chunk_bytes, csv_mode, use_mmap=False):
+            texts += [
+                text for _, text, _ in _prepare_block(block, csv_header, text_field, None) if text
+            ]
+            if limit and len(texts) >= limit:
+                break
+    else:
+        preprocessor = TextPreprocessor()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    texts.append(preprocessor.preprocess(line))
+                if limit and len(texts) >= limit:
+                    break
+    return texts[:limit] if limit else texts
+
+
+def calibrate_early_exit(args: argparse.Namespace) -> int:
+    """Entrena los clasificadores de early exit con el corpus y los guarda para MODEL_NAME."""
+    model = SentimentModel(args.model) if args.model else sentiment_model
+    model.load()
+    texts = _read_corpus(args.input, args.text_field, args.limit)
+    if len(texts) < 2:
+        logger.error("El corpus necesita al menos 2 textos (tiene %d)", len(texts))
+        return 1
+
+    heads, report = early_exit.calibrate_heads(model.pipeline, texts, layers=args.layers)
+
+    path = early_exit.heads_path(model.model_name)
+    early_exit.save_heads(heads, path, model.model_name, report)
+    logger.info("Clasificadores de early exit guardados en %s (%d textos)", path, len(texts))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def prune_heads(args: argparse.Namespace) -> int:
+    """Poda las cabezas de atencion menos importantes y guarda el modelo en MODEL_CACHE_DIR."""
+    texts = _read_corpus(args.input, args.text_field, args.limit)
+    if len(texts) < 2:
+        logger.error("El corpus necesita al menos 2 textos (tiene %d)", len(texts))
+        return 1
+
+    model_name = args.model or sentiment_model.model_name
+    model, tokenizer, report = head_pruning.prune_model(model_name, texts, args.floor)
+    path = head_pruning.save_pruned(model, tokenizer, report)
+    logger.info("Modelo podado guardado en %s (se sirve con MODEL_NAME=%s)", path, path)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def prune_vocab(args: argparse.Namespace) -> int:
+    """Arma el modelo con el vocabulario del corpus y lo guarda en MODEL_CACHE_DIR."""
+    texts = _read_corpus(args.input, args.text_field, args.limit)
+    if len(texts) < 2:
+        logger.error("El corpus necesita al menos 2 textos (tiene %d)", len(texts))
+        return 1
+
+    model_name = args.model or sentiment_model.model_name
+    model, tokenizer, report = vocab_pruning.prune_vocabulary(
+        model_name, texts, min_count=args.min_count, max_vocab=args.max_vocab
+    )
+    path = vocab_pruning.save_pruned(model, tokenizer, report)
+    logger.info("Modelo con vocabulario reducido en %s (se sirve con MODEL_NAME=%s)", path, path)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = commands.add_parser("score", help="Scorea un archivo JSONL o CSV")
+    score_parser.add_argument("input", help="Archivo de entrada (.jsonl o .csv)")
+    score_parser.add_argument("output", help="Archivo de salida (.jsonl o .csv)")
+    score_parser.add_argument("--format", choices=["jsonl", "csv"], help="Formato de entrada")
+    score_parser.add_argument("--text-field", default="text", help="Campo/columna con el texto")
+    score_parser.add_argument("--id-field", help="Campo/columna con un id a copiar a la salida")
+    score_parser.add_argument("--model", help="Modelo a usar (por defecto MODEL_NAME)")
+    score_parser.add_argument("--batch-size", type=int, default=64, help="Textos por forward pass")
+    score_parser.add_argument(
+        "--workers", type=int, help="Procesos de preprocesamiento (por defecto: CPUs - 1)"
+    )
+    score_parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_MB)
+    score_parser.add_argument(
+        "--no-mmap", action="store_true", help="Leer con read() en vez de mmap"
+    )
+    score_parser.add_argument(
+        "--resume", action="store_true", help="Seguir desde el ultimo checkpoint"
+    )
+    score_parser.set_defaults(handler=score)
+
+    exit_parser = commands.add_parser(
+        "early-exit", help="Calibra los clasificadores de early exit con textos propios"
+    )
+    exit_parser.add_argument("input", help="Corpus (.jsonl, .csv o texto plano, uno por linea)")
+    exit_parser.add_argument("--text-field", default="text", help="Campo/columna con el texto")
+    exit_parser.add_argument("--model", help="Modelo a calibrar (por defecto MODEL_NAME)")
+    exit_parser.add_argument("--limit", type=int, default=5000, help="Maximo de textos a usar")
+    exit_parser.add_argument(
+        "--layers",
+        type=lambda value: [int(layer) for layer in value.split(",")],
+        help="Capas con clasificador, ej: 2,3,4 (por defecto todas las intermedias)",
+    )
+    exit_parser.set_defaults(handler=calibrate_early_exit)
+
+    prune_parser = commands.add_parser(
+        "prune-heads", help="Poda cabezas de atencion con textos propios como referencia"
+    )
+    prune_parser.add_argument("input", help="Corpus (.jsonl, .csv o texto plano, uno por linea)")
+    prune_parser.add_argument("--text-field", default="text", help="Campo/columna con el texto")
+    prune_parser.add_argument("--model", help="Modelo a podar (por defecto MODEL_NAME)")
+    prune_parser.add_argument("--limit", type=int, default=2000, help="Maximo de textos a usar")
+    prune_parser.add_argument(
+        "--floor",
+        type=float,
+        help="Coincidencia minima con el modelo completo (por defecto HEAD_PRUNING_AGREEMENT_FLOOR)",
+    )
+    prune_parser.set_defaults(handler=prune_heads)
+
+    vocab_parser = commands.add_parser(
+        "prune-vocab", help="Reduce el vocabulario a los tokens que usa el corpus"
+    )
+    vocab_parser.add_argument("input", help="Corpus (.jsonl, .csv o texto plano, uno por linea)")
+    vocab_parser.add_argument("--text-field", default="text", help="Campo/columna con el texto")
+    vocab_parser.add_argument("--model", help="Modelo a reducir (por defecto MODEL_NAME)")
+    vocab_parser.add_argument("--limit", type=int, default=100000, help="Maximo de textos a usar")
+    vocab_parser.add_argument(
+        "--min-count", type=int, default=1, help="Apariciones minimas para conservar un token"
+    )
+    vocab_parser.add_argument("--max-vocab", type=int, help="Tope de tokens del vocabulario")
+    vocab_parser.set_defaults(handler=prune_vocab)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
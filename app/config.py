@@ -6,6 +6,7 @@ Usa pydantic-settings para cargar configuración desde variables de entorno.
 from functools import (  # lru_cache guarda en memoria el resultado de una funcion para no recalcularlo
     lru_cache,
 )
+from typing import Dict, List, Optional
 
 from pydantic_settings import (  # BaseSettings lee variables de entorno automaticamente; SettingsConfigDict configura como leerlas
     BaseSettings,
@@ -32,15 +33,126 @@ class Settings(BaseSettings):
 
     # API
     API_V1_PREFIX: str = "/api/v1"  # prefijo comun para todas las rutas de la API
+    # Origenes que pueden llamar a la API desde un navegador. Lista vacia = sin middleware
+    # de CORS (ej: la API solo la llaman otros servicios): un middleware menos por request
+    CORS_ALLOW_ORIGINS: List[str] = ["*"]
+
+    # Lanzador pre-fork (python -m app.serve): carga el modelo una vez y forkea los workers
+    SERVE_HOST: str = "0.0.0.0"
+    SERVE_PORT: int = 8000
+    SERVE_WORKERS: int = 0  # 0 = los decide el plan de CPU
+    SERVE_TORCH_THREADS: int = 0  # threads de torch por worker (0 = los decide el plan de CPU)
+    # Plan de CPU: "latency" (pocos workers con varios threads) o "throughput" (un worker por
+    # core). Se calcula al arrancar con los cores del contenedor (cuota del cgroup); si se
+    # calibro (python -m app.serve --calibrate), usa el plan guardado en MODEL_CACHE_DIR
+    CPU_PROFILE: str = "latency"
+
+    # Modo router (uvicorn app.router_app:app): reparte cada texto entre varias instancias de
+    # la API por hash consistente, asi cada texto cae siempre en la misma y su cache sirve.
+    # En el entorno va como JSON: ROUTER_BACKENDS='["http://api-1:8000", "http://api-2:8000"]'
+    ROUTER_BACKENDS: List[str] = []
+    ROUTER_VIRTUAL_NODES: int = 128  # puntos de cada backend en el anillo (reparto mas parejo)
+    ROUTER_TIMEOUT_S: float = 30.0
+    ROUTER_MAX_CONNECTIONS: int = 100  # conexiones keep-alive por backend
+    ROUTER_HEALTH_INTERVAL_S: float = 5.0  # cada cuanto se revisan los backends caidos
 
     # ML Model
     MODEL_NAME: str = (
         "distilbert-base-uncased-finetuned-sst-2-english"  # modelo preentrenado de HuggingFace
     )
     MODEL_CACHE_DIR: str = "./model_cache"  # carpeta donde se guarda el modelo descargado
+    MODEL_VARIANT: str = "default"  # "default" o "quantized" (capas Linear en int8)
+
+    # Modo de ejecucion: "eager" (Pipeline de HuggingFace) o "compiled" (grafos TorchScript
+    # por largo de secuencia, guardados en MODEL_CACHE_DIR/compiled para no recompilar)
+    MODEL_EXECUTION_MODE: str = "eager"
+    MODEL_COMPILE_BUCKETS: List[int] = [32, 64, 128, 256, 512]  # textos mas largos van en eager
+
+    # Early exit: los textos salen en la primera capa intermedia cuya confianza llega a este
+    # umbral (0 = apagado). Necesita clasificadores calibrados con python -m app.cli early-exit
+    EARLY_EXIT_THRESHOLD: float = 0
+
+    # Poda de cabezas de atencion (python -m app.cli prune-heads corpus.txt): se sacan cabezas
+    # mientras las predicciones coincidan con el modelo completo al menos en esta fraccion
+    HEAD_PRUNING_AGREEMENT_FLOOR: float = 0.99
+
+    # Modelos adicionales por idioma. En el entorno va como JSON: MODEL_LANGUAGE_MAP='{"es": "modelo-es"}'
+    # Los idiomas que no estan en el mapa usan MODEL_NAME
+    MODEL_LANGUAGE_MAP: Dict[str, str] = {}
+    MODEL_ALLOWED_NAMES: List[str] = []  # otros modelos que se pueden pedir con el campo "model"
+    MODEL_MEMORY_BUDGET_MB: float = 0  # limite para todos los modelos cargados (0 = sin limite)
+
+    # Micro-batching: junta textos de distintos clientes en un solo forward pass
+    BATCH_MAX_SIZE: int = 32  # maximo de textos por batch
+    BATCH_MAX_WAIT_MS: float = (
+        5.0  # cuanto espera a que lleguen mas textos antes de correr el batch
+    )
+
+    # Autoajuste del micro-batching: ajusta BATCH_MAX_SIZE y BATCH_MAX_WAIT_MS en marcha para
+    # mantener el p99 (espera en cola + inferencia) bajo SLO_P99_MS. 0 = desactivado
+    SLO_P99_MS: float = 0
+    AUTOTUNE_INTERVAL_S: float = 2.0  # cada cuanto se decide un ajuste
+    AUTOTUNE_MAX_BATCH_SIZE: int = 128  # techo del tamaño de batch
+    AUTOTUNE_MAX_WAIT_MS: float = 20.0  # techo de la espera
+
+    # Inferencia por etapas (tokenizar → forward → postprocesar, cada una en su hilo)
+    PIPELINE_QUEUE_SIZE: int = 2  # batches esperando entre una etapa y la siguiente
+
+    # Reparto justo de la cola de inferencia entre clientes (se identifican por este header;
+    # sin header, por IP). Peso 2 = el doble de tokens que un cliente con peso 1
+    CLIENT_ID_HEADER: str = "X-Client-ID"
+    CLIENT_WEIGHTS: Dict[str, float] = {}  # ej: '{"frontend": 4, "backfill": 0.5}'
+    CLIENT_DEFAULT_WEIGHT: float = 1.0
+
+    # WebSocket
+    WS_MAX_INFLIGHT: int = 64  # textos pendientes por conexion antes de dejar de leer del socket
+
+    # Store persistente de predicciones (SQLite). None = desactivado
+    RESULT_STORE_PATH: Optional[str] = None  # ej: ./model_cache/results.sqlite3
+    RESULT_STORE_MAX_MB: float = 512.0  # al pasar este tamaño se borran las entradas mas viejas
+
+    # GET /sentiment/analyze: cuanto puede guardar la respuesta un proxy (nginx) o el cliente.
+    # Despues revalida con If-None-Match (304 sin inferencia). 0 = revalidar siempre
+    HTTP_CACHE_MAX_AGE_S: int = 300
+
+    # Cache en memoria compartida entre los workers del mismo pod. 0 slots = desactivado
+    SHARED_CACHE_SLOTS: int = 0  # cada slot ocupa 32 bytes (1M slots = 32 MB)
+    SHARED_CACHE_NAME: str = "sentiment-api-cache"  # nombre del bloque en /dev/shm
+
+    # Indice de casi-duplicados (MinHash): reutiliza el resultado de un texto muy parecido a uno
+    # ya analizado, sin correr el modelo. 0 entradas = desactivado
+    NEAR_DUP_MAX_ENTRIES: int = 0  # textos recientes en el indice (~1 KB cada uno)
+    NEAR_DUP_THRESHOLD: float = 0.85  # similitud de Jaccard minima (palabras y pares de palabras)
+
+    # Presupuesto de memoria del proceso (RSS). Al acercarse: batches mas chicos, se liberan
+    # caches y se rechazan los requests batch. 0 = sin limite
+    MEMORY_BUDGET_MB: float = 0
+    MEMORY_CHECK_INTERVAL_S: float = 1.0  # cada cuanto se revisa el RSS
+    # Ranking de requests por crecimiento del RSS (/admin/memory): lee /proc dos veces por
+    # request, asi que solo se activa con un presupuesto o si se pide explicitamente
+    MEMORY_TRACK_REQUESTS: bool = False
+
+    # Garbage collector: al terminar de cargar el modelo se congela el heap (gc.freeze) para que
+    # el GC no vuelva a recorrer los objetos del modelo en cada coleccion. Umbrales vacio = los
+    # de Python (700, 10, 10). Ej: '[50000, 20, 100]' = muchas menos colecciones
+    GC_FREEZE_AFTER_LOAD: bool = True
+    GC_THRESHOLDS: List[int] = []
+
+    # Canary: cada CANARY_INTERVAL_S se corre una inferencia chiquita para medir la latencia real
+    # del modelo (se reporta en /health/detailed junto con la del trafico). 0 = desactivado
+    CANARY_INTERVAL_S: float = 10.0
+    CANARY_TEXT: str = "The service is working as expected."
+    LATENCY_WINDOW_S: float = 300.0  # ventana de los percentiles p50/p99
+
+    # Admin: token para los endpoints /admin (header X-Admin-Token). None = admin desactivado
+    ADMIN_TOKEN: Optional[str] = None
 
     # Logging
     LOG_LEVEL: str = "INFO"  # nivel de detalle de los logs (DEBUG, INFO, WARNING, ERROR)
+    LOG_FORMAT: str = "auto"  # "text", "json" o "auto" (JSON solo con ENV=production)
+    LOG_QUEUE_SIZE: int = 10000  # registros en espera de escribirse; si se llena, se descartan
+    # Fraccion de logs INFO/DEBUG que se escriben, por logger. Ej: '{"app.ml.pipeline": 0.01}'
+    LOG_SAMPLING: Dict[str, float] = {}
 
     # Le dice a pydantic de donde leer las variables de entorno
     model_config = SettingsConfigDict(
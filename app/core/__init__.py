@@ -5,14 +5,18 @@ Core utilities - Re-exporta las piezas principales del paquete core para que se
 # Trae todas las excepciones desde exceptions.py
 from app.core.exceptions import (
     EmptyTextError,
+    MemoryPressureError,
     ModelNotLoadedError,
+    NoBackendAvailableError,
     PredictionError,
+    ResultNotFoundError,
     SentimentAPIException,
     TextTooLongError,
+    UnknownModelError,
 )
 
 # Trae las funciones de logging desde logging.py
-from app.core.logging import get_logger, setup_logging
+from app.core.logging import get_logger, setup_logging, stop_logging
 
 # __all__ define que se exporta cuando alguien hace: from app.core import *
 # Es como una "lista publica" de lo que ofrece este paquete
@@ -22,6 +26,11 @@ __all__ = [
     "TextTooLongError",
     "EmptyTextError",
     "PredictionError",
+    "UnknownModelError",
+    "MemoryPressureError",
+    "NoBackendAvailableError",
+    "ResultNotFoundError",
     "setup_logging",
+    "stop_logging",
     "get_logger",
 ]
@@ -4,7 +4,7 @@ Cada tipo de error tiene su propia clase, asi el codigo que las atrapa
 sabe exactamente que paso y puede responder de forma adecuada.
 """
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 
 # Clase "madre" de la que heredan TODAS las excepciones de esta app
@@ -77,3 +77,59 @@ class PredictionError(SentimentAPIException):
                 {"original_error": str(original_error)} if original_error else {}
             ),  # guarda el error original para debugging
         )
+
+
+# Se lanza cuando el cliente pide un modelo que no esta habilitado en la configuracion
+class UnknownModelError(SentimentAPIException):
+    """
+    El modelo pedido no esta disponible
+    """
+
+    def __init__(self, model_name: str, available: List[str]):
+        super().__init__(
+            message=f"El modelo '{model_name}' no esta disponible",
+            error_code="UNKNOWN_MODEL",
+            details={"available_models": available},  # para que el cliente sepa cuales puede usar
+        )
+
+
+# Se lanza cuando el proceso esta cerca de su presupuesto de memoria y rechaza trabajo pesado
+class MemoryPressureError(SentimentAPIException):
+    """
+    El servicio esta bajo presion de memoria
+    """
+
+    def __init__(self, pressure: str):
+        super().__init__(
+            message="El servicio esta cerca de su limite de memoria, reintentar en unos segundos",
+            error_code="MEMORY_PRESSURE",
+            details={"pressure": pressure},
+        )
+
+
+# Se lanza cuando el GET por hash no encuentra un resultado guardado en el store
+class ResultNotFoundError(SentimentAPIException):
+    """
+    No hay un resultado guardado para ese hash de texto
+    """
+
+    def __init__(self, text_hash: str):
+        super().__init__(
+            message="No hay un resultado guardado para ese hash: analizar el texto primero",
+            error_code="RESULT_NOT_FOUND",
+            details={"text_hash": text_hash},
+        )
+
+
+# Se lanza en modo router cuando ninguna instancia de la API puede atender el texto
+class NoBackendAvailableError(SentimentAPIException):
+    """
+    No hay backends sanos para reenviar el request
+    """
+
+    def __init__(self, backends: List[str]):
+        super().__init__(
+            message="No hay instancias disponibles para atender el request",
+            error_code="NO_BACKEND_AVAILABLE",
+            details={"backends": backends},
+        )
@@ -1,48 +1,172 @@
 """
 Configuracion de logging estructurado
 Critico para debugging en produccion
+
+Los logs NO se escriben en el hilo que los genera: van a una cola en memoria y un hilo
+de fondo (QueueListener) los formatea y los escribe. Asi un stdout lento (ej: un colector
+de logs saturado) no frena la inferencia.
 """
 
+import atexit
+import json
 import logging  # modulo de Python para registrar mensajes/eventos de la app
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
 
 from app.config import settings  # importa la config, ahi esta LOG_LEVEL
 
+# Plantilla que define como se ve cada linea de log
+# asctime=fecha, levelname=tipo (INFO/ERROR), name=modulo, lineno=linea
+TEXT_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d | %(message)s"
+
+# El listener activo (uno solo por proceso)
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como UNA linea JSON (facil de parsear para colectores de logs)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fraccion de los logs de INFO (o menos) de ciertos loggers.
+    rates = {"app.ml.pipeline": 0.01} → 1 de cada 100 logs INFO de ese modulo (y sus hijos).
+    WARNING y ERROR pasan siempre.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}  # nombre del logger → fraccion (ya resuelta)
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            # Gana la regla mas especifica: "app.ml.pipeline" antes que "app.ml"
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloquea ni formatea en el hilo que loguea.
+    - prepare() no arma el mensaje: el "%" se resuelve en el hilo de fondo, y solo
+      si el registro se llega a escribir.
+    - Si la cola esta llena, el registro se descarta (y se cuenta) en vez de esperar.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # La cola es en memoria del mismo proceso: no hace falta serializar el registro
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
-def setup_logging() -> None:
+def _use_json() -> bool:
+    """LOG_FORMAT = "json" / "text", o "auto" (JSON en produccion, texto legible en desarrollo)."""
+    log_format = settings.LOG_FORMAT.lower()
+    if log_format == "auto":
+        return settings.ENV == "production"
+    return log_format == "json"
+
+
+def setup_logging(stream: Optional[TextIO] = None) -> None:
     """
     Configura el logging de la aplicacion.
     En desarrollo: logs legibles para humanos
-    En produccion: cambiar a JSON para mejor parsing
+    En produccion: JSON, una linea por registro
+    stream = a donde se escriben los logs (por defecto stdout).
     """
-
-    # Plantilla que define como se ve cada linea de log
-    # asctime=fecha, levelname=tipo (INFO/ERROR), name=modulo, lineno=linea
-    log_format = "%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d | %(message)s"
+    global _listener
 
     # Convierte el string "INFO" a la constante logging.INFO (un numero que Python entiende)
     # Si el valor es invalido, usa INFO como fallback
     log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
 
     # Handler = a donde van los logs. StreamHandler(sys.stdout) = imprimirlos en la consola
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(logging.Formatter(log_format))  # le aplica el formato de arriba
+    # Este handler corre en el hilo del listener, no en el de los requests
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if _use_json() else logging.Formatter(TEXT_FORMAT))
 
-    # Root logger = el logger "padre" del que heredan todos los demas
+    # Si ya estaba configurado (ej: se llama dos veces), se reemplaza lo anterior
+    stop_logging()
     root_logger = logging.getLogger()
+    for old in [h for h in root_logger.handlers if isinstance(h, _NonBlockingQueueHandler)]:
+        root_logger.removeHandler(old)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    if settings.LOG_SAMPLING:
+        # El filtro va antes de la cola: un registro descartado no cuesta nada mas
+        queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+
+    # Root logger = el logger "padre" del que heredan todos los demas
     root_logger.setLevel(log_level)  # solo muestra mensajes de este nivel o mas graves
-    root_logger.addHandler(handler)
+    root_logger.addHandler(queue_handler)
 
     # Silencia logs de librerias externas para que no llenen la consola
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("transformers").setLevel(logging.WARNING)
 
 
+def stop_logging() -> None:
+    """Vacia la cola (escribe lo pendiente) y frena el hilo de logging."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Al salir del proceso se escriben los logs que quedaron en la cola
+atexit.register(stop_logging)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Obtiene un logger con el nombre especificado
     Uso:
         -  logger = get_logger(__name__)
-        -  logger.info("Mensaje")
+        -  logger.info("Mensaje %s", valor)  → el mensaje se arma solo si se escribe
     """
     return logging.getLogger(name)
@@ -18,7 +18,10 @@ from fastapi.responses import JSONResponse
 from app.api.v1.router import api_router
 from app.config import settings
 from app.core import SentimentAPIException, get_logger, setup_logging
-from app.ml import sentiment_model
+from app.ml import canary_monitor, cpu_planner, head_pruning, inference_batcher, sentiment_model
+from app.services.gc_tuning import gc_monitor, tune_gc
+from app.services.memory import MemoryMiddleware, memory_guard
+from app.services.profiler import ProfilingMiddleware
 
 # Configura el logging antes que todo lo demas
 setup_logging()
@@ -45,13 +48,39 @@ async def lifespan(app: FastAPI):
         if settings.ENV == "production":
             raise  # en produccion, si falla el modelo no arranca la app
 
+    # Lo que existe ahora (el modelo, el tokenizer, los modulos) vive hasta el final: fuera del
+    # GC. Desde aca se miden las pausas del GC por generacion (/admin/memory)
+    tune_gc()
+    gc_monitor.start()
+
+    # Threads de torch, pool de threads y batches en vuelo segun los cores disponibles.
+    # Bajo el lanzador pre-fork el plan ya viene armado (cubre todos los workers); con
+    # uvicorn suelto cada proceso se queda con su parte (uvicorn --workers / WEB_CONCURRENCY)
+    if cpu_planner.active_plan is None:
+        cpu_planner.active_plan = cpu_planner.plan_for_startup(
+            workers=cpu_planner.standalone_workers(),
+            torch_threads=settings.SERVE_TORCH_THREADS or None,
+        )
+    cpu_planner.apply_plan(cpu_planner.active_plan, inference_batcher)
+
+    # Vigila el RSS contra MEMORY_BUDGET_MB (no hace nada si no hay presupuesto)
+    memory_guard.start()
+    # Canary: mide la latencia del modelo en segundo plano (la lee /health/detailed)
+    canary_monitor.start()
+    # Modelos podados en disco: se leen una vez aca, /health/detailed solo lee la lista
+    head_pruning.refresh_pruned_models()
+
     logger.info("Aplicacion lista para recibir requests")
 
     yield  # la app esta corriendo, esperando requests
 
     # ---- SHUTDOWN ----
     logger.info("Apagando aplicacion...")
-    # Aqui va cualquier limpieza: cerrar conexiones a BD, liberar memoria, etc.
+    # Frena la cola de micro-batching (los textos pendientes se descartan)
+    await inference_batcher.stop()
+    memory_guard.stop()
+    canary_monitor.stop()
+    gc_monitor.stop()
     logger.info("Aplicacion apagada")
 
 
@@ -70,13 +99,22 @@ app = FastAPI(
 
 # CORS: permite que navegadores de otros dominios puedan llamar a la API
 # (sin esto, una pagina web en otro dominio no puede hacer requests a la API)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # en produccion, poner dominios especificos
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+if settings.CORS_ALLOW_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ALLOW_ORIGINS,  # en produccion, poner dominios especificos
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+# Profiling bajo demanda (/admin/profile): sin una sesion activa no agrega overhead
+app.add_middleware(ProfilingMiddleware)
+
+# Mide cuanto crece la memoria en cada request (ranking en /admin/memory). Cuesta dos lecturas
+# de /proc por request: solo con un presupuesto de memoria o MEMORY_TRACK_REQUESTS
+if settings.MEMORY_BUDGET_MB > 0 or settings.MEMORY_TRACK_REQUESTS:
+    app.add_middleware(MemoryMiddleware)
 
 # ---- EXCEPTION HANDLERS ----
 # Interceptan errores especificos y los convierten en respuestas JSON limpias
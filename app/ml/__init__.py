@@ -1,8 +1,11 @@
 """Machine Learning components."""
 
+from app.ml.batcher import InferenceBatcher, inference_batcher
+from app.ml.canary import CanaryMonitor, canary_monitor
 from app.ml.model import SentimentModel, sentiment_model
 from app.ml.pipeline import SentimentPipeline, sentiment_pipeline
 from app.ml.preprocessor import TextPreprocessor
+from app.ml.registry import ModelRegistry, model_registry
 
 __all__ = [
     "TextPreprocessor",
@@ -10,4 +13,10 @@ __all__ = [
     "sentiment_model",
     "SentimentPipeline",
     "sentiment_pipeline",
+    "InferenceBatcher",
+    "inference_batcher",
+    "ModelRegistry",
+    "model_registry",
+    "CanaryMonitor",
+    "canary_monitor",
 ]
@@ -0,0 +1,150 @@
+"""
+Autoajuste del micro-batching contra un objetivo de latencia (SLO_P99_MS).
+El mejor tamaño de batch depende del largo de los textos y de la carga, que cambian durante
+el dia: un valor fijo es lento con poca carga o desperdicia throughput en el pico.
+
+El controlador mira la latencia de cada texto dentro del batcher (espera en la cola + su
+batch por las etapas) y, cada AUTOTUNE_INTERVAL_S, ajusta max_batch_size y max_wait_ms
+del batcher con AIMD (como el control de congestion de TCP):
+  - p99 por encima del objetivo: baja multiplicativa (batch × 0.75, espera × 0.5)
+  - p99 con margen (< 80% del objetivo): suba aditiva. Si los batches salen llenos, el tope
+    es el que limita el throughput: +2 textos por batch. Si salen a medias, +0.5 ms de
+    espera para que se junten mas textos por forward pass
+  - en el medio: se mantiene
+La baja rapida y la suba lenta hacen que ronde el punto de mayor throughput dentro del SLO.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+_HEADROOM = 0.8  # por debajo de esta fraccion del objetivo se puede subir
+_DECREASE = 0.75  # factor de baja del tamaño de batch
+_WAIT_DECREASE = 0.5  # factor de baja de la espera
+_BATCH_STEP = 2  # suba aditiva del tamaño de batch
+_WAIT_STEP_MS = 0.5  # suba aditiva de la espera
+_FULL_BATCH = 0.9  # batches con este llenado promedio (o mas) se consideran llenos
+_MIN_SAMPLES = 20  # con menos textos en el intervalo no se decide (el p99 no es confiable)
+_DECISIONS = 50  # ultimas decisiones guardadas para /admin/autotuner
+
+
+class BatchAutotuner:
+    """Controlador AIMD de max_batch_size / max_wait_ms para un InferenceBatcher."""
+
+    def __init__(
+        self,
+        slo_p99_ms: float,
+        max_batch_size: int,
+        max_wait_ms: float,
+        interval_s: Optional[float] = None,
+        batch_size_ceiling: Optional[int] = None,
+        wait_ceiling_ms: Optional[float] = None,
+    ):
+        self.slo_p99_ms = slo_p99_ms
+        self.interval_s = interval_s if interval_s is not None else settings.AUTOTUNE_INTERVAL_S
+        self.batch_size_ceiling = batch_size_ceiling or settings.AUTOTUNE_MAX_BATCH_SIZE
+        self.wait_ceiling_ms = (
+            wait_ceiling_ms if wait_ceiling_ms is not None else settings.AUTOTUNE_MAX_WAIT_MS
+        )
+
+        # Valores vigentes (el batcher los lee en cada batch)
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        # Observaciones del intervalo en curso
+        self._latencies: List[float] = []
+        self._texts = 0
+        self._capacity = 0  # suma de max_batch_size de cada batch observado (para el llenado)
+        self._interval_start = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._decisions: deque = deque(maxlen=_DECISIONS)
+        self._counts = {"increase_batch": 0, "increase_wait": 0, "decrease": 0, "hold": 0}
+        self._last_p99: Optional[float] = None
+
+    def observe(self, latencies_ms: List[float], capacity: int) -> None:
+        """
+        Registra un batch: la latencia de cada texto y el tamaño maximo con que se armo.
+        Al cerrar el intervalo decide el ajuste (barato: un percentil sobre el intervalo).
+        """
+        with self._lock:
+            self._latencies += latencies_ms
+            self._texts += len(latencies_ms)
+            self._capacity += capacity
+            if time.monotonic() - self._interval_start < self.interval_s:
+                return
+            if len(self._latencies) < _MIN_SAMPLES:
+                return  # poco trafico: el intervalo se estira hasta tener muestras
+            self._adjust()
+
+    def _adjust(self) -> None:
+        p99 = float(np.percentile(self._latencies, 99))
+        fill = self._texts / self._capacity if self._capacity else 0.0
+
+        if p99 > self.slo_p99_ms:
+            action = "decrease"
+            self.max_batch_size = max(1, int(self.max_batch_size * _DECREASE))
+            self.max_wait_ms = round(self.max_wait_ms * _WAIT_DECREASE, 3)
+        elif p99 < self.slo_p99_ms * _HEADROOM and fill >= _FULL_BATCH:
+            action = "increase_batch"
+            self.max_batch_size = min(self.batch_size_ceiling, self.max_batch_size + _BATCH_STEP)
+        elif p99 < self.slo_p99_ms * _HEADROOM and self.max_wait_ms < self.wait_ceiling_ms:
+            action = "increase_wait"
+            self.max_wait_ms = min(self.wait_ceiling_ms, self.max_wait_ms + _WAIT_STEP_MS)
+        else:
+            action = "hold"
+
+        self._counts[action] += 1
+        self._last_p99 = p99
+        self._decisions.append(
+            {
+                "at": time.time(),
+                "action": action,
+                "p99_ms": round(p99, 2),
+                "fill": round(fill, 3),
+                "texts": self._texts,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+            }
+        )
+        if action != "hold":
+            logger.info(
+                "Autotuner: %s (p99 %.1f ms, objetivo %.1f ms, llenado %.2f) → batch %d, espera %.2f ms",
+                action,
+                p99,
+                self.slo_p99_ms,
+                fill,
+                self.max_batch_size,
+                self.max_wait_ms,
+            )
+
+        self._latencies = []
+        self._texts = 0
+        self._capacity = 0
+        self._interval_start = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slo_p99_ms": self.slo_p99_ms,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "last_p99_ms": round(self._last_p99, 2) if self._last_p99 is not None else None,
+                "decisions": dict(self._counts),
+                "recent": list(self._decisions),
+            }
+
+
+def create_autotuner(max_batch_size: int, max_wait_ms: float) -> Optional[BatchAutotuner]:
+    """Crea el controlador segun la configuracion. Si SLO_P99_MS es 0, devuelve None."""
+    if settings.SLO_P99_MS <= 0:
+        return None
+    return BatchAutotuner(settings.SLO_P99_MS, max_batch_size, max_wait_ms)
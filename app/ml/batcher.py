@@ -0,0 +1,235 @@
+"""
+Micro-batching de inferencias.
+Junta textos que llegan de MUCHOS clientes (requests, sockets) en una cola comun y los manda
+al modelo en un solo forward pass. Asi el costo fijo de cada llamada al modelo se reparte
+entre todos los textos del batch.
+La cola no es FIFO: el FairScheduler reparte los lugares de cada batch entre los clientes
+segun su peso y el costo (tokens) de sus textos.
+Con SLO_P99_MS configurado, el BatchAutotuner ajusta el tamaño de batch y la espera en
+marcha para mantener el p99 dentro del objetivo.
+Los batches corren en StagedInference: mientras uno esta en el modelo, el siguiente ya se
+esta tokenizando y el anterior postprocesando.
+"""
+
+import asyncio
+from contextlib import ExitStack
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core import get_logger
+from app.ml.autotuner import BatchAutotuner, create_autotuner
+from app.ml.model import SentimentModel
+from app.ml.registry import ModelRegistry, model_registry
+from app.ml.scheduler import FairScheduler, estimate_tokens
+from app.ml.stages import STAGES, StagedInference
+from app.services.memory import memory_guard
+
+logger = get_logger(__name__)
+
+# Cliente de los textos que llegan sin identificacion
+DEFAULT_CLIENT = "anonymous"
+
+
+# dataclass = clase que solo guarda datos (Python genera __init__ automaticamente)
+@dataclass
+class _WorkItem:
+    """Un texto esperando en la cola, con el future donde se va a dejar su resultado."""
+
+    text: str
+    model_name: str  # que modelo del registry lo tiene que predecir
+    future: asyncio.Future
+    enqueued: float  # loop.time() al encolarse (latencia dentro del batcher)
+
+
+class InferenceBatcher:
+    """
+    Cola de inferencia compartida.
+    submit() encola UN texto y espera su resultado; una tarea de fondo arma batches
+    de hasta max_batch_size textos (o lo que llegue en max_wait_ms) y los corre juntos.
+    Cuando hay mas textos en cola que lugares en el batch, el scheduler decide cuales entran.
+    Si en un batch hay textos para distintos modelos, se agrupan: un forward pass por modelo.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[ModelRegistry] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        scheduler: Optional[FairScheduler] = None,
+        autotuner: Optional[BatchAutotuner] = None,
+    ):
+        self.registry = registry or model_registry
+        self.scheduler = scheduler or FairScheduler()
+        self.max_batch_size = max_batch_size or settings.BATCH_MAX_SIZE
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else settings.BATCH_MAX_WAIT_MS
+        # Si hay autotuner, el tamaño y la espera de cada batch salen de el (arrancan en estos)
+        self.autotuner = autotuner or create_autotuner(self.max_batch_size, self.max_wait_ms)
+
+        # Un hilo por etapa; el forward pass es uno solo a la vez (torch ya lo paraleliza adentro)
+        self.stages = StagedInference(name="microbatch")
+        # Batches en vuelo: uno por etapa mas los que esperan en las colas entre etapas. Con mas
+        # solo se acumularian batches chicos; con menos, alguna etapa quedaria ociosa.
+        # El plan de CPU lo ajusta segun el perfil (ver cpu_planner)
+        self.max_inflight = len(STAGES) + self.stages.queue_size
+        self._slots: Optional[asyncio.Semaphore] = None  # batches en vuelo por las etapas
+        self._ready: Optional[asyncio.Event] = None  # avisa que se encolo algo
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_started(self) -> None:
+        """
+        Arranca la tarea de fondo la primera vez que se usa (lazy).
+        Si el event loop cambio (ej: en los tests cada cliente tiene su propio loop),
+        crea una cola y una tarea nuevas para el loop actual.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        # Los items que quedaron del loop anterior no se pueden resolver desde este
+        self.scheduler.clear()
+        self._task = loop.create_task(self._run(), name="inference-batcher")
+
+    async def submit(
+        self, text: str, model_name: Optional[str] = None, client_id: Optional[str] = None
+    ) -> dict:
+        """
+        Encola un texto (ya preprocesado) y espera su prediccion.
+        client_id = quien lo pide (para el reparto justo de la cola).
+        """
+        self._ensure_started()
+        assert self._ready is not None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        model_name = model_name or self.registry.default_model.model_name
+        self.scheduler.push(
+            _WorkItem(text=text, model_name=model_name, future=future, enqueued=loop.time()),
+            client_id or DEFAULT_CLIENT,
+            estimate_tokens(text),
+        )
+        self._ready.set()
+        return await future
+
+    async def stop(self) -> None:
+        """Frena la tarea de fondo (se llama al apagar la app)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        """Loop de fondo: arma un batch, lo ejecuta y vuelve a empezar."""
+        assert self._ready is not None and self._slots is not None
+        while True:
+            # Sin lugar en las etapas no se arma el batch: mientras tanto se juntan mas textos
+            await self._slots.acquire()
+            max_batch_size, max_wait_ms = self._limits()
+            batch = await self._collect_batch(self._ready, max_batch_size, max_wait_ms)
+            self._dispatch(batch, max_batch_size)
+
+    def _limits(self) -> Tuple[int, float]:
+        """Tamaño maximo y espera del proximo batch."""
+        if self.autotuner is not None:
+            max_batch_size, max_wait_ms = self.autotuner.max_batch_size, self.autotuner.max_wait_ms
+        else:
+            max_batch_size, max_wait_ms = self.max_batch_size, self.max_wait_ms
+        # Bajo presion de memoria los batches se achican (las activaciones crecen con el batch)
+        return memory_guard.batch_size_limit(max_batch_size), max_wait_ms
+
+    async def _collect_batch(
+        self, ready: asyncio.Event, max_batch_size: int, max_wait_ms: float
+    ) -> List[_WorkItem]:
+        """
+        Espera el primer item y despues deja que se junten mas durante max_wait_ms
+        (o hasta tener max_batch_size). Recien ahi saca los items, en el orden del scheduler:
+        asi el batch se reparte entre todos los clientes que tienen textos en cola.
+        """
+        loop = asyncio.get_running_loop()
+        scheduler = self.scheduler
+        while not scheduler:
+            ready.clear()
+            await ready.wait()
+
+        deadline = loop.time() + max_wait_ms / 1000
+        # Con la cola ya llena (ej: un cliente bulk) no se espera: el batch sale enseguida
+        while len(scheduler) < max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            ready.clear()
+            try:
+                await asyncio.wait_for(ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+        return [scheduler.pop() for _ in range(min(max_batch_size, len(scheduler)))]
+
+    def _dispatch(self, batch: List[_WorkItem], max_batch_size: int) -> None:
+        """
+        Manda el batch a las etapas (sin esperar el resultado: el loop sigue armando el proximo)
+        y reparte las predicciones a medida que van saliendo.
+        """
+        assert self._slots is not None
+        # Si el cliente se fue (ej: cerro el socket) su future esta cancelado: no vale la pena predecir
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            self._slots.release()
+            return
+
+        # Agrupa por modelo: cada grupo es UN forward pass
+        groups: Dict[str, List[_WorkItem]] = {}
+        for item in batch:
+            groups.setdefault(item.model_name, []).append(item)
+
+        futures = []
+        for model_name, items in groups.items():
+            future = asyncio.wrap_future(
+                self.stages.submit([i.text for i in items], partial(self._open_model, model_name))
+            )
+            future.add_done_callback(partial(self._deliver, items))
+            futures.append(future)
+
+        # El lugar se libera cuando terminan todos los grupos del batch
+        done = asyncio.gather(*futures, return_exceptions=True)
+        done.add_done_callback(partial(self._batch_done, batch, max_batch_size))
+
+        logger.debug("Batch enviado: %d textos, %d modelo(s)", len(batch), len(groups))
+
+    def _batch_done(self, batch: List[_WorkItem], max_batch_size: int, _: asyncio.Future) -> None:
+        assert self._slots is not None
+        self._slots.release()
+        if self.autotuner is not None:
+            now = asyncio.get_running_loop().time()
+            self.autotuner.observe([(now - item.enqueued) * 1000 for item in batch], max_batch_size)
+
+    def _open_model(self, model_name: str, stack: ExitStack) -> SentimentModel:
+        """Corre en el hilo del tokenizer: pide el modelo al registry (prestado hasta el forward)."""
+        return stack.enter_context(self.registry.use(model_name))
+
+    @staticmethod
+    def _deliver(items: List[_WorkItem], future: "asyncio.Future[List[dict]]") -> None:
+        """Reparte el resultado de un grupo entre los futures de sus textos."""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(error)
+            return
+        for item, prediction in zip(items, future.result()):
+            if not item.future.done():
+                item.future.set_result(prediction)
+
+
+# Instancia global, compartida por todos los endpoints y sockets
+inference_batcher = InferenceBatcher()
@@ -0,0 +1,101 @@
+"""
+Inferencia canary en segundo plano.
+Cada CANARY_INTERVAL_S corre el modelo sobre un texto fijo (sin pasar por los caches) y
+mide cuanto tarda. Asi /health/detailed sabe si la inferencia esta rapida AHORA, aunque
+no haya trafico, sin correr el modelo dentro del health check.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+from app.core import get_logger
+from app.ml.registry import ModelRegistry, model_registry
+from app.services.latency import RollingLatency, traffic_latency
+
+logger = get_logger(__name__)
+
+
+class CanaryMonitor:
+    """
+    Hilo de fondo que corre el canary y recalcula los percentiles de latencia
+    (canary y trafico real). El resultado queda en report, listo para leer en O(1).
+    """
+
+    def __init__(
+        self,
+        registry: Optional[ModelRegistry] = None,
+        interval_s: Optional[float] = None,
+        text: Optional[str] = None,
+        traffic: Optional[RollingLatency] = None,
+    ):
+        self.registry = registry or model_registry
+        self.interval_s = interval_s if interval_s is not None else settings.CANARY_INTERVAL_S
+        self.text = text or settings.CANARY_TEXT
+        self.traffic = traffic or traffic_latency
+        self.canary = RollingLatency(settings.LATENCY_WINDOW_S)
+
+        # Reporte precalculado: se reemplaza entero en cada tick (asignar un dict es atomico)
+        self.report: dict = {"state": "not_started"}
+        self._last: dict = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_s <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="canary", daemon=True)
+        self._thread.start()
+        logger.info("Canary activo: cada %.1f s", self.interval_s)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while True:
+            self.tick()
+            if self._stop.wait(self.interval_s):
+                break
+
+    def tick(self) -> None:
+        """Corre el canary una vez y recalcula el reporte."""
+        self._run_canary()
+        self.report = {
+            "state": "running",
+            "interval_s": self.interval_s,
+            "canary": {**self.canary.snapshot(), **self._last},
+            "traffic": self.traffic.snapshot(),
+        }
+
+    def _run_canary(self) -> None:
+        name = self.registry.default_model.model_name
+        start = time.perf_counter()
+        try:
+            with self.registry.use(name) as model:
+                if not model.is_loaded:
+                    self._last = {"last_at": time.time(), "last_error": "model not loaded"}
+                    return
+                # Directo al modelo: un hit de cache no diria nada de la latencia de inferencia
+                model.predict_batch([self.text])
+        except Exception as e:
+            logger.warning("Canary fallido: %s", e)
+            self._last = {"last_at": time.time(), "last_error": str(e)}
+            return
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.canary.record(latency_ms)
+        self._last = {"last_at": time.time(), "last_ms": round(latency_ms, 2), "last_error": None}
+
+    def is_healthy(self) -> bool:
+        """El ultimo canary anduvo y no esta viejo (el hilo sigue vivo)."""
+        canary = self.report.get("canary")
+        if canary is None:
+            return True  # todavia no corrio (o esta desactivado): no hay nada que reportar
+        stale = time.time() - canary.get("last_at", 0) > 3 * self.interval_s
+        return canary.get("last_error") is None and not stale
+
+
+# Instancia global
+canary_monitor = CanaryMonitor()
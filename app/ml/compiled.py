@@ -0,0 +1,186 @@
+"""
+Modo de ejecucion compilado (TorchScript).
+El clasificador se "traza" una vez por cada largo de secuencia (bucket) y despues se corre
+el grafo compilado, sin el overhead de Python del Pipeline de HuggingFace ni del modo eager.
+Los grafos se guardan en MODEL_CACHE_DIR para que los siguientes arranques no recompilen.
+"""
+
+import hashlib
+import json
+import os
+import re
+import warnings
+from typing import Dict, List, Optional
+
+import torch
+import transformers
+from transformers import PreTrainedModel, PreTrainedTokenizerBase
+
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Tolerancia al comparar la salida del grafo compilado contra el modelo eager
+_VALIDATION_ATOL = 1e-4
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Envuelve al modelo para que devuelva solo el tensor de logits (trace no acepta dicts)."""
+
+    def __init__(self, model: PreTrainedModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+class CompiledClassifier:
+    """
+    Clasificador con un grafo TorchScript por bucket de largo de secuencia.
+
+    Cada batch se tokeniza, se rellena (padding) hasta el bucket mas chico que lo contiene y
+    se corre en el grafo de ese bucket. Si el batch es mas largo que el bucket mas grande
+    (o ese bucket no se pudo compilar), se corre en modo eager con el modelo original.
+    """
+
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizerBase,
+        buckets: List[int],
+        cache_dir: Optional[str] = None,
+        cache_key: str = "",
+    ):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.cache_dir = cache_dir
+        self.cache_key = cache_key
+        # Un bucket mas largo que lo que acepta el modelo no sirve
+        max_length = getattr(model.config, "max_position_embeddings", None) or max(buckets)
+        self.buckets = sorted({b for b in buckets if 0 < b <= max_length})
+        self.max_length = max_length
+        self.pad_token_id = tokenizer.pad_token_id or 0
+
+        self._graphs: Dict[int, torch.jit.ScriptModule] = {}
+        for bucket in self.buckets:
+            graph = self._load_or_trace(bucket)
+            if graph is not None:
+                self._graphs[bucket] = graph
+
+        logger.info(f"Modo compilado listo: buckets {sorted(self._graphs)} (resto en eager)")
+
+    # ---- Compilacion ----
+
+    def _artifact_path(self, bucket: int) -> Optional[str]:
+        """Archivo donde se guarda el grafo de un bucket (None = sin cache en disco)."""
+        if not self.cache_dir:
+            return None
+        # El nombre lleva un hash del modelo + versiones: si cambia algo, no se reusa un grafo viejo
+        fingerprint = json.dumps(
+            [self.cache_key, torch.__version__, transformers.__version__, bucket]
+        )
+        digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.cache_key)[-64:]
+        return os.path.join(self.cache_dir, "compiled", f"{safe_name}-{bucket}-{digest}.pt")
+
+    def _load_or_trace(self, bucket: int) -> Optional[torch.jit.ScriptModule]:
+        """Carga el grafo del cache en disco, o lo traza y lo guarda."""
+        path = self._artifact_path(bucket)
+        if path and os.path.exists(path):
+            try:
+                graph = torch.jit.load(path, map_location="cpu")
+                logger.debug(f"Grafo compilado cargado del cache: {path}")
+                return graph
+            except Exception as e:
+                logger.warning(f"Grafo en cache invalido ({path}), se vuelve a compilar: {e}")
+
+        try:
+            graph = self._trace(bucket)
+        except Exception as e:
+            logger.warning(f"No se pudo compilar el bucket {bucket}, queda en eager: {e}")
+            return None
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Se escribe a un temporal y se renombra: otro worker nunca ve un archivo a medias
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                torch.jit.save(graph, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"No se pudo guardar el grafo compilado en {path}: {e}")
+
+        return graph
+
+    def _trace(self, bucket: int) -> torch.jit.ScriptModule:
+        """Traza el modelo para un largo fijo y verifica que de lo mismo que el eager."""
+        wrapper = _LogitsOnly(self.model)
+        example = self._dummy_inputs(batch_size=2, length=bucket)
+
+        with torch.inference_mode(False), torch.no_grad(), warnings.catch_warnings():
+            # trace avisa de cada operacion que depende de la forma del input: esperado
+            warnings.simplefilter("ignore")
+            graph = torch.jit.trace(wrapper, example, check_trace=False)
+            graph = torch.jit.freeze(graph.eval())
+
+        # Se valida con OTRO tamaño de batch: el grafo tiene que generalizar en esa dimension
+        check = self._dummy_inputs(batch_size=3, length=bucket)
+        with torch.inference_mode():
+            expected = wrapper(*check)
+            actual = graph(*check)
+        if actual.shape != expected.shape or not torch.allclose(
+            actual, expected, atol=_VALIDATION_ATOL
+        ):
+            raise RuntimeError("la salida del grafo no coincide con el modelo eager")
+
+        return graph
+
+    def _dummy_inputs(self, batch_size: int, length: int) -> tuple:
+        """Inputs de ejemplo con algo de padding (para que la mascara tambien se ejercite)."""
+        input_ids = (
+            torch.randint(1000, 2000, (batch_size, length), dtype=torch.long)
+            % self.model.config.vocab_size
+        )
+        attention_mask = torch.ones((batch_size, length), dtype=torch.long)
+        attention_mask[0, length // 2 :] = 0
+        input_ids[0, length // 2 :] = self.pad_token_id
+        return input_ids, attention_mask
+
+    # ---- Inferencia ----
+
+    def logits(self, texts: List[str]) -> torch.Tensor:
+        """Devuelve la matriz de logits (len(texts) x num_labels)."""
+        return self.forward(self.encode(texts))
+
+    def encode(self, texts: List[str]) -> dict:
+        """
+        Tokeniza el batch y lo rellena hasta el bucket mas chico donde entra.
+        Es la etapa de CPU "pura": se puede correr en otro hilo mientras el modelo corre otro batch.
+        """
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+        input_ids = encoded["input_ids"]
+        attention_mask = encoded["attention_mask"]
+        length = input_ids.shape[1]
+
+        # El bucket mas chico donde entra el batch
+        bucket = next((b for b in self.buckets if b >= length and b in self._graphs), None)
+        if bucket is not None and bucket > length:
+            pad = bucket - length
+            input_ids = torch.nn.functional.pad(input_ids, (0, pad), value=self.pad_token_id)
+            attention_mask = torch.nn.functional.pad(attention_mask, (0, pad), value=0)
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "bucket": bucket}
+
+    def forward(self, encoded: dict) -> torch.Tensor:
+        """Corre un batch ya tokenizado (por encode) en el grafo de su bucket, o en eager."""
+        input_ids, attention_mask = encoded["input_ids"], encoded["attention_mask"]
+        with torch.inference_mode():
+            if encoded["bucket"] is None:
+                return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+            return self._graphs[encoded["bucket"]](input_ids, attention_mask)
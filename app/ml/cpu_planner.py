@@ -0,0 +1,304 @@
+"""
+Planificador de CPU: cuantos workers, cuantos threads de torch por worker y cuantos batches
+en vuelo, segun los cores que el proceso REALMENTE puede usar.
+
+os.cpu_count() devuelve los cores del nodo, no los del contenedor: con un limite de 2 CPUs
+(cgroup) en un nodo de 32 cores, torch arranca 32 threads por worker que se pelean por 2
+cores. Aca se cuentan los cores usables como el minimo entre la afinidad del proceso
+(sched_getaffinity) y la cuota del cgroup (cpu.max en v2, cpu.cfs_quota_us en v1).
+
+Con esos cores se arma un plan segun CPU_PROFILE:
+  - latency:    pocos workers con varios threads cada uno: cada request individual sale antes
+  - throughput: un worker por core con 1 thread de torch: mas textos por segundo en total
+                (los threads de torch escalan mal con batches chicos)
+
+Opcionalmente se calibra (python -m app.serve --calibrate): se mide el modelo cargado con
+cada cantidad de threads candidata y el mejor plan se guarda en MODEL_CACHE_DIR/cpu_plan.json.
+Los arranques siguientes lo usan si coincide con los cores, el perfil y el modelo.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import anyio.to_thread
+import torch
+
+from app.config import settings
+from app.core import get_logger
+from app.ml.batcher import InferenceBatcher
+from app.ml.stages import STAGES
+
+logger = get_logger(__name__)
+
+PROFILES = ("latency", "throughput")
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+# En el perfil de latencia: mas de 4 threads por forward pass casi no mejora la latencia
+# de DistilBERT con textos cortos (hay poco trabajo para repartir), y deja workers sin cores
+_LATENCY_MAX_THREADS = 4
+_PLAN_FILE = "cpu_plan.json"
+_CALIBRATION_TEXT = "The product arrived on time and works exactly as described, very happy."
+_CALIBRATION_BATCH = 16
+
+
+@dataclass
+class CpuPlan:
+    """Resultado del planificador."""
+
+    profile: str
+    cpus: int  # cores usables (afinidad y cuota del cgroup)
+    workers: int  # procesos (python -m app.serve)
+    torch_threads: int  # threads de torch (intra-op) por worker
+    inference_concurrency: int  # batches en vuelo por las etapas de inferencia, por worker
+    threadpool_size: int  # threads del pool de anyio (endpoints/dependencias sincronicas)
+    source: str = "heuristic"  # "heuristic", "manual" (workers/threads fijados) o "calibrated"
+    measurements: List[dict] = field(default_factory=list)  # solo si se calibro
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# ---- Cores disponibles ----
+
+
+def cgroup_cpu_quota(root: str = _CGROUP_ROOT) -> Optional[float]:
+    """Cuota de CPU del cgroup en cores (ej: 1.5). None si no hay limite."""
+    # cgroup v2: "cuota periodo" o "max periodo"
+    try:
+        quota, period = Path(root, "cpu.max").read_text().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1: cuota -1 = sin limite
+    for controller in ("cpu", "cpu,cpuacct"):
+        try:
+            quota_us = int(Path(root, controller, "cpu.cfs_quota_us").read_text())
+            period_us = int(Path(root, controller, "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        return quota_us / period_us if quota_us > 0 and period_us > 0 else None
+    return None
+
+
+def available_cpus(root: str = _CGROUP_ROOT) -> Tuple[int, int, Optional[float]]:
+    """(cores usables, cores en la afinidad del proceso, cuota del cgroup)."""
+    if hasattr(os, "sched_getaffinity"):
+        affinity = len(os.sched_getaffinity(0))
+    else:
+        affinity = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    # Cuota fraccionaria (ej: 2.5) → 2: con 3 workers el cgroup los frenaria (throttling)
+    usable = min(affinity, max(1, math.floor(quota))) if quota else affinity
+    return max(1, usable), affinity, quota
+
+
+# ---- Plan ----
+
+
+def make_plan(
+    cpus: int,
+    profile: str,
+    workers: Optional[int] = None,
+    torch_threads: Optional[int] = None,
+) -> CpuPlan:
+    """
+    Arma el plan para `cpus` cores. workers/torch_threads fijan ese valor (ej: los pasaron
+    por linea de comandos) y el planificador reparte el resto de los cores.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"CPU_PROFILE invalido: {profile!r} (opciones: {', '.join(PROFILES)})")
+
+    source = "manual" if workers or torch_threads else "heuristic"
+    if not torch_threads:
+        if workers:
+            torch_threads = max(1, cpus // workers)
+        elif profile == "latency":
+            torch_threads = min(cpus, _LATENCY_MAX_THREADS)
+        else:
+            torch_threads = 1
+    workers = workers or max(1, cpus // torch_threads)
+
+    # Latencia: un batch por etapa, sin cola entre etapas (un batch encolado es espera pura).
+    # Throughput: ademas los que entran en las colas entre etapas, asi ninguna queda ociosa
+    if profile == "latency":
+        inference_concurrency = len(STAGES)
+    else:
+        inference_concurrency = len(STAGES) + settings.PIPELINE_QUEUE_SIZE
+
+    return CpuPlan(
+        profile=profile,
+        cpus=cpus,
+        workers=workers,
+        torch_threads=torch_threads,
+        inference_concurrency=inference_concurrency,
+        # El pool de anyio (40 threads por defecto) compite con torch por los mismos cores
+        threadpool_size=max(4, 2 * torch_threads),
+        source=source,
+    )
+
+
+def plan_path() -> Path:
+    return Path(settings.MODEL_CACHE_DIR) / _PLAN_FILE
+
+
+def load_plan(path: Path, cpus: int, profile: str, model_name: str) -> Optional[CpuPlan]:
+    """Plan calibrado guardado, si existe y se calibro con estos cores, perfil y modelo."""
+    try:
+        data = json.loads(path.read_text())
+        if (data["cpus"], data["profile"], data["model_name"]) != (cpus, profile, model_name):
+            return None
+        return CpuPlan(**data["plan"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_plan(plan: CpuPlan, path: Path, model_name: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "cpus": plan.cpus,
+        "profile": plan.profile,
+        "model_name": model_name,
+        "plan": plan.to_dict(),
+    }
+    # Se escribe aparte y se renombra: un arranque en paralelo nunca lee un JSON a medias
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+def standalone_workers(argv: Optional[List[str]] = None) -> int:
+    """
+    Cuantos procesos levanto uvicorn suelto (sin el lanzador pre-fork), para que cada uno
+    use su parte de los cores: `--workers N` en la linea de comandos (los workers de uvicorn
+    heredan sys.argv del padre) o WEB_CONCURRENCY, que es el default de uvicorn para --workers.
+    """
+    argv = sys.argv if argv is None else argv
+    value = os.environ.get("WEB_CONCURRENCY")
+    for i, arg in enumerate(argv):
+        if arg == "--workers" and i + 1 < len(argv):
+            value = argv[i + 1]
+        elif arg.startswith("--workers="):
+            value = arg.split("=", 1)[1]
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.warning("Cantidad de workers invalida: %r", value)
+
+    # No se sabe cuantos hay: si este proceso es hijo de otro (uvicorn con varios workers),
+    # cada uno va a planificar para todos los cores
+    if multiprocessing.parent_process() is not None:
+        logger.warning(
+            "No se pudo leer la cantidad de workers de uvicorn: se planifica como si fuera "
+            "uno solo. Definir WEB_CONCURRENCY o usar python -m app.serve"
+        )
+    return 1
+
+
+def plan_for_startup(
+    workers: Optional[int] = None,
+    torch_threads: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> CpuPlan:
+    """
+    El plan para este arranque: si se fijaron workers o threads, se respetan; si no, el plan
+    calibrado (si coincide) o el heuristico.
+    """
+    profile = profile or settings.CPU_PROFILE
+    cpus, affinity, quota = available_cpus()
+    plan = None
+    if not workers and not torch_threads:
+        plan = load_plan(plan_path(), cpus, profile, settings.MODEL_NAME)
+    if plan is None:
+        plan = make_plan(cpus, profile, workers=workers, torch_threads=torch_threads)
+    logger.info(
+        "Plan de CPU (%s, %s): %d cores usables (afinidad %d, cuota %s) → %d workers × "
+        "%d threads de torch, %d batches en vuelo, pool de %d threads",
+        plan.profile,
+        plan.source,
+        cpus,
+        affinity,
+        f"{quota:g}" if quota else "sin limite",
+        plan.workers,
+        plan.torch_threads,
+        plan.inference_concurrency,
+        plan.threadpool_size,
+    )
+    return plan
+
+
+# Plan que armo el lanzador antes de forkear (los workers lo heredan). None = proceso suelto
+active_plan: Optional[CpuPlan] = None
+
+
+def apply_plan(plan: CpuPlan, batcher: InferenceBatcher) -> None:
+    """
+    Aplica el plan en el proceso actual. Se llama dentro del event loop (en el lifespan):
+    el pool de threads de anyio es por loop.
+    """
+    torch.set_num_threads(plan.torch_threads)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = plan.threadpool_size
+    batcher.max_inflight = plan.inference_concurrency
+
+
+# ---- Calibracion ----
+
+
+def _measure(model, threads: int, rounds: int) -> dict:
+    """Latencia de un texto suelto y textos/s con batches, usando `threads` threads de torch."""
+    torch.set_num_threads(threads)
+    batch = [_CALIBRATION_TEXT] * _CALIBRATION_BATCH
+    model.predict_batch(batch)  # warm-up
+
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        model.predict_batch([_CALIBRATION_TEXT])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.predict_batch(batch)
+    per_worker = rounds * len(batch) / (time.perf_counter() - start)
+    return {
+        "torch_threads": threads,
+        "latency_ms": round(statistics.median(latencies), 2),
+        "texts_per_s_per_worker": round(per_worker, 1),
+    }
+
+
+def calibrate(model, cpus: int, profile: str, rounds: int = 10) -> CpuPlan:
+    """
+    Mide el modelo cargado con 1, 2, 4... threads de torch (hasta `cpus`) y elige segun el
+    perfil: la menor latencia de un texto, o la mayor cantidad de textos/s del nodo entero
+    (textos/s de un worker × los workers que entran). Mide en este proceso, uno a la vez:
+    supone que los workers escalan lineal, que es lo esperable si no comparten cores.
+    """
+    candidates = sorted({2**i for i in range(cpus.bit_length()) if 2**i <= cpus} | {cpus})
+    measurements = []
+    for threads in candidates:
+        result = _measure(model, threads, rounds)
+        result["texts_per_s_total"] = round(result["texts_per_s_per_worker"] * (cpus // threads), 1)
+        measurements.append(result)
+        logger.info("Calibracion: %s", result)
+
+    if profile == "latency":
+        # A igual latencia (±5%), la opcion con mas textos/s en total
+        fastest = min(m["latency_ms"] for m in measurements)
+        close = [m for m in measurements if m["latency_ms"] <= fastest * 1.05]
+        best = max(close, key=lambda m: m["texts_per_s_total"])
+    else:
+        best = max(measurements, key=lambda m: m["texts_per_s_total"])
+
+    plan = make_plan(cpus, profile, torch_threads=best["torch_threads"])
+    plan.source = "calibrated"
+    plan.measurements = measurements
+    return plan
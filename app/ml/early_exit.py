@@ -0,0 +1,268 @@
+"""
+Early exit: cortar el forward pass en la primera capa que ya esta segura.
+DistilBERT corre sus 6 capas para todos los textos, aunque en "I love it!" el sentimiento ya
+es obvio despues de la segunda. Aca se cuelga un clasificador liviano (una capa Linear sobre
+el token [CLS]) a la salida de las capas intermedias:
+
+  - Calibracion (offline, python -m app.cli early-exit corpus.txt): se corre el modelo
+    completo sobre textos propios SIN etiquetar y cada clasificador aprende a imitar la
+    prediccion de la ultima capa (destilacion: el objetivo son las probabilidades finales).
+    Se guarda en MODEL_CACHE_DIR/early_exit, con un reporte de cuantos textos saldrian en
+    cada capa y cuanto coinciden con el modelo completo para varios umbrales
+  - Inferencia (EARLY_EXIT_THRESHOLD > 0): despues de cada capa con clasificador, las filas
+    del batch con confianza >= umbral salen con esa prediccion y se sacan del batch: las
+    capas siguientes corren solo con las que quedan (y recortando el padding que sobra)
+
+Solo para modelos con la arquitectura de DistilBERT y en modo eager (los grafos compilados
+corren el modelo entero).
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+from torch import nn
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Umbrales que se evaluan en el reporte de calibracion
+REPORT_THRESHOLDS = (0.8, 0.9, 0.95, 0.99)
+
+
+def is_supported(model: nn.Module) -> bool:
+    """True si el modelo tiene la estructura de DistilBertForSequenceClassification."""
+    return hasattr(model, "distilbert") and hasattr(model, "pre_classifier")
+
+
+def heads_path(model_name: str) -> str:
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)[-64:]
+    return os.path.join(settings.MODEL_CACHE_DIR, "early_exit", f"{safe_name}.pt")
+
+
+class EarlyExitHeads(nn.Module):
+    """Un clasificador Linear(dim → clases) por capa intermedia (la clave es la profundidad)."""
+
+    def __init__(self, layers: List[int], dim: int, num_labels: int):
+        super().__init__()
+        self.layers = sorted(layers)
+        self.heads = nn.ModuleDict({str(layer): nn.Linear(dim, num_labels) for layer in layers})
+
+    def get(self, layer: int) -> Optional[nn.Linear]:
+        key = str(layer)
+        return self.heads[key] if key in self.heads else None
+
+
+def _final_logits(model: nn.Module, cls: torch.Tensor) -> torch.Tensor:
+    """El clasificador original del modelo sobre el [CLS] de la ultima capa (dropout = eval)."""
+    return model.classifier(torch.relu(model.pre_classifier(cls)))
+
+
+class EarlyExitRunner:
+    """Forward pass con salida temprana por fila."""
+
+    def __init__(self, model: nn.Module, heads: EarlyExitHeads, threshold: float):
+        self.model = model
+        self.heads = heads.eval()
+        self.threshold = threshold
+        self.num_layers = len(model.distilbert.transformer.layer)
+
+    def forward(self, inputs) -> Tuple[np.ndarray, np.ndarray]:
+        """(logits, capa de salida de cada fila). La capa final es num_layers."""
+        input_ids, mask = inputs["input_ids"], inputs["attention_mask"]
+        rows = input_ids.shape[0]
+        exit_layers = np.full(rows, self.num_layers, dtype=np.int64)
+
+        with torch.inference_mode():
+            hidden = self.model.distilbert.embeddings(input_ids)
+            logits: Optional[torch.Tensor] = None
+            active = torch.arange(rows)  # filas del batch original que siguen corriendo
+
+            for depth, layer in enumerate(self.model.distilbert.transformer.layer, start=1):
+                hidden = layer(hidden, mask, None, False)[-1]
+
+                if depth == self.num_layers:
+                    final = _final_logits(self.model, hidden[:, 0])
+                    if logits is None:
+                        logits = final  # ninguna fila salio antes
+                    else:
+                        logits[active] = final
+                    break
+
+                head = self.heads.get(depth)
+                if head is None:
+                    continue
+                head_logits = head(hidden[:, 0])
+                done = torch.softmax(head_logits, dim=1).max(dim=1).values >= self.threshold
+                if not done.any():
+                    continue
+
+                if logits is None:
+                    logits = torch.empty(rows, head_logits.shape[1], dtype=head_logits.dtype)
+                logits[active[done]] = head_logits[done]
+                exit_layers[active[done].numpy()] = depth
+
+                keep = ~done
+                if not keep.any():
+                    break
+                # Las filas que salieron no siguen; el padding que ya no usa nadie, tampoco
+                active, hidden, mask = active[keep], hidden[keep], mask[keep]
+                length = int(mask.sum(dim=1).max())
+                hidden, mask = hidden[:, :length], mask[:, :length]
+
+        assert logits is not None
+        return logits.float().numpy(), exit_layers
+
+
+# ---- Calibracion ----
+
+
+def _collect(
+    pipe, texts: List[str], batch_size: int
+) -> Tuple[Dict[int, torch.Tensor], torch.Tensor]:
+    """[CLS] de cada capa (profundidad → N × dim) y probabilidades finales del modelo (N × clases)."""
+    model, tokenizer = pipe.model, pipe.tokenizer
+    cls_by_layer: Dict[int, List[torch.Tensor]] = {}
+    probabilities = []
+    with torch.inference_mode():
+        for i in range(0, len(texts), batch_size):
+            encoded = tokenizer(
+                texts[i : i + batch_size], padding=True, truncation=True, return_tensors="pt"
+            )
+            output = model.distilbert(**encoded, output_hidden_states=True)
+            # hidden_states[0] son los embeddings; hidden_states[d] es la salida de la capa d
+            for depth, hidden in enumerate(output.hidden_states[1:], start=1):
+                cls_by_layer.setdefault(depth, []).append(hidden[:, 0])
+            final = _final_logits(model, output.last_hidden_state[:, 0])
+            probabilities.append(torch.softmax(final, dim=1))
+    return {d: torch.cat(v) for d, v in cls_by_layer.items()}, torch.cat(probabilities)
+
+
+def _fit_head(features: torch.Tensor, targets: torch.Tensor, epochs: int) -> nn.Linear:
+    """Regresion logistica con objetivos blandos (las probabilidades del modelo completo)."""
+    head = nn.Linear(features.shape[1], targets.shape[1])
+    optimizer = torch.optim.Adam(head.parameters(), lr=1e-2, weight_decay=1e-4)
+    for _ in range(epochs):
+        optimizer.zero_grad()
+        loss = -(targets * torch.log_softmax(head(features), dim=1)).sum(dim=1).mean()
+        loss.backward()
+        optimizer.step()
+    return head.eval()
+
+
+def _report(
+    heads: EarlyExitHeads,
+    cls_by_layer: Dict[int, torch.Tensor],
+    final: torch.Tensor,
+    num_layers: int,
+) -> dict:
+    """
+    Con los textos separados para validar: por capa, cuanto coincide su clasificador con el
+    modelo completo; por umbral, que pasaria en la cascada (donde sale cada texto, cuantas
+    capas corre en promedio y cuanto coincide el resultado con el modelo completo).
+    """
+    final_labels = final.argmax(dim=1)
+    with torch.no_grad():
+        probabilities = {
+            d: torch.softmax(heads.get(d)(cls_by_layer[d]), dim=1) for d in heads.layers
+        }
+
+    per_layer = {
+        str(d): round(float((p.argmax(dim=1) == final_labels).float().mean()), 4)
+        for d, p in probabilities.items()
+    }
+
+    cascade = {}
+    rows = len(final_labels)
+    for threshold in REPORT_THRESHOLDS:
+        exit_layer = torch.full((rows,), num_layers)
+        predicted = final_labels.clone()
+        pending = torch.ones(rows, dtype=torch.bool)
+        for d in heads.layers:
+            confidence, labels = probabilities[d].max(dim=1)
+            done = pending & (confidence >= threshold)
+            exit_layer[done] = d
+            predicted[done] = labels[done]
+            pending &= ~done
+        cascade[str(threshold)] = {
+            "agreement": round(float((predicted == final_labels).float().mean()), 4),
+            "mean_layers": round(float(exit_layer.float().mean()), 2),
+            "exits": {str(d): int((exit_layer == d).sum()) for d in [*heads.layers, num_layers]},
+        }
+    return {"validation_texts": rows, "layer_agreement": per_layer, "thresholds": cascade}
+
+
+def calibrate_heads(
+    pipe,
+    texts: List[str],
+    layers: Optional[List[int]] = None,
+    batch_size: int = 32,
+    epochs: int = 300,
+    holdout: float = 0.2,
+) -> Tuple[EarlyExitHeads, dict]:
+    """
+    Entrena un clasificador por capa intermedia contra las predicciones del propio modelo.
+    Devuelve los clasificadores y el reporte sobre la parte separada para validar.
+    """
+    model = pipe.model
+    if not is_supported(model):
+        raise ValueError(
+            f"Early exit solo soporta DistilBERT (el modelo es {type(model).__name__})"
+        )
+    num_layers = len(model.distilbert.transformer.layer)
+    layers = layers or list(range(1, num_layers))
+    if any(not 1 <= d < num_layers for d in layers):
+        raise ValueError(f"Las capas tienen que estar entre 1 y {num_layers - 1}")
+
+    cls_by_layer, final = _collect(pipe, texts, batch_size)
+
+    # Separacion fija (semilla 0): el reporte es reproducible
+    order = torch.randperm(len(texts), generator=torch.Generator().manual_seed(0))
+    split = max(1, int(len(texts) * (1 - holdout)))
+    train, valid = order[:split], order[split:]
+
+    heads = EarlyExitHeads(layers, model.config.dim, final.shape[1])
+    for d in layers:
+        heads.heads[str(d)] = _fit_head(cls_by_layer[d][train], final[train], epochs)
+    heads.eval()
+
+    if len(valid) == 0:
+        valid = train  # corpus minimo: se reporta sobre lo mismo que se entreno
+    report = _report(
+        heads, {d: c[valid] for d, c in cls_by_layer.items()}, final[valid], num_layers
+    )
+    return heads, report
+
+
+def save_heads(heads: EarlyExitHeads, path: str, model_name: str, report: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    first = heads.get(heads.layers[0])
+    assert first is not None
+    torch.save(
+        {
+            "model_name": model_name,
+            "layers": heads.layers,
+            "dim": first.in_features,
+            "num_labels": first.out_features,
+            "state_dict": heads.state_dict(),
+            "report": report,
+        },
+        path,
+    )
+
+
+def load_heads(path: str, model: nn.Module) -> Optional[EarlyExitHeads]:
+    """Clasificadores guardados para este modelo. None si no hay o no corresponden."""
+    if not os.path.exists(path):
+        return None
+    data = torch.load(path, map_location="cpu")
+    if data["dim"] != model.config.dim or data["num_labels"] != model.config.num_labels:
+        logger.warning("Los clasificadores de early exit en %s son de otro modelo", path)
+        return None
+    heads = EarlyExitHeads(data["layers"], data["dim"], data["num_labels"])
+    heads.load_state_dict(data["state_dict"])
+    return heads.eval()
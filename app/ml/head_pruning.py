@@ -0,0 +1,246 @@
+"""
+Poda de cabezas de atencion (head pruning).
+Para sentimiento binario muchas de las 6 × 12 cabezas de atencion de DistilBERT sobran. Este
+modulo mide cuanto importa cada una con textos propios (sin etiquetas: el objetivo es la
+prediccion del modelo actual) y saca las menos importantes mientras las predicciones sigan
+coincidiendo con las del modelo completo:
+
+  - Importancia (Michel et al., "Are Sixteen Heads Really Better than One?"): se multiplica
+    la salida de cada cabeza por una mascara en 1 y se acumula |dL/dmascara| sobre la muestra,
+    con L = cross-entropy contra la clase que predice el modelo completo. Se normaliza por
+    capa para poder comparar cabezas de capas distintas
+  - Poda: de menos a mas importante, se van apagando cabezas (con la mascara) mientras la
+    coincidencia con el modelo completo en los textos de validacion no baje del piso
+    (HEAD_PRUNING_AGREEMENT_FLOOR). Cada capa conserva al menos una cabeza
+  - Resultado: las cabezas se sacan de verdad (prune_heads achica las matrices), se mide el
+    speedup y se guarda en MODEL_CACHE_DIR/pruned/<nombre>, con pruning.json. El config
+    guarda las cabezas podadas: con MODEL_NAME=<esa carpeta> lo carga SentimentModel.load
+
+Uso: python -m app.cli prune-heads corpus.jsonl --floor 0.99
+"""
+
+import json
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+REPORT_FILE = "pruning.json"
+
+# Ultima lectura de MODEL_CACHE_DIR/pruned (ver refresh_pruned_models): /health/detailed la
+# lee sin tocar el disco
+_pruned_models: List[dict] = []
+
+
+def pruned_root() -> str:
+    return os.path.join(settings.MODEL_CACHE_DIR, "pruned")
+
+
+def _batches(tokenizer, texts: List[str], batch_size: int) -> list:
+    return [
+        tokenizer(texts[i : i + batch_size], padding=True, truncation=True, return_tensors="pt")
+        for i in range(0, len(texts), batch_size)
+    ]
+
+
+def _predict(model, batches: list, head_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """Clase predicha para cada texto (con algunas cabezas apagadas si se pasa head_mask)."""
+    # no_grad y no inference_mode: estos objetivos se usan despues en un backward
+    with torch.no_grad():
+        return torch.cat([model(**b, head_mask=head_mask).logits.argmax(dim=1) for b in batches])
+
+
+def head_importance(model, batches: list, targets: torch.Tensor) -> torch.Tensor:
+    """Importancia de cada cabeza (capas × cabezas), normalizada por capa."""
+    config = model.config
+    mask = torch.ones(config.n_layers, config.n_heads, requires_grad=True)
+    importance = torch.zeros(config.n_layers, config.n_heads)
+    loss_fn = torch.nn.CrossEntropyLoss()
+
+    start = 0
+    for batch in batches:
+        rows = batch["input_ids"].shape[0]
+        logits = model(**batch, head_mask=mask).logits
+        # Con las propias probabilidades como objetivo el gradiente seria 0 (es el minimo de
+        # la KL): por eso el objetivo es la clase predicha
+        loss_fn(logits, targets[start : start + rows]).backward()
+        importance += mask.grad.abs().detach()
+        mask.grad = None
+        start += rows
+
+    norm = importance.norm(dim=1, keepdim=True).clamp_min(1e-12)
+    return importance / norm
+
+
+def choose_heads(
+    model,
+    importance: torch.Tensor,
+    batches: list,
+    targets: torch.Tensor,
+    agreement_floor: float,
+) -> Tuple[List[Tuple[int, int]], float]:
+    """
+    Cabezas a podar (capa, cabeza) y la coincidencia que queda con el modelo completo.
+    Prueba de a tandas (10% de las cabezas); si una tanda baja del piso, la achica a la mitad
+    hasta probar de a una: pocas pasadas de validacion en vez de una por cabeza.
+    """
+    layers, heads = importance.shape
+    # La cabeza mas importante de cada capa no se poda nunca (una capa sin cabezas no anda)
+    keep = {(layer, int(importance[layer].argmax())) for layer in range(layers)}
+    candidates = sorted(
+        ((layer, head) for layer in range(layers) for head in range(heads)),
+        key=lambda lh: float(importance[lh]),
+    )
+    candidates = [lh for lh in candidates if lh not in keep]
+
+    pruned: List[Tuple[int, int]] = []
+    agreement = 1.0
+    step = max(1, (layers * heads) // 10)
+    i = 0
+    while i < len(candidates):
+        trial = pruned + candidates[i : i + step]
+        mask = torch.ones(layers, heads)
+        for layer, head in trial:
+            mask[layer, head] = 0.0
+        trial_agreement = float((_predict(model, batches, mask) == targets).float().mean())
+
+        if trial_agreement >= agreement_floor:
+            pruned, agreement = trial, trial_agreement
+            i += step
+        elif step > 1:
+            step //= 2
+        else:
+            break
+    return pruned, agreement
+
+
+def _ms_per_text(model, batches: list, rounds: int = 3) -> float:
+    """Mejor de varias pasadas (la primera calienta la memoria)."""
+    texts = sum(b["input_ids"].shape[0] for b in batches)
+    best = float("inf")
+    with torch.inference_mode():
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for batch in batches:
+                model(**batch)
+            best = min(best, time.perf_counter() - start)
+    return best * 1000 / texts
+
+
+def prune_model(
+    model_name: str,
+    texts: List[str],
+    agreement_floor: Optional[float] = None,
+    batch_size: int = 32,
+    holdout: float = 0.3,
+):
+    """
+    Poda las cabezas de model_name con los textos de muestra.
+    Devuelve (modelo podado, tokenizer, reporte). El modelo en servicio no se toca.
+    """
+    floor = (
+        agreement_floor if agreement_floor is not None else settings.HEAD_PRUNING_AGREEMENT_FLOOR
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    if not hasattr(model.config, "n_heads") or not hasattr(model, "distilbert"):
+        raise ValueError(f"La poda de cabezas solo soporta DistilBERT ({type(model).__name__})")
+
+    # Importancia con una parte, el piso de coincidencia se controla con la otra
+    split = max(1, int(len(texts) * (1 - holdout)))
+    train, valid = texts[:split], texts[split:] or texts[:split]
+    train_batches = _batches(tokenizer, train, batch_size)
+    valid_batches = _batches(tokenizer, valid, batch_size)
+    train_targets = _predict(model, train_batches)
+    valid_targets = _predict(model, valid_batches)
+
+    importance = head_importance(model, train_batches, train_targets)
+    pruned, agreement = choose_heads(model, importance, valid_batches, valid_targets, floor)
+
+    full_ms = _ms_per_text(model, valid_batches)
+    heads_total = model.config.n_layers * model.config.n_heads
+    by_layer: dict = {}
+    for layer, head in pruned:
+        by_layer.setdefault(layer, []).append(head)
+    model.prune_heads(by_layer)  # achica q/k/v/out de cada capa y lo anota en el config
+    pruned_ms = _ms_per_text(model, valid_batches)
+
+    report = {
+        "source_model": model_name,
+        "agreement_floor": floor,
+        "agreement": round(agreement, 4),
+        "heads_total": heads_total,
+        "heads_kept": heads_total - len(pruned),
+        "pruned_heads": {str(layer): sorted(heads) for layer, heads in sorted(by_layer.items())},
+        "ms_per_text": {"full": round(full_ms, 3), "pruned": round(pruned_ms, 3)},
+        "speedup": round(full_ms / pruned_ms, 3) if pruned_ms else None,
+        "sample_texts": len(texts),
+        "created_at": time.time(),
+    }
+    logger.info(
+        "Poda: %d de %d cabezas, coincidencia %.4f, speedup %.2fx",
+        len(pruned),
+        heads_total,
+        agreement,
+        report["speedup"] or 0,
+    )
+    return model, tokenizer, report
+
+
+def save_pruned(model, tokenizer, report: dict) -> str:
+    """Guarda modelo + tokenizer + reporte en MODEL_CACHE_DIR/pruned. Devuelve la carpeta."""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", report["source_model"])[-64:]
+    path = os.path.join(pruned_root(), f"{safe_name}-h{report['heads_kept']}")
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    with open(os.path.join(path, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    refresh_pruned_models()
+    return path
+
+
+def list_pruned_models() -> List[dict]:
+    """Modelos podados con su reporte, de la ultima lectura del disco (sin I/O)."""
+    return _pruned_models
+
+
+def refresh_pruned_models() -> List[dict]:
+    """
+    Vuelve a leer MODEL_CACHE_DIR/pruned. Se llama al arrancar la app y al guardar un modelo
+    podado (el CLI corre en otro proceso: el servidor lo ve en el proximo arranque).
+    """
+    global _pruned_models
+    _pruned_models = _scan_pruned_models()
+    return _pruned_models
+
+
+def _scan_pruned_models() -> List[dict]:
+    root = pruned_root()
+    if not os.path.isdir(root):
+        return []
+    models = []
+    for name in sorted(os.listdir(root)):
+        try:
+            with open(os.path.join(root, name, REPORT_FILE)) as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        models.append(
+            {
+                "path": os.path.join(root, name),
+                "source_model": report.get("source_model"),
+                "heads_kept": report.get("heads_kept"),
+                "heads_total": report.get("heads_total"),
+                "agreement": report.get("agreement"),
+                "speedup": report.get("speedup"),
+            }
+        )
+    return models
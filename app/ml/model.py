@@ -3,9 +3,14 @@ Wrapper del modelo de ML.
 Carga el modelo de HuggingFace una sola vez y lo reutiliza para todas las predicciones.
 """
 
+import gc
+import threading
 import time
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
 
+import numpy as np
+import torch
 from transformers import (  # pipeline = funcion de HuggingFace que simplifica usar modelos
     Pipeline,
     pipeline,
@@ -13,131 +18,477 @@ from transformers import (  # pipeline = funcion de HuggingFace que simplifica u
 
 from app.config import settings
 from app.core import ModelNotLoadedError, PredictionError, get_logger
+from app.ml.compiled import CompiledClassifier
+from app.ml.early_exit import EarlyExitRunner, heads_path, is_supported, load_heads
 from app.schemas import SentimentLabel
 
 logger = get_logger(__name__)
 
+# Variantes de carga soportadas:
+#   default   = pesos tal cual vienen de HuggingFace (float32)
+#   quantized = capas Linear cuantizadas a int8 (mas rapido en CPU, ~1/4 de memoria en esas capas)
+MODEL_VARIANTS = ("default", "quantized")
+
+# Textos cortos que se corren sobre un modelo recien cargado antes de ponerlo en servicio
+_WARMUP_TEXTS = ["I love this!", "This is terrible.", "It arrived on time."]
+
+# El modelo usa nombres como "POSITIVE"/"LABEL_0", los mapeamos a nuestro Enum
+_LABEL_MAPPING = {
+    "POSITIVE": SentimentLabel.POSITIVE,
+    "NEGATIVE": SentimentLabel.NEGATIVE,
+    "NEUTRAL": SentimentLabel.NEUTRAL,
+    "LABEL_0": SentimentLabel.NEGATIVE,  # algunos modelos usan LABEL_0/LABEL_1
+    "LABEL_1": SentimentLabel.POSITIVE,
+}
+
+
+def _label_array(id2label: dict) -> np.ndarray:
+    """
+    Array id de clase → SentimentLabel, armado UNA vez al cargar el modelo.
+    Con un array, mapear todo un batch es una sola indexacion (labels[ids]) en vez de un loop.
+    """
+    labels = np.empty(len(id2label), dtype=object)
+    for class_id, name in id2label.items():
+        # .get() busca en el diccionario. Si no encuentra, usa NEUTRAL como fallback
+        labels[int(class_id)] = _LABEL_MAPPING.get(str(name).upper(), SentimentLabel.NEUTRAL)
+    return labels
+
+
+def _weights_bytes(model: torch.nn.Module) -> int:
+    """Memoria que ocupan los pesos del modelo (parametros + buffers), en bytes."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    # Las capas cuantizadas guardan los pesos en "packed params", que no aparecen en parameters()
+    size = sum(t.numel() * t.element_size() for t in tensors)
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if packed is not None:
+            weight, bias = packed._weight_bias()
+            size += weight.numel() * weight.element_size()
+            size += bias.numel() * bias.element_size() if bias is not None else 0
+    return size
+
+
+@dataclass
+class _LoadedModel:
+    """
+    Un modelo cargado en memoria, con la cantidad de predicciones que lo estan usando.
+    Cuando se hace un hot swap, el viejo sigue vivo hasta que inflight llega a 0.
+    """
+
+    name: str
+    variant: str
+    pipeline: Pipeline
+    labels: np.ndarray  # id de clase → SentimentLabel
+    compiled: Optional[CompiledClassifier] = None  # None = modo eager
+    early_exit: Optional[EarlyExitRunner] = None  # None = todas las capas
+    memory_bytes: int = 0  # pesos del modelo, medidos una vez al cargar
+    inflight: int = 0
+
+    @property
+    def version(self) -> str:
+        """
+        Version que se reporta en cada respuesta: nombre, y la variante si no es la default.
+        Con early exit las predicciones pueden cambiar, asi que la version lleva el umbral.
+        """
+        version = self.name if self.variant == "default" else f"{self.name}:{self.variant}"
+        if self.early_exit is not None:
+            version += f"+early-exit@{self.early_exit.threshold:g}"
+        return version
+
+    def logits(self, texts: List[str]) -> np.ndarray:
+        """
+        Matriz de logits crudos (len(texts) x cantidad de clases), con el modo de ejecucion
+        configurado. No pasa por el postprocesamiento del Pipeline de HuggingFace.
+        """
+        return self.forward(self.encode(texts))
+
+    def encode(self, texts: List[str]) -> Any:
+        """Etapa 1: tokeniza el batch (CPU, sin el modelo)."""
+        if self.compiled is not None:
+            return self.compiled.encode(texts)
+        return self.pipeline.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+
+    def forward(self, encoded: Any) -> np.ndarray:
+        """Etapa 2: forward pass del modelo sobre un batch ya tokenizado."""
+        return self.forward_with_exits(encoded)[0]
+
+    def forward_with_exits(self, encoded: Any) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Como forward(), mas la capa de salida de cada fila (None sin early exit)."""
+        if self.early_exit is not None:
+            return self.early_exit.forward(encoded)
+        if self.compiled is not None:
+            logits = self.compiled.forward(encoded)
+        else:
+            with torch.inference_mode():
+                logits = self.pipeline.model(**encoded).logits
+        return logits.float().numpy(), None
+
+
+@dataclass
+class EncodedBatch:
+    """
+    Un batch que va pasando por las etapas tokenizar → forward → postprocesar.
+    Mientras no se llama a release(), el modelo con el que se tokenizo sigue reservado
+    (un hot swap espera a que termine).
+    """
+
+    texts: List[str]
+    loaded: _LoadedModel
+    inputs: Any  # tensores del tokenizer
+    release: Callable[[], None]
+    logits: Optional[np.ndarray] = None
+    exit_layers: Optional[np.ndarray] = None  # capa de salida de cada fila (early exit)
+    elapsed_ms: float = 0.0  # tiempo de tokenizer + forward (no cuenta la espera entre etapas)
+
 
 class SentimentModel:
     """
     Wrapper del modelo de analisis de sentimientos.
     Implementa el patron Singleton: sin importar cuantas veces hagas SentimentModel(), siempre te devuelve la MISMA instancia.
     Esto evita cargar el modelo (que pesa cientos de MB) mas de una vez.
+
+    SentimentModel("otro-modelo") crea una instancia aparte para ese modelo
+    (la usa el ModelRegistry para servir modelos por idioma).
+
+    El modelo cargado se puede reemplazar en caliente con swap(): las predicciones que ya
+    empezaron terminan con el modelo viejo, las nuevas usan el nuevo.
     """
 
     # Variables de clase (compartidas por todas las instancias, que en este caso es una sola)
     _instance: Optional["SentimentModel"] = None  # la unica instancia
-    _pipeline: Optional[Pipeline] = None  # el modelo cargado
-    _is_loaded: bool = False  # flag de "ya cargo?"
 
-    def __new__(cls):
+    def __new__(cls, model_name: Optional[str] = None):
         """Singleton: si ya existe una instancia, devuelve esa. Si no, crea una nueva."""
+        # Un modelo distinto al default no es el singleton: cada llamada crea una instancia nueva.
+        # El default es el que sirve el singleton AHORA (un hot swap lo cambia), no MODEL_NAME
+        default_name = cls._instance._name if cls._instance is not None else settings.MODEL_NAME
+        if model_name is not None and model_name != default_name:
+            return super().__new__(cls)
+
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    def __init__(self, model_name: Optional[str] = None):
+        # __init__ corre en CADA SentimentModel(): si el singleton ya estaba armado, no lo pisa
+        if getattr(self, "_name", None) is not None:
+            return
+        self._name = model_name or settings.MODEL_NAME
+        self._variant = settings.MODEL_VARIANT
+        self._loaded: Optional[_LoadedModel] = None  # el modelo en servicio
+        self._lock = threading.Condition()  # protege _loaded y los contadores inflight
+
     # @property convierte un metodo en un atributo de solo lectura
     # En vez de model.is_loaded() se usa model.is_loaded (sin parentesis)
     @property
     def is_loaded(self) -> bool:
         """Verifica si el modelo esta cargado."""
-        return self._is_loaded and self._pipeline is not None
+        return self._loaded is not None
 
     @property
     def model_name(self) -> str:
         """Nombre del modelo."""
-        return settings.MODEL_NAME
+        return self._name
+
+    @property
+    def version(self) -> str:
+        """Version del modelo en servicio (nombre + variante). Es la que va en model_version."""
+        loaded = self._loaded
+        return loaded.version if loaded else self._name
+
+    @property
+    def pipeline(self) -> Pipeline:
+        """Pipeline de HuggingFace en servicio (para las herramientas offline de calibracion)."""
+        loaded = self._loaded
+        if loaded is None:
+            raise ModelNotLoadedError()
+        return loaded.pipeline
+
+    def memory_bytes(self) -> int:
+        """Memoria que ocupan los pesos del modelo, en bytes (medida al cargarlo: O(1))."""
+        loaded = self._loaded
+        return loaded.memory_bytes if loaded is not None else 0
 
     def load(self) -> None:
         """
         Carga el modelo en memoria. Se llama una vez cuando arranca la app.
         La primera vez descarga el modelo de internet (puede tardar).
         """
-        if self._is_loaded:
+        if self.is_loaded:
             logger.info("Modelo ya esta cargado")
             return
 
-        logger.info(f"Cargando modelo: {settings.MODEL_NAME}")
+        loaded = self._build(self._name, self._variant)
+        with self._lock:
+            self._loaded = loaded
+
+    def _build(self, name: str, variant: str) -> _LoadedModel:
+        """Carga un modelo (sin ponerlo en servicio todavia)."""
+        if variant not in MODEL_VARIANTS:
+            raise ModelNotLoadedError(
+                f"Variante '{variant}' no soportada. Opciones: {', '.join(MODEL_VARIANTS)}"
+            )
+
+        logger.info(f"Cargando modelo: {name} (variante {variant})")
         start_time = time.time()  # marca el inicio para medir cuanto tarda
 
         try:
             # pipeline() de HuggingFace: carga modelo + tokenizer y los deja listos para usar
             # task="sentiment-analysis" le dice que tipo de tarea va a hacer
-            self._pipeline = pipeline(
+            pipe = pipeline(
                 task="sentiment-analysis",
-                model=settings.MODEL_NAME,
-                tokenizer=settings.MODEL_NAME,
+                model=name,
+                tokenizer=name,
                 device=-1,  # -1 = usa CPU, 0 = usaria la primera GPU
             )
 
-            self._is_loaded = True
-            load_time = time.time() - start_time  # calcula cuanto tardo
+            if variant == "quantized":
+                # Cuantizacion dinamica: los pesos de las capas Linear pasan a int8
+                pipe.model = torch.quantization.quantize_dynamic(
+                    pipe.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
 
+            load_time = time.time() - start_time  # calcula cuanto tardo
             logger.info(f"Modelo cargado en {load_time:.2f} segundos")
 
+            compiled = self._compile(pipe, f"{name}:{variant}")
+            return _LoadedModel(
+                name=name,
+                variant=variant,
+                pipeline=pipe,
+                labels=_label_array(pipe.model.config.id2label),
+                compiled=compiled,
+                early_exit=self._early_exit(pipe, name) if compiled is None else None,
+                memory_bytes=_weights_bytes(pipe.model),
+            )
+
         except Exception as e:
             logger.error(f"Error cargando modelo: {e}")
             raise ModelNotLoadedError(f"No se pudo cargar el modelo: {e}")
 
-    def predict(self, text: str) -> dict:
+    @staticmethod
+    def _compile(pipe: Pipeline, cache_key: str) -> Optional[CompiledClassifier]:
+        """Compila el modelo si MODEL_EXECUTION_MODE = "compiled". Si falla, sigue en eager."""
+        if settings.MODEL_EXECUTION_MODE != "compiled":
+            return None
+
+        start_time = time.time()
+        try:
+            compiled = CompiledClassifier(
+                pipe.model,
+                pipe.tokenizer,
+                buckets=settings.MODEL_COMPILE_BUCKETS,
+                cache_dir=settings.MODEL_CACHE_DIR,
+                cache_key=cache_key,
+            )
+        except Exception as e:
+            logger.warning(f"No se pudo compilar el modelo, se usa modo eager: {e}")
+            return None
+
+        logger.info(f"Modelo compilado en {time.time() - start_time:.2f} segundos")
+        return compiled
+
+    @staticmethod
+    def _early_exit(pipe: Pipeline, name: str) -> Optional[EarlyExitRunner]:
+        """Arma el early exit si EARLY_EXIT_THRESHOLD > 0 y hay clasificadores calibrados."""
+        threshold = settings.EARLY_EXIT_THRESHOLD
+        if threshold <= 0:
+            return None
+        if not is_supported(pipe.model):
+            logger.warning(f"Early exit no soportado para {name}, se usan todas las capas")
+            return None
+
+        path = heads_path(name)
+        heads = load_heads(path, pipe.model)
+        if heads is None:
+            logger.warning(
+                f"No hay clasificadores de early exit para {name} en {path} "
+                "(python -m app.cli early-exit corpus.txt), se usan todas las capas"
+            )
+            return None
+
+        logger.info(f"Early exit activo: capas {heads.layers}, umbral {threshold}")
+        return EarlyExitRunner(pipe.model, heads, threshold)
+
+    def swap(
+        self,
+        name: str,
+        variant: str = "default",
+        drain_timeout: float = 60.0,
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> None:
         """
-        Analiza el sentimiento de un texto.
-        Devuelve un dict con: sentiment, confidence, scores, processing_time_ms.
+        Hot swap: carga otro modelo al lado del actual, lo calienta y lo pone en servicio
+        de forma atomica. Despues espera a que terminen las predicciones que estaban usando
+        el viejo y lo libera. Mientras tanto la app sigue atendiendo (nunca queda sin modelo).
+        on_progress recibe el nombre de cada etapa: "warming", "draining".
         """
+        new = self._build(name, variant)
 
-        if not self.is_loaded:
-            raise ModelNotLoadedError()
+        if on_progress:
+            on_progress("warming")
+        # Warm-up: la primera inferencia de un modelo es lenta (reserva memoria, inicializa kernels)
+        new.logits(_WARMUP_TEXTS)
 
-        try:
-            start_time = time.time()
+        with self._lock:
+            old, self._loaded = self._loaded, new
+            self._name, self._variant = name, variant
 
-            # Le pasa el texto al modelo. top_k=None devuelve scores para TODAS las clases
-            # assert: le dice a mypy que en este punto _pipeline NUNCA es None
-            # (ya lo verificamos con self.is_loaded arriba, pero mypy no lo infiere solo)
-            assert self._pipeline is not None
-            result = self._pipeline(text, top_k=None)
+        logger.info(f"Modelo en servicio: {new.version}")
 
-            processing_time = (time.time() - start_time) * 1000  # convierte a milisegundos
+        if old is not None:
+            if on_progress:
+                on_progress("draining")
+            self._drain(old, drain_timeout)
 
-            # Con top_k=None el modelo devuelve [{"label": "POSITIVE", "score": 0.95}, {"label": "NEGATIVE", "score": 0.05}]
-            # Ya es una lista directa, no hace falta result[0]
-            scores = result
+    def _drain(self, old: _LoadedModel, timeout: float) -> None:
+        """Espera a que nadie use el modelo viejo y lo libera."""
+        with self._lock:
+            drained = self._lock.wait_for(lambda: old.inflight == 0, timeout=timeout)
+        if not drained:
+            # Hay predicciones que siguen usando el viejo: no se le saca nada de abajo. Cada una
+            # tiene su referencia (EncodedBatch.loaded): se libera cuando termina la ultima
+            logger.warning(
+                f"Timeout esperando predicciones en curso de {old.version}: "
+                "se libera cuando terminen"
+            )
+            return
 
-            # Busca cual tiene el score mas alto
-            best = max(scores, key=lambda x: x["score"])
+        # Soltar la referencia al pipeline libera los tensores (si nadie mas la tiene)
+        old.pipeline = None  # type: ignore[assignment]
+        old.compiled = None
+        old.early_exit = None
+        gc.collect()
+        logger.info(f"Modelo anterior liberado: {old.version}")
 
-            # El modelo usa nombres como "POSITIVE"/"LABEL_0", los mapeamos a nuestro Enum
-            label_mapping = {
-                "POSITIVE": SentimentLabel.POSITIVE,
-                "NEGATIVE": SentimentLabel.NEGATIVE,
-                "NEUTRAL": SentimentLabel.NEUTRAL,
-                "LABEL_0": SentimentLabel.NEGATIVE,  # algunos modelos usan LABEL_0/LABEL_1
-                "LABEL_1": SentimentLabel.POSITIVE,
-            }
+    def unload(self) -> None:
+        """Libera el modelo de memoria (lo usa el registry al desalojar modelos)."""
+        with self._lock:
+            self._loaded = None
+        logger.info(f"Modelo descargado de memoria: {self.model_name}")
 
-            # .get() busca en el diccionario. Si no encuentra, usa NEUTRAL como fallback
-            sentiment = label_mapping.get(best["label"].upper(), SentimentLabel.NEUTRAL)
+    def _retain(self) -> _LoadedModel:
+        """
+        Toma el modelo en servicio para UNA prediccion (hasta _release). Aunque haya un swap
+        en el medio, la prediccion termina con el mismo modelo con el que empezo.
+        """
+        with self._lock:
+            loaded = self._loaded
+            if loaded is None:
+                raise ModelNotLoadedError()
+            loaded.inflight += 1
+            return loaded
 
-            # Construye la lista de scores con nuestros labels
-            normalized_scores = []
-            for s in scores:
-                mapped_label = label_mapping.get(s["label"].upper(), SentimentLabel.NEUTRAL)
-                normalized_scores.append({"label": mapped_label, "score": s["score"]})
+    def _release(self, loaded: _LoadedModel) -> None:
+        with self._lock:
+            loaded.inflight -= 1
+            if loaded.inflight == 0:
+                self._lock.notify_all()  # despierta a un swap que este esperando
 
-            return {
-                "sentiment": sentiment,
-                "confidence": best["score"],
-                "scores": normalized_scores,
-                "processing_time_ms": processing_time,
-            }
+    def predict(self, text: str) -> dict:
+        """
+        Analiza el sentimiento de un texto.
+        Devuelve un dict con: sentiment, confidence, scores, processing_time_ms, model_version.
+        """
+        return self.predict_batch([text])[0]
 
+    def predict_batch(self, texts: List[str]) -> List[dict]:
+        """
+        Analiza multiples textos de una vez.
+        Tokeniza la lista entera con padding y la corre en UN solo forward pass
+        (mucho mas rapido que llamar predict() N veces).
+        Son las tres etapas de encode/forward/postprocess, en este mismo hilo.
+        """
+        if not texts:
+            return []
+        batch = self.encode(texts)
+        try:
+            self.forward(batch)
+        finally:
+            batch.release()
+        return self.postprocess(batch)
+
+    # ---- Etapas (StagedInference las corre en hilos separados, solapando batches) ----
+
+    def encode(self, texts: List[str]) -> EncodedBatch:
+        """Reserva el modelo en servicio y tokeniza el batch."""
+        loaded = self._retain()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:  # se puede llamar mas de una vez (ej: en un error)
+                released = True
+                self._release(loaded)
+
+        try:
+            start_time = time.time()
+            inputs = loaded.encode(texts)
+            elapsed_ms = (time.time() - start_time) * 1000
         except Exception as e:
-            logger.error(f"Error en prediccion: {e}")
+            release()
+            logger.error(f"Error tokenizando batch: {e}")
             raise PredictionError(f"Error durante la prediccion: {e}", e)
 
-    def predict_batch(self, texts: List[str]) -> List[dict]:
-        """Analiza multiples textos de una vez."""
-        return [self.predict(text) for text in texts]
+        return EncodedBatch(
+            texts=texts, loaded=loaded, inputs=inputs, release=release, elapsed_ms=elapsed_ms
+        )
+
+    def forward(self, batch: EncodedBatch) -> None:
+        """Corre el modelo sobre un batch tokenizado (deja los logits en el batch)."""
+        try:
+            start_time = time.time()
+            batch.logits, batch.exit_layers = batch.loaded.forward_with_exits(batch.inputs)
+            batch.elapsed_ms += (time.time() - start_time) * 1000
+        except Exception as e:
+            logger.error(f"Error en prediccion batch: {e}")
+            raise PredictionError(f"Error durante la prediccion: {e}", e)
+        finally:
+            batch.inputs = None  # los tensores del tokenizer ya no hacen falta
+
+    def postprocess(self, batch: EncodedBatch) -> List[dict]:
+        """Convierte los logits de un batch (ya corrido) a predicciones."""
+        assert batch.logits is not None
+        # El tiempo de tokenizer + forward se reparte entre los textos del batch
+        processing_time = batch.elapsed_ms / len(batch.texts)
+        return self._format_predictions(
+            batch.logits, batch.loaded, processing_time, batch.exit_layers
+        )
+
+    @staticmethod
+    def _format_predictions(
+        logits: np.ndarray,
+        loaded: _LoadedModel,
+        processing_time: float,
+        exit_layers: Optional[np.ndarray] = None,
+    ) -> List[dict]:
+        """
+        Convierte los logits del batch al formato interno de la app.
+        Softmax, argmax, orden de scores y mapeo de labels se hacen sobre la matriz entera
+        con NumPy; en Python solo queda armar los dicts de salida.
+        """
+        # Softmax estable: restar el maximo de cada fila evita overflow en exp()
+        shifted = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(shifted)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        # Scores de cada fila ordenados de mayor a menor (el primero es el ganador)
+        order = np.argsort(-probabilities, axis=1, kind="stable")
+        sorted_scores = np.take_along_axis(probabilities, order, axis=1).tolist()
+        sorted_labels = loaded.labels[order].tolist()
+        layers = exit_layers.tolist() if exit_layers is not None else [None] * len(sorted_labels)
+
+        return [
+            {
+                "sentiment": labels[0],
+                "confidence": scores[0],
+                "scores": [{"label": lb, "score": sc} for lb, sc in zip(labels, scores)],
+                "processing_time_ms": processing_time,
+                "model_version": loaded.version,  # el modelo que REALMENTE hizo la prediccion
+                "exit_layer": layer,
+            }
+            for labels, scores, layer in zip(sorted_labels, sorted_scores, layers)
+        ]
 
 
 # Instancia global (por el Singleton, siempre es la misma)
@@ -3,12 +3,19 @@ Pipeline completo de ML. Orquesta preprocesamiento + modelo + postprocesamiento.
 Es el "director de orquesta" que coordina los pasos: limpiar texto → predecir → armar respuesta.
 """
 
+import asyncio
 import time
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+import anyio.to_thread
+
+from app.config import settings
 from app.core import get_logger
+from app.ml.batcher import InferenceBatcher, inference_batcher
 from app.ml.model import SentimentModel, sentiment_model
 from app.ml.preprocessor import TextPreprocessor
+from app.ml.registry import ModelRegistry, model_registry
+from app.ml.stages import StagedInference, staged_inference
 from app.schemas import (
     BatchSentimentRequest,
     BatchSentimentResponse,
@@ -16,6 +23,11 @@ from app.schemas import (
     SentimentResponse,
     SentimentScore,
 )
+from app.services.latency import RollingLatency, traffic_latency
+from app.services.memory import memory_guard
+from app.services.near_duplicate import NearDuplicateIndex, create_near_duplicate_index
+from app.services.result_store import ResultStore, create_result_store, text_hash
+from app.services.shared_cache import SharedResultCache, create_shared_cache
 
 logger = get_logger(__name__)
 
@@ -24,18 +36,43 @@ class SentimentPipeline:
     """
     Pipeline completo de analisis de sentimientos.
     Junta el preprocessor (limpieza) y el model (prediccion) en un solo flujo.
+    El modelo de cada request lo elige el registry (por idioma o por pedido explicito).
+    Antes de correr el modelo consulta los caches configurados, del mas rapido al mas lento:
+    cache en memoria compartida → result store en disco → indice de casi-duplicados.
     """
 
     def __init__(
         self,
         model: Optional[SentimentModel] = None,
         preprocessor: Optional[TextPreprocessor] = None,
+        batcher: Optional[InferenceBatcher] = None,
+        result_store: Optional[ResultStore] = None,
+        shared_cache: Optional[SharedResultCache] = None,
+        registry: Optional[ModelRegistry] = None,
+        latency: Optional[RollingLatency] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        stages: Optional[StagedInference] = None,
     ):
         """Inicializa el pipeline con modelo y preprocesador."""
         # "or" funciona asi: si model es None, usa sentiment_model (el global)
         # Esto permite inyectar un modelo diferente para tests
         self.model = model or sentiment_model
+        # Con un modelo inyectado se arma un registry propio que lo usa como default
+        if registry is None:
+            registry = model_registry if model is None else ModelRegistry(default_model=model)
+        self.registry = registry
         self.preprocessor = preprocessor or TextPreprocessor()
+        # La cola global usa el registry global: con un registry propio hace falta una cola propia
+        if batcher is None:
+            batcher = (
+                inference_batcher if registry is model_registry else InferenceBatcher(registry)
+            )
+        self.batcher = batcher
+        self.stages = stages or staged_inference  # etapas solapadas para los batches grandes
+        self.result_store = result_store  # None = sin store persistente
+        self.shared_cache = shared_cache  # None = sin cache compartido entre workers
+        self.near_duplicates = near_duplicates  # None = sin reutilizar textos casi identicos
+        self.latency = latency or traffic_latency  # latencias del trafico real (p50/p99)
 
         logger.info("SentimentPipeline inicializado")
 
@@ -47,33 +84,25 @@ class SentimentPipeline:
         start_time = time.time()
 
         # Paso 1: Preprocesar (limpiar URLs, emails, espacios, etc.)
-        logger.debug(f"Preprocesando texto de {len(request.text)} caracteres")
+        logger.debug("Preprocesando texto de %d caracteres", len(request.text))
         processed_text = self.preprocessor.preprocess(request.text)
 
-        # Paso 2: Predecir (mandar el texto limpio al modelo de ML)
+        # Paso 2: Predecir (mandar el texto limpio al modelo de ML, o sacarlo del store)
         logger.debug("Ejecutando prediccion")
-        prediction = self.model.predict(processed_text)
+        model_name = self.registry.resolve(request.language, request.model)
+        with self.registry.use(model_name) as model:
+            prediction = self._predict([processed_text], model)[0]
 
         # Paso 3: Construir la respuesta con el formato que espera la API
         total_time = (time.time() - start_time) * 1000  # convierte a milisegundos
-
-        # Convierte los scores crudos del modelo a objetos SentimentScore (schema de pydantic)
-        scores = [SentimentScore(label=s["label"], score=s["score"]) for s in prediction["scores"]]
-
-        # Arma el SentimentResponse completo con todos los campos
-        response = SentimentResponse(
-            text=request.text,  # texto original (no el limpio)
-            sentiment=prediction["sentiment"],  # POSITIVE/NEGATIVE/NEUTRAL
-            confidence=prediction["confidence"],  # que tan seguro esta (0-1)
-            scores=scores,  # puntuacion de cada sentimiento
-            processing_time_ms=total_time,  # cuanto tardo en ms
-            model_version=self.model.model_name,  # nombre del modelo usado
-        )
+        response = self._build_response(request.text, prediction, total_time)
+        self.latency.record(total_time)
 
         logger.info(
-            f"Analisis completado: sentiment={response.sentiment}, "
-            f"confidence={response.confidence:.2f}, "
-            f"time={total_time:.1f}ms"
+            "Analisis completado: sentiment=%s, confidence=%.2f, time=%.1fms",
+            response.sentiment,
+            response.confidence,
+            total_time,
         )
 
         return response
@@ -81,26 +110,255 @@ class SentimentPipeline:
     def analyze_batch(self, request: BatchSentimentRequest) -> BatchSentimentResponse:
         """
         Analiza VARIOS textos de una sola vez.
-        Internamente llama a analyze() para cada texto individual.
+        Preprocesa todos, y los que no estan en el store van al modelo en un solo batch.
         """
         start_time = time.time()
 
-        results = []
-        for text in request.texts:
-            # Crea un SentimentRequest individual por cada texto de la lista
-            single_request = SentimentRequest(text=text, language=request.language)
-            result = self.analyze(single_request)  # reutiliza el metodo de arriba
-            results.append(result)
+        processed_texts = self.preprocessor.preprocess_batch(request.texts)
+        model_name = self.registry.resolve(request.language, request.model)
+        with self.registry.use(model_name) as model:
+            predictions = self._predict(processed_texts, model)
 
         total_time = (time.time() - start_time) * 1000
+        per_text_time = total_time / len(request.texts)  # el tiempo se reparte entre los textos
+        self.latency.record(total_time)
+
+        results = [
+            self._build_response(text, prediction, per_text_time)
+            for text, prediction in zip(request.texts, predictions)
+        ]
 
-        return BatchSentimentResponse(
+        return BatchSentimentResponse.model_construct(
             results=results,  # lista de SentimentResponse
             total_processing_time_ms=total_time,  # tiempo total (todos los textos)
             texts_analyzed=len(request.texts),  # cuantos textos se analizaron
         )
 
+    async def analyze_async(
+        self, request: SentimentRequest, client_id: Optional[str] = None
+    ) -> SentimentResponse:
+        """
+        Igual que analyze(), pero el texto pasa por la cola de micro-batching:
+        no bloquea el event loop y comparte el forward pass con los textos de otros clientes.
+        """
+        start_time = time.time()
+        processed_text = self.preprocessor.preprocess(request.text)
+        model_name = self.registry.resolve(request.language, request.model)
+        prediction = (await self._predict_async([processed_text], model_name, client_id))[0]
+
+        total_time = (time.time() - start_time) * 1000
+        response = self._build_response(request.text, prediction, total_time)
+        self.latency.record(total_time)
+
+        logger.info(
+            "Analisis completado: sentiment=%s, confidence=%.2f, time=%.1fms",
+            response.sentiment,
+            response.confidence,
+            total_time,
+        )
+        return response
+
+    async def analyze_batch_async(
+        self, request: BatchSentimentRequest, client_id: Optional[str] = None
+    ) -> BatchSentimentResponse:
+        """
+        Igual que analyze_batch(), pero por la cola de micro-batching: los textos de un batch
+        grande se reparten con los de los demas clientes en vez de acaparar el modelo.
+        """
+        start_time = time.time()
+        processed_texts = self.preprocessor.preprocess_batch(request.texts)
+        model_name = self.registry.resolve(request.language, request.model)
+        predictions = await self._predict_async(processed_texts, model_name, client_id)
+
+        total_time = (time.time() - start_time) * 1000
+        per_text_time = total_time / len(request.texts)
+        self.latency.record(total_time)
+
+        return BatchSentimentResponse.model_construct(
+            results=[
+                self._build_response(text, prediction, per_text_time)
+                for text, prediction in zip(request.texts, predictions)
+            ],
+            total_processing_time_ms=total_time,
+            texts_analyzed=len(request.texts),
+        )
+
+    async def analyze_text_async(
+        self,
+        text: str,
+        language: Optional[str] = None,
+        model: Optional[str] = None,
+        client_id: Optional[str] = None,
+    ) -> dict:
+        """
+        Analiza UN texto pasando por la cola de micro-batching.
+        Version liviana para el streaming: no arma schemas de pydantic, devuelve un dict
+        con la prediccion y el modelo usado. El texto se junta con los de otros clientes
+        y se predice en el mismo forward pass.
+        """
+        start_time = time.time()
+        processed_text = self.preprocessor.preprocess(text)
+        model_name = self.registry.resolve(language, model)
+        prediction = (await self._predict_async([processed_text], model_name, client_id))[0]
+
+        self.latency.record((time.time() - start_time) * 1000)
+        return prediction
+
+    def fingerprint(
+        self, text: str, language: Optional[str] = None, model: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        (hash del texto preprocesado, version del modelo que lo atenderia), sin correr el
+        modelo. Identifica el resultado: sirve de ETag para los GET cacheables.
+        """
+        processed_text = self.preprocessor.preprocess(text)
+        model_name = self.registry.resolve(language, model)
+        return text_hash(processed_text), self.registry.version(model_name)
+
+    def lookup_hash(
+        self, digest: str, language: Optional[str] = None, model: Optional[str] = None
+    ) -> Tuple[Optional[dict], str]:
+        """
+        Prediccion ya calculada para un hash de texto (sin el texto, solo en el result store)
+        y la version del modelo con que se busco. (None, version) si no esta.
+        """
+        model_version = self.registry.version(self.registry.resolve(language, model))
+        if self.result_store is None:
+            return None, model_version
+        prediction = self.result_store.get_by_hash(digest, model_version)
+        if prediction is not None:
+            prediction["model_version"] = model_version
+        return prediction, model_version
+
+    async def _predict_async(
+        self, processed_texts: List[str], model_name: str, client_id: Optional[str]
+    ) -> List[dict]:
+        """Como _predict(), pero los textos que no estan en cache van a la cola de micro-batching."""
+        model_version = self.registry.version(model_name)
+        if self.result_store is not None:
+            # La lectura de SQLite (disco, locks) corre en un hilo: no frena el event loop
+            known = await anyio.to_thread.run_sync(self._lookup, processed_texts, model_version)
+        else:
+            known = self._lookup(processed_texts, model_version)
+
+        missing = list(dict.fromkeys(t for t in processed_texts if t not in known))
+        if missing:
+            predictions = await asyncio.gather(
+                *(self.batcher.submit(text, model_name, client_id) for text in missing)
+            )
+            fresh = dict(zip(missing, predictions))
+            self._remember(fresh)
+            known.update(fresh)
+
+        return [known[text] for text in processed_texts]
+
+    def _predict(self, processed_texts: List[str], model: SentimentModel) -> List[dict]:
+        """
+        Predice una lista de textos ya preprocesados.
+        Primero busca en los caches; los que faltan (sin repetir) van al modelo y se guardan.
+        """
+        known = self._lookup(processed_texts, model.version)
+
+        # dict.fromkeys elimina duplicados manteniendo el orden
+        missing = list(dict.fromkeys(t for t in processed_texts if t not in known))
+        if missing:
+            if len(missing) == 1:
+                predictions = [model.predict(missing[0])]
+            else:
+                # Batches de BATCH_MAX_SIZE por las etapas solapadas: mientras uno corre en el
+                # modelo se tokeniza el siguiente (bajo presion de memoria, batches mas chicos)
+                chunk = memory_guard.batch_size_limit(settings.BATCH_MAX_SIZE)
+                predictions = self.stages.run(model, missing, chunk)
+
+            fresh = dict(zip(missing, predictions))
+            self._remember(fresh)
+            known.update(fresh)
+
+        return [known[text] for text in processed_texts]
+
+    def _lookup(self, processed_texts: List[str], model_version: str) -> Dict[str, dict]:
+        """
+        Busca predicciones ya calculadas: primero en memoria compartida, despues en disco.
+        A cada una le agrega el model_version con el que se busco.
+        """
+        known: Dict[str, dict] = {}
+        if self.shared_cache:
+            known.update(self.shared_cache.get_many(processed_texts, model_version))
+
+        if self.result_store:
+            pending = [t for t in processed_texts if t not in known]
+            if pending:
+                from_store = self.result_store.get_many(pending, model_version)
+                # Sube los hits del disco a la memoria compartida para la proxima vez
+                if self.shared_cache:
+                    self.shared_cache.put_many(from_store, model_version)
+                known.update(from_store)
+
+        known = {text: {**p, "model_version": model_version} for text, p in known.items()}
+
+        # Lo que no estaba exacto puede tener un casi-duplicado (la prediccion ya trae su version)
+        if self.near_duplicates is not None:
+            pending = [t for t in processed_texts if t not in known]
+            if pending:
+                known.update(self.near_duplicates.get_many(pending, model_version))
+
+        return known
+
+    def _remember(self, predictions: Dict[str, dict]) -> None:
+        """
+        Guarda predicciones nuevas en todos los caches configurados.
+        Cada una se guarda con la version del modelo que la hizo (puede cambiar con un hot swap).
+        """
+        by_version: Dict[str, Dict[str, dict]] = {}
+        for text, prediction in predictions.items():
+            by_version.setdefault(prediction["model_version"], {})[text] = prediction
+
+        for version, group in by_version.items():
+            if self.shared_cache:
+                self.shared_cache.put_many(group, version)
+            if self.result_store:
+                # Lo guarda el hilo escritor del store (con las compactaciones): nunca el request
+                self.result_store.put_many_background(group, version)
+            if self.near_duplicates is not None:
+                self.near_duplicates.put_many(group, version)
+
+    def _build_response(
+        self, text: str, prediction: dict, processing_time_ms: float
+    ) -> SentimentResponse:
+        """
+        Arma el SentimentResponse a partir de la prediccion cruda.
+        model_construct() arma el objeto SIN validar: los datos vienen del modelo (no del
+        cliente) y ya tienen los tipos correctos, validarlos en cada request es costo puro.
+        """
+        # Convierte los scores crudos del modelo a objetos SentimentScore (schema de pydantic)
+        scores = [
+            SentimentScore.model_construct(label=s["label"], score=s["score"])
+            for s in prediction["scores"]
+        ]
+
+        # Arma el SentimentResponse completo con todos los campos
+        return SentimentResponse.model_construct(
+            text=text,  # texto original (no el limpio)
+            sentiment=prediction["sentiment"],  # POSITIVE/NEGATIVE/NEUTRAL
+            confidence=prediction["confidence"],  # que tan seguro esta (0-1)
+            scores=scores,  # puntuacion de cada sentimiento
+            processing_time_ms=processing_time_ms,  # cuanto tardo en ms
+            model_version=prediction["model_version"],  # el modelo que atendio el request
+            # Marcado si se reutilizo el resultado de un texto casi identico
+            near_duplicate=prediction.get("near_duplicate", False),
+            similarity=prediction.get("similarity"),
+            exit_layer=prediction.get("exit_layer"),  # capa donde salio (early exit)
+        )
+
 
 # Instancia global del pipeline, lista para importar desde cualquier parte
 # Se usa asi: from app.ml.pipeline import sentiment_pipeline
-sentiment_pipeline = SentimentPipeline()
+sentiment_pipeline = SentimentPipeline(
+    result_store=create_result_store(model_registry.available_models),
+    shared_cache=create_shared_cache(),
+    near_duplicates=create_near_duplicate_index(),
+)
+
+# Bajo presion de memoria el indice de casi-duplicados se vacia (se vuelve a llenar solo)
+if sentiment_pipeline.near_duplicates is not None:
+    memory_guard.register_shrinker("near_duplicates", sentiment_pipeline.near_duplicates.clear)
@@ -0,0 +1,243 @@
+"""
+Registro de modelos.
+Decide que modelo atiende cada request (por idioma o por pedido explicito), carga los modelos
+la primera vez que se usan y desaloja los menos usados cuando se pasa el presupuesto de memoria.
+"""
+
+import gc
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.core import UnknownModelError, get_logger
+from app.ml.model import SentimentModel, sentiment_model
+from app.services.memory import memory_guard
+
+logger = get_logger(__name__)
+
+# Cuantos eventos de carga/desalojo se guardan para mostrar en /health/detailed
+_MAX_EVENTS = 50
+
+
+class ModelRegistry:
+    """
+    Registro de modelos con carga lazy y desalojo LRU (Least Recently Used).
+
+    - El modelo por defecto (MODEL_NAME) queda siempre cargado: nunca se desaloja.
+    - Los demas se cargan al primer uso y se desalojan (el menos usado primero)
+      cuando la suma de memoria de los modelos cargados pasa MODEL_MEMORY_BUDGET_MB.
+    - Un modelo que esta atendiendo un request (use()) no se desaloja.
+    """
+
+    def __init__(
+        self,
+        default_model: Optional[SentimentModel] = None,
+        language_map: Optional[Dict[str, str]] = None,
+        budget_mb: Optional[float] = None,
+        model_factory: Callable[[str], SentimentModel] = SentimentModel,
+    ):
+        self.default_model = default_model or sentiment_model
+        if language_map is None:
+            language_map = settings.MODEL_LANGUAGE_MAP
+        self.language_map = {lang.lower(): name for lang, name in language_map.items()}
+        if budget_mb is None:
+            budget_mb = settings.MODEL_MEMORY_BUDGET_MB
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        # Funcion que crea el modelo de un nombre (se puede inyectar otra para tests)
+        self.model_factory = model_factory
+
+        # Modelos secundarios (el default se maneja aparte: su nombre cambia con un hot swap)
+        self._models: Dict[str, SentimentModel] = {}
+        # OrderedDict como lista LRU: el primero es el menos usado recientemente
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._inflight: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._events: deque = deque(maxlen=_MAX_EVENTS)
+
+        self._lock = threading.Lock()  # protege los dicts de arriba
+        self._load_locks: Dict[str, threading.Lock] = {}  # evita cargar el mismo modelo dos veces
+
+    @property
+    def available_models(self) -> List[str]:
+        """Modelos que se pueden pedir: el default, los del mapa de idiomas y los permitidos."""
+        names = [self.default_model.model_name]
+        names += list(self.language_map.values()) + list(settings.MODEL_ALLOWED_NAMES)
+        return list(dict.fromkeys(names))  # sin repetidos, manteniendo el orden
+
+    def resolve(self, language: Optional[str] = None, model: Optional[str] = None) -> str:
+        """
+        Decide que modelo usar.
+        Un modelo explicito gana; si no, se busca el idioma ("es-AR" cae en "es" si no esta);
+        si el idioma no tiene modelo propio, va el default.
+        """
+        if model:
+            if model not in self.available_models:
+                raise UnknownModelError(model, self.available_models)
+            return model
+
+        if language:
+            language = language.lower()
+            name = self.language_map.get(language) or self.language_map.get(language.split("-")[0])
+            if name:
+                return name
+
+        return self.default_model.model_name
+
+    def version(self, name: str) -> str:
+        """Version (nombre + variante) del modelo, sin cargarlo. Sirve para buscar en los caches."""
+        if name == self.default_model.model_name:
+            return self.default_model.version
+        model = self._models.get(name)
+        return model.version if model else name
+
+    def get(self, name: str) -> SentimentModel:
+        """Devuelve el modelo cargado (lo carga si hace falta)."""
+        with self._lock:
+            if name == self.default_model.model_name:
+                self._touch(name)
+                return self.default_model
+
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = self.model_factory(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+            self._touch(name)
+
+        if not model.is_loaded:
+            with load_lock:
+                if not model.is_loaded:  # otro hilo pudo haberlo cargado mientras esperabamos
+                    self._load(model)
+
+        return model
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[SentimentModel]:
+        """
+        Presta un modelo mientras dura el bloque "with".
+        Mientras esta prestado no se puede desalojar.
+        """
+        with self._lock:
+            self._inflight[name] = self._inflight.get(name, 0) + 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._inflight[name] -= 1
+
+    def _touch(self, name: str) -> None:
+        """Marca el modelo como usado recien (lo mueve al final de la lista LRU)."""
+        self._lru[name] = None
+        self._lru.move_to_end(name)
+        stats = self._stats.setdefault(name, {"loads": 0, "evictions": 0})
+        stats["last_used"] = time.time()
+
+    def _load(self, model: SentimentModel) -> None:
+        """Carga un modelo y despues desaloja otros si se paso el presupuesto."""
+        start = time.time()
+        model.load()
+        load_time_ms = (time.time() - start) * 1000
+        memory = model.memory_bytes()
+
+        with self._lock:
+            stats = self._stats.setdefault(model.model_name, {"loads": 0, "evictions": 0})
+            stats["loads"] += 1
+            self._record_event("load", model.model_name, memory, load_time_ms)
+
+        self._enforce_budget(keep=model.model_name)
+
+    def _enforce_budget(self, keep: str) -> None:
+        """Desaloja modelos (el menos usado primero) hasta entrar en el presupuesto de memoria."""
+        if self.budget_bytes <= 0:
+            return
+
+        evicted = []
+        with self._lock:
+            total = self.default_model.memory_bytes()
+            total += sum(m.memory_bytes() for m in self._models.values())
+            for name in list(self._lru):
+                if total <= self.budget_bytes:
+                    break
+                model = self._models.get(name)
+                # No se desaloja: el default, el que se acaba de cargar, ni uno que esta en uso
+                if (
+                    model is None
+                    or not model.is_loaded
+                    or name == keep
+                    or self._inflight.get(name, 0) > 0
+                ):
+                    continue
+
+                memory = model.memory_bytes()
+                model.unload()
+                total -= memory
+                self._stats[name]["evictions"] += 1
+                self._record_event("evict", name, memory)
+                evicted.append(name)
+
+        if evicted:
+            gc.collect()  # libera ya los tensores del modelo desalojado
+            logger.info(f"Modelos desalojados por presupuesto de memoria: {evicted}")
+
+    def evict_idle(self) -> List[str]:
+        """Desaloja todos los modelos secundarios que no estan en uso (presion de memoria)."""
+        evicted = []
+        with self._lock:
+            for name, model in self._models.items():
+                if model.is_loaded and self._inflight.get(name, 0) == 0:
+                    memory = model.memory_bytes()
+                    model.unload()
+                    self._stats[name]["evictions"] += 1
+                    self._record_event("evict", name, memory)
+                    evicted.append(name)
+
+        if evicted:
+            logger.info(f"Modelos desalojados por presion de memoria: {evicted}")
+        return evicted
+
+    def _record_event(
+        self, event: str, name: str, memory: int, duration_ms: Optional[float] = None
+    ) -> None:
+        self._events.append(
+            {
+                "time": time.time(),
+                "event": event,
+                "model": name,
+                "memory_mb": round(memory / 1024 / 1024, 1),
+                "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            }
+        )
+
+    def status(self) -> List[dict]:
+        """Estado de cada modelo conocido, para /health/detailed."""
+        with self._lock:
+            result = []
+            for name in self.available_models:
+                model = self._models.get(name)
+                if name == self.default_model.model_name:
+                    model = self.default_model
+                stats = self._stats.get(name, {})
+                result.append(
+                    {
+                        "model": name,
+                        "loaded": bool(model and model.is_loaded),
+                        "default": name == self.default_model.model_name,
+                        "memory_mb": round((model.memory_bytes() if model else 0) / 1024 / 1024, 1),
+                        "loads": int(stats.get("loads", 0)),
+                        "evictions": int(stats.get("evictions", 0)),
+                        "last_used": stats.get("last_used"),
+                    }
+                )
+            return result
+
+    def events(self) -> List[dict]:
+        """Ultimos eventos de carga/desalojo (el mas nuevo al final)."""
+        with self._lock:
+            return list(self._events)
+
+
+# Instancia global: el default es el singleton sentiment_model
+model_registry = ModelRegistry()
+memory_guard.register_shrinker("model_registry", model_registry.evict_idle)
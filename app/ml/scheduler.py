@@ -0,0 +1,143 @@
+"""
+Reparto justo de la cola de inferencia entre clientes.
+Sin esto la cola es FIFO: un cliente que manda batches de 100 textos llena la cola y los
+clientes interactivos (un texto por request) esperan detras de todos esos textos.
+
+Se usa Weighted Fair Queuing (start-time fair queuing): cada texto recibe una "etiqueta de fin"
+virtual = inicio + costo / peso, y siempre sale primero la etiqueta mas chica.
+  - costo = tokens estimados del texto: un texto corto no queda atras de documentos largos
+  - peso  = CLIENT_WEIGHTS[cliente] (por defecto CLIENT_DEFAULT_WEIGHT): con peso 2 un cliente
+            recibe el doble de tokens que uno con peso 1 cuando los dos tienen cola
+Un cliente que estuvo inactivo no acumula "credito": arranca desde el tiempo virtual actual.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.latency import RollingLatency
+
+# Caracteres por token, aproximado (BPE/WordPiece en ingles ronda los 4)
+_CHARS_PER_TOKEN = 4
+# Tokens especiales que agrega el tokenizer a cada texto ([CLS], [SEP])
+_SPECIAL_TOKENS = 2
+# Clientes con metricas guardadas (el id viene de un header: no puede crecer sin limite)
+_MAX_TRACKED_CLIENTS = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Costo estimado de un texto en tokens, sin tokenizar (se llama por cada texto encolado)."""
+    return len(text) // _CHARS_PER_TOKEN + _SPECIAL_TOKENS
+
+
+class _ClientStats:
+    """Metricas de un cliente: textos y tokens atendidos, y cuanto esperaron en la cola."""
+
+    __slots__ = ("queued", "served_texts", "served_tokens", "wait")
+
+    def __init__(self):
+        self.queued = 0
+        self.served_texts = 0
+        self.served_tokens = 0
+        self.wait = RollingLatency(settings.LATENCY_WINDOW_S, max_samples=1000)
+
+
+class FairScheduler:
+    """
+    Cola de prioridad por etiqueta de fin virtual (ver el docstring del modulo).
+    No es thread-safe para push/pop: la usa solo el event loop del batcher.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: Optional[float] = None,
+    ):
+        self.weights = weights if weights is not None else settings.CLIENT_WEIGHTS
+        self.default_weight = default_weight or settings.CLIENT_DEFAULT_WEIGHT
+
+        # heap de (etiqueta de fin, orden de llegada, inicio, cliente, costo, encolado, item)
+        self._heap: List[Tuple[float, int, float, str, int, float, Any]] = []
+        self._counter = itertools.count()  # desempata etiquetas iguales por orden de llegada
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}  # ultima etiqueta de fin de cada cliente
+        self._stats: "OrderedDict[str, _ClientStats]" = OrderedDict()
+        self._stats_lock = threading.Lock()  # stats() se puede llamar desde otro hilo
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def weight(self, client: str) -> float:
+        weight = self.weights.get(client, self.default_weight)
+        return weight if weight > 0 else self.default_weight
+
+    def push(self, item: Any, client: str, cost: int) -> None:
+        """Encola un item de un cliente con su costo (tokens estimados)."""
+        start = max(self._virtual_time, self._last_finish.get(client, 0.0))
+        finish = start + cost / self.weight(client)
+        self._last_finish[client] = finish
+        heapq.heappush(
+            self._heap,
+            (finish, next(self._counter), start, client, cost, time.monotonic(), item),
+        )
+        self._client_stats(client).queued += 1
+
+    def pop(self) -> Any:
+        """Saca el item con la etiqueta de fin mas chica (IndexError si esta vacia)."""
+        _, _, start, client, cost, enqueued, item = heapq.heappop(self._heap)
+        # El tiempo virtual avanza al inicio del item atendido
+        self._virtual_time = max(self._virtual_time, start)
+
+        stats = self._client_stats(client)
+        stats.queued -= 1
+        stats.served_texts += 1
+        stats.served_tokens += cost
+        stats.wait.record((time.monotonic() - enqueued) * 1000)
+
+        # Un cliente sin cola cuya etiqueta ya quedo atras no necesita estado
+        if stats.queued == 0 and self._last_finish.get(client, 0.0) <= self._virtual_time:
+            self._last_finish.pop(client, None)
+        return item
+
+    def clear(self) -> None:
+        """Vacia la cola (las metricas de lo ya atendido se conservan)."""
+        self._heap.clear()
+        self._last_finish.clear()
+        self._virtual_time = 0.0
+        with self._stats_lock:
+            for stats in self._stats.values():
+                stats.queued = 0
+
+    def _client_stats(self, client: str) -> _ClientStats:
+        with self._stats_lock:
+            stats = self._stats.get(client)
+            if stats is None:
+                stats = self._stats[client] = _ClientStats()
+                # Se descarta el cliente menos reciente que no tenga nada en cola
+                if len(self._stats) > _MAX_TRACKED_CLIENTS:
+                    for old, old_stats in self._stats.items():
+                        if old_stats.queued == 0 and old != client:
+                            del self._stats[old]
+                            break
+            else:
+                self._stats.move_to_end(client)
+            return stats
+
+    def stats(self) -> Dict[str, dict]:
+        """Metricas por cliente: cola actual, textos/tokens atendidos y espera en la cola."""
+        with self._stats_lock:
+            items = list(self._stats.items())
+        return {
+            client: {
+                "weight": self.weight(client),
+                "queued": stats.queued,
+                "served_texts": stats.served_texts,
+                "served_tokens": stats.served_tokens,
+                "queue_wait": stats.wait.snapshot(),
+            }
+            for client, stats in items
+        }
@@ -0,0 +1,194 @@
+"""
+Inferencia por etapas solapadas: tokenizar → forward → postprocesar.
+Corriendo las tres etapas una detras de otra, el CPU queda ocioso en el tokenizer mientras
+el modelo espera, y el modelo queda ocioso mientras se arman las respuestas. Aca cada etapa
+tiene su propio hilo: mientras el batch N esta en el forward pass, el batch N+1 se tokeniza
+y el batch N-1 se postprocesa. El tokenizer de HuggingFace (Rust) y torch sueltan el GIL,
+asi que las etapas realmente corren en paralelo.
+
+Entre etapa y etapa hay una cola acotada (PIPELINE_QUEUE_SIZE batches): si el modelo es el
+cuello de botella, el tokenizer se frena en vez de acumular tensores en memoria.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from app.config import settings
+from app.core import get_logger
+from app.ml.model import EncodedBatch, SentimentModel
+from app.services.profiler import request_profiler
+
+logger = get_logger(__name__)
+
+STAGES = ("tokenize", "forward", "postprocess")
+
+
+@dataclass
+class _Job:
+    """Un batch de textos viajando por las etapas."""
+
+    texts: List[str]
+    # Devuelve el modelo a usar; lo que registre en el ExitStack se libera despues del forward
+    open_model: Callable[[ExitStack], SentimentModel]
+    future: Future
+    stack: ExitStack = field(default_factory=ExitStack)
+    model: Optional[SentimentModel] = None
+    batch: Optional[EncodedBatch] = None
+
+
+class _StageStats:
+    """Tiempo ocupado de una etapa (para ver cual es el cuello de botella)."""
+
+    __slots__ = ("batches", "texts", "busy_s", "lock")
+
+    def __init__(self):
+        self.batches = 0
+        self.texts = 0
+        self.busy_s = 0.0
+        self.lock = threading.Lock()
+
+
+class StagedInference:
+    """
+    Tres hilos (uno por etapa) conectados por colas. submit() encola un batch y devuelve un
+    Future con sus predicciones; los batches se procesan en orden de llegada.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, name: str = "inference"):
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.name = name
+
+        # La entrada no tiene tope: la acota quien llama (el batcher limita sus batches en vuelo)
+        self._inbox: queue.Queue = queue.Queue()
+        self._to_forward: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._to_postprocess: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._stats = {stage: _StageStats() for stage in STAGES}
+        self._started_at: Optional[float] = None
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    # ---- API ----
+
+    def submit(self, texts: List[str], open_model: Callable[[ExitStack], SentimentModel]) -> Future:
+        """
+        Encola un batch. open_model(stack) corre en el hilo del tokenizer y devuelve el modelo;
+        puede registrar en el stack lo que haya que soltar al terminar (ej: registry.use()).
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._inbox.put(_Job(texts=texts, open_model=open_model, future=future))
+        return future
+
+    def run(self, model: SentimentModel, texts: List[str], batch_size: int) -> List[dict]:
+        """Predice una lista larga en batches de batch_size, con las etapas solapadas."""
+        futures = [
+            self.submit(texts[i : i + batch_size], lambda _: model)
+            for i in range(0, len(texts), batch_size)
+        ]
+        predictions: List[dict] = []
+        for future in futures:
+            predictions += future.result()
+        return predictions
+
+    def stats(self) -> dict:
+        """Por etapa: batches, textos, tiempo ocupado y utilizacion desde el arranque."""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        result = {}
+        for stage, stats in self._stats.items():
+            with stats.lock:
+                result[stage] = {
+                    "batches": stats.batches,
+                    "texts": stats.texts,
+                    "busy_s": round(stats.busy_s, 3),
+                    "utilization": round(stats.busy_s / elapsed, 4) if elapsed else 0.0,
+                }
+        result["tokenize"]["queued"] = self._inbox.qsize()
+        result["forward"]["queued"] = self._to_forward.qsize()
+        result["postprocess"]["queued"] = self._to_postprocess.qsize()
+        return result
+
+    # ---- Hilos ----
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            targets = (self._tokenize_loop, self._forward_loop, self._postprocess_loop)
+            for stage, target in zip(STAGES, targets):
+                thread = threading.Thread(target=target, name=f"{self.name}-{stage}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _record(self, stage: str, job: _Job, start: float) -> None:
+        stats = self._stats[stage]
+        with stats.lock:
+            stats.batches += 1
+            stats.texts += len(job.texts)
+            stats.busy_s += time.monotonic() - start
+
+    def _fail(self, job: _Job, error: BaseException) -> None:
+        if job.batch is not None:
+            job.batch.release()
+        job.stack.close()
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    def _tokenize_loop(self) -> None:
+        while True:
+            job: _Job = self._inbox.get()
+            # Un Future cancelado (el cliente se fue) no se procesa
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            start = time.monotonic()
+            try:
+                with request_profiler.stage():
+                    job.model = job.open_model(job.stack)
+                    job.batch = job.model.encode(job.texts)
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            self._record("tokenize", job, start)
+            self._to_forward.put(job)  # bloquea si el forward va atrasado (cola acotada)
+
+    def _forward_loop(self) -> None:
+        while True:
+            job: _Job = self._to_forward.get()
+            assert job.model is not None and job.batch is not None
+            start = time.monotonic()
+            try:
+                with request_profiler.stage():
+                    job.model.forward(job.batch)
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            # El modelo ya no hace falta: se suelta ya (no espera al postprocesamiento)
+            job.batch.release()
+            job.stack.close()
+            self._record("forward", job, start)
+            self._to_postprocess.put(job)
+
+    def _postprocess_loop(self) -> None:
+        while True:
+            job: _Job = self._to_postprocess.get()
+            assert job.model is not None and job.batch is not None
+            start = time.monotonic()
+            try:
+                with request_profiler.stage():
+                    predictions = job.model.postprocess(job.batch)
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            self._record("postprocess", job, start)
+            job.future.set_result(predictions)
+
+
+# Etapas para los batches grandes del camino sincronico (SentimentPipeline.analyze_batch)
+staged_inference = StagedInference(name="batch")
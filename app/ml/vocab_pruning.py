@@ -0,0 +1,194 @@
+"""
+Poda del vocabulario al dominio (vocab pruning).
+La matriz de embeddings de DistilBERT tiene una fila por cada token del vocabulario (~30k ×
+768 floats ≈ 90 MB por worker), pero el trafico real usa una fraccion. Este modulo cuenta los
+tokens de un corpus propio y arma un modelo con un vocabulario reducido:
+
+  - Se conservan los tokens especiales, los que aparecen en el corpus (al menos min_count
+    veces, hasta max_vocab) y los de un solo caracter ASCII ("a", "##a"...): con esos, una
+    palabra que no estaba en el corpus se sigue partiendo en sub-palabras en vez de quedar [UNK]
+  - Tokenizer nuevo con ese vocabulario (mismas reglas de normalizacion): WordPiece busca la
+    sub-palabra mas larga que quedo; si no puede armar la palabra, va a [UNK]
+  - Embeddings nuevos con las filas de los tokens conservados (el resto del modelo no cambia)
+  - Reporte: memoria ahorrada por worker, tiempo de carga y coincidencia con el modelo completo
+    sobre textos del corpus que no se usaron para contar
+
+Se guarda en MODEL_CACHE_DIR/vocab_pruned/<nombre>; con MODEL_NAME=<esa carpeta> lo carga
+SentimentModel.load. Uso: python -m app.cli prune-vocab corpus.jsonl
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import List, Optional
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+REPORT_FILE = "vocab_pruning.json"
+
+# Argumentos del tokenizer que no se copian al nuevo (son del vocabulario/archivo original)
+_SKIP_KWARGS = {"vocab_file", "tokenizer_file", "added_tokens_decoder", "name_or_path"}
+
+
+def pruned_root() -> str:
+    return os.path.join(settings.MODEL_CACHE_DIR, "vocab_pruned")
+
+
+def token_frequencies(tokenizer, texts: List[str], batch_size: int = 256) -> Counter:
+    """Cuantas veces aparece cada id de token en el corpus."""
+    counts: Counter = Counter()
+    for i in range(0, len(texts), batch_size):
+        encoded = tokenizer(texts[i : i + batch_size], truncation=True, add_special_tokens=False)
+        for ids in encoded["input_ids"]:
+            counts.update(ids)
+    return counts
+
+
+def select_tokens(
+    tokenizer, counts: Counter, min_count: int = 1, max_vocab: Optional[int] = None
+) -> List[int]:
+    """
+    Ids del vocabulario original que se conservan, en el orden original (los especiales
+    mantienen su posicion relativa).
+    """
+    vocab = tokenizer.get_vocab()
+    keep = set(tokenizer.all_special_ids)
+    # Caracteres sueltos: el ultimo recurso de WordPiece antes de [UNK]
+    for token, token_id in vocab.items():
+        char = token[2:] if token.startswith("##") else token
+        if len(char) == 1 and char.isascii():
+            keep.add(token_id)
+
+    frequent = [t for t, n in counts.most_common() if n >= min_count and t not in keep]
+    if max_vocab is not None:
+        frequent = frequent[: max(0, max_vocab - len(keep))]
+    keep.update(frequent)
+    return sorted(keep)
+
+
+def build_tokenizer(tokenizer, kept_ids: List[int]):
+    """Tokenizer del mismo tipo y con las mismas reglas, con el vocabulario reducido."""
+    id_to_token = {i: t for t, i in tokenizer.get_vocab().items()}
+    kwargs = {k: v for k, v in tokenizer.init_kwargs.items() if k not in _SKIP_KWARGS}
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab_file = os.path.join(tmp, "vocab.txt")
+        with open(vocab_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{id_to_token[i]}\n" for i in kept_ids)
+        return type(tokenizer)(vocab_file=vocab_file, **kwargs)
+
+
+def shrink_embeddings(model, kept_ids: List[int]) -> None:
+    """Deja en la matriz de embeddings solo las filas de los tokens conservados."""
+    old = model.get_input_embeddings()
+    new = torch.nn.Embedding(len(kept_ids), old.embedding_dim)
+    new.weight.data = old.weight.data[torch.tensor(kept_ids)].clone()
+    model.set_input_embeddings(new)
+    model.config.vocab_size = len(kept_ids)
+    if model.config.pad_token_id is not None:
+        model.config.pad_token_id = kept_ids.index(model.config.pad_token_id)
+
+
+def _agreement(model, tokenizer, pruned_model, pruned_tokenizer, texts: List[str]) -> float:
+    """Fraccion de textos con la misma clase en el modelo completo y en el podado."""
+    same = 0
+    with torch.inference_mode():
+        for i in range(0, len(texts), 32):
+            batch = texts[i : i + 32]
+            full = model(**tokenizer(batch, padding=True, truncation=True, return_tensors="pt"))
+            pruned = pruned_model(
+                **pruned_tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+            )
+            same += int((full.logits.argmax(dim=1) == pruned.logits.argmax(dim=1)).sum())
+    return same / len(texts)
+
+
+def _unk_rate(tokenizer, texts: List[str]) -> float:
+    """Fraccion de tokens que terminan en [UNK]."""
+    ids = tokenizer(texts, truncation=True, add_special_tokens=False)["input_ids"]
+    total = sum(len(row) for row in ids)
+    unknown = sum(row.count(tokenizer.unk_token_id) for row in ids)
+    return unknown / total if total else 0.0
+
+
+def prune_vocabulary(
+    model_name: str,
+    texts: List[str],
+    min_count: int = 1,
+    max_vocab: Optional[int] = None,
+    holdout: float = 0.2,
+):
+    """
+    Arma el modelo con vocabulario reducido. Devuelve (modelo, tokenizer, reporte).
+    Cuenta tokens con una parte del corpus y mide la coincidencia con el resto.
+    """
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    full_load_s = time.perf_counter() - start
+
+    split = max(1, int(len(texts) * (1 - holdout)))
+    sample, valid = texts[:split], texts[split:] or texts[:split]
+
+    kept_ids = select_tokens(tokenizer, token_frequencies(tokenizer, sample), min_count, max_vocab)
+    pruned_tokenizer = build_tokenizer(tokenizer, kept_ids)
+    pruned_model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    shrink_embeddings(pruned_model, kept_ids)
+
+    embedding = model.get_input_embeddings().weight
+    saved_bytes = (
+        (embedding.shape[0] - len(kept_ids)) * embedding.shape[1] * embedding.element_size()
+    )
+    report = {
+        "source_model": model_name,
+        "vocab_full": embedding.shape[0],
+        "vocab_kept": len(kept_ids),
+        "min_count": min_count,
+        "memory_saved_bytes": saved_bytes,  # por worker: cada proceso tiene su copia
+        "memory_saved_mb": round(saved_bytes / 1024**2, 2),
+        "agreement": round(_agreement(model, tokenizer, pruned_model, pruned_tokenizer, valid), 4),
+        "unk_rate": {
+            "full": round(_unk_rate(tokenizer, valid), 4),
+            "pruned": round(_unk_rate(pruned_tokenizer, valid), 4),
+        },
+        "load_s": {"full": round(full_load_s, 3)},
+        "sample_texts": len(sample),
+        "validation_texts": len(valid),
+        "created_at": time.time(),
+    }
+    logger.info(
+        "Vocabulario: %d de %d tokens, %.1f MB menos por worker, coincidencia %.4f",
+        report["vocab_kept"],
+        report["vocab_full"],
+        report["memory_saved_mb"],
+        report["agreement"],
+    )
+    return pruned_model, pruned_tokenizer, report
+
+
+def save_pruned(model, tokenizer, report: dict) -> str:
+    """
+    Guarda modelo + tokenizer + reporte en MODEL_CACHE_DIR/vocab_pruned. Mide cuanto tarda
+    en cargar lo guardado (se agrega al reporte). Devuelve la carpeta.
+    """
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", report["source_model"])[-64:]
+    path = os.path.join(pruned_root(), f"{safe_name}-v{report['vocab_kept']}")
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+    start = time.perf_counter()
+    AutoTokenizer.from_pretrained(path)
+    AutoModelForSequenceClassification.from_pretrained(path)
+    report["load_s"]["pruned"] = round(time.perf_counter() - start, 3)
+
+    with open(os.path.join(path, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    return path
@@ -0,0 +1,350 @@
+"""
+Modo router: una app liviana que atiende la API publica y reparte los textos entre varias
+instancias de la API (ROUTER_BACKENDS) por hash consistente.
+
+Con un balanceador round-robin delante de N replicas, cada texto cae en cualquiera: los caches
+de cada nodo (resultados, casi-duplicados) aciertan cada vez menos a medida que se agregan
+replicas. Aca el texto decide el backend, siempre el mismo, y cada cache ve "su" parte.
+
+  - Anillo de hash consistente con ROUTER_VIRTUAL_NODES puntos por backend: agregar o sacar
+    un backend solo mueve ~1/N de los textos (el resto sigue pegando en su cache)
+  - Un batch se parte por backend; los sub-batches se mandan en paralelo y los resultados
+    se rearman en el orden original
+  - Un backend que no responde (error de conexion, 502/503/504) se marca caido y sus textos
+    pasan al siguiente en el anillo. Un chequeo de fondo lo vuelve a sumar cuando responde
+  - Conexiones keep-alive reutilizadas (un pool por backend, httpx)
+
+No carga el modelo ni importa torch. Uso:
+    ROUTER_BACKENDS='["http://api-1:8000", "http://api-2:8000"]' uvicorn app.router_app:app
+El streaming por WebSocket no pasa por el router (se conecta directo a una instancia).
+"""
+
+import asyncio
+import bisect
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, Response
+
+from app.config import settings
+from app.core import NoBackendAvailableError, get_logger, setup_logging
+from app.schemas import (
+    BatchSentimentRequest,
+    ComponentHealth,
+    DetailedHealthResponse,
+    SentimentRequest,
+)
+
+setup_logging()
+logger = get_logger(__name__)
+
+_ANALYZE = f"{settings.API_V1_PREFIX}/sentiment/analyze"
+_ANALYZE_BATCH = f"{settings.API_V1_PREFIX}/sentiment/analyze/batch"
+_READY = f"{settings.API_V1_PREFIX}/ready"
+# Respuestas que indican que ESTE backend no puede atender (otro si podria)
+_RETRYABLE_STATUS = {502, 503, 504}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def routing_key(text: str) -> str:
+    """Clave de ruteo: el texto con los espacios normalizados (como lo cachea el backend)."""
+    return " ".join(text.split())
+
+
+class HashRing:
+    """Anillo de hash consistente con nodos virtuales."""
+
+    def __init__(self, nodes: List[str], virtual_nodes: int):
+        self.nodes = list(nodes)
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def walk(self, key: str) -> Iterator[str]:
+        """Backends en el orden del anillo a partir de la clave: el dueño y sus reemplazos."""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, _hash(key))
+        seen: Set[str] = set()
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+
+class _BackendDown(Exception):
+    """El backend no pudo atender (conexion fallida o 502/503/504)."""
+
+
+class BackendPool:
+    """Backends detras del router: ruteo, estado de salud y conexiones keep-alive."""
+
+    def __init__(
+        self,
+        backends: List[str],
+        virtual_nodes: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.backends = [b.rstrip("/") for b in backends]
+        self.ring = HashRing(self.backends, virtual_nodes or settings.ROUTER_VIRTUAL_NODES)
+        self._transport = transport  # para los tests (httpx.MockTransport)
+        self._down: Dict[str, float] = {}  # backend → desde cuando esta caido
+        self._requests: Dict[str, int] = {b: 0 for b in self.backends}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---- Conexiones ----
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Cliente HTTP con pool de conexiones keep-alive. Las conexiones pertenecen al event loop
+        donde se abrieron: si el loop cambio (ej: en los tests) se arma un cliente nuevo.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            connections = settings.ROUTER_MAX_CONNECTIONS * max(1, len(self.backends))
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=settings.ROUTER_TIMEOUT_S,
+                limits=httpx.Limits(
+                    max_connections=connections,
+                    max_keepalive_connections=connections,  # todas quedan abiertas para reusar
+                    keepalive_expiry=60,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---- Ruteo ----
+
+    def pick(self, key: str) -> str:
+        """Primer backend sano en el anillo para la clave."""
+        for backend in self.ring.walk(key):
+            if backend not in self._down:
+                return backend
+        raise NoBackendAvailableError(self.backends)
+
+    def mark_down(self, backend: str, reason: str) -> None:
+        if backend not in self._down:
+            self._down[backend] = time.time()
+            logger.warning(
+                "Backend %s fuera de servicio (%s): se reparte en el resto", backend, reason
+            )
+
+    async def post(self, backend: str, path: str, payload: dict, headers: dict) -> httpx.Response:
+        """Reenvia un request. Levanta _BackendDown si el backend no pudo atenderlo."""
+        self._requests[backend] += 1
+        try:
+            response = await self._get_client().post(
+                f"{backend}{path}", json=payload, headers=headers
+            )
+        except httpx.TransportError as e:
+            self.mark_down(backend, type(e).__name__)
+            raise _BackendDown(backend) from e
+        if response.status_code in _RETRYABLE_STATUS:
+            self.mark_down(backend, f"HTTP {response.status_code}")
+            raise _BackendDown(backend)
+        return response
+
+    # ---- Salud ----
+
+    async def check_health(self) -> None:
+        """Revisa los backends caidos y vuelve a sumar los que responden /ready."""
+        client = self._get_client()
+        for backend in list(self._down):
+            try:
+                response = await client.get(f"{backend}{_READY}", timeout=2.0)
+            except httpx.TransportError:
+                continue
+            if response.status_code == 200:
+                self._down.pop(backend, None)
+                logger.info("Backend %s de nuevo en servicio", backend)
+
+    async def health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ROUTER_HEALTH_INTERVAL_S)
+            try:
+                await self.check_health()
+            except Exception as e:  # el loop de fondo no se puede morir
+                logger.error("Error revisando backends: %s", e)
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "backend": backend,
+                "healthy": backend not in self._down,
+                "down_since": self._down.get(backend),
+                "requests": self._requests[backend],
+            }
+            for backend in self.backends
+        ]
+
+
+def _forward_headers(request: Request) -> dict:
+    """
+    Headers para el backend. El backend reparte su cola por cliente (CLIENT_ID_HEADER): sin
+    header, veria a todos los clientes como la IP del router. Se le pasa la IP original.
+    """
+    client_id = request.headers.get(settings.CLIENT_ID_HEADER)
+    if not client_id and request.client:
+        client_id = f"ip:{request.client.host}"
+    return {settings.CLIENT_ID_HEADER: client_id} if client_id else {}
+
+
+def _passthrough(response: httpx.Response) -> Response:
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/json"),
+    )
+
+
+def _unavailable(error: NoBackendAvailableError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={"error": error.error_code, "message": error.message, "details": error.details},
+    )
+
+
+async def _score_batch(
+    pool: BackendPool, items: List[Tuple[int, str]], base: dict, headers: dict
+) -> Tuple[Dict[int, dict], Optional[httpx.Response]]:
+    """
+    Reparte (posicion, texto) por backend y manda un sub-batch a cada uno, en paralelo.
+    Devuelve posicion → resultado, o la primera respuesta de error de un backend (ej: 400
+    por un modelo desconocido) para devolverla tal cual. Si un backend se cae, sus textos
+    se vuelven a repartir entre los que quedan.
+    """
+    groups: Dict[str, List[Tuple[int, str]]] = {}
+    for item in items:
+        groups.setdefault(pool.pick(routing_key(item[1])), []).append(item)
+
+    async def send(backend: str, group: List[Tuple[int, str]]):
+        payload = {**base, "texts": [text for _, text in group]}
+        try:
+            return group, await pool.post(backend, _ANALYZE_BATCH, payload, headers)
+        except _BackendDown:
+            return group, None
+
+    results: Dict[int, dict] = {}
+    retry: List[Tuple[int, str]] = []
+    for group, response in await asyncio.gather(*(send(b, g) for b, g in groups.items())):
+        if response is None:
+            retry += group
+        elif response.status_code != 200:
+            return results, response
+        else:
+            for (position, _), result in zip(group, response.json()["results"]):
+                results[position] = result
+
+    if retry:
+        # El backend caido ya esta marcado: pick() elige el siguiente del anillo
+        more, error = await _score_batch(pool, retry, base, headers)
+        results.update(more)
+        if error is not None:
+            return results, error
+    return results, None
+
+
+def create_router_app(pool: Optional[BackendPool] = None) -> FastAPI:
+    """Arma la app del router (los tests le pasan un pool con transporte simulado)."""
+    pool = pool or BackendPool(settings.ROUTER_BACKENDS)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        logger.info("Router con %d backends: %s", len(pool.backends), ", ".join(pool.backends))
+        health_task = asyncio.create_task(pool.health_loop(), name="router-health")
+        yield
+        health_task.cancel()
+        await pool.close()
+
+    app = FastAPI(
+        title=f"{settings.PROJECT_NAME} (router)",
+        version=settings.VERSION,
+        openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+        docs_url=f"{settings.API_V1_PREFIX}/docs",
+        lifespan=lifespan,
+    )
+    app.state.pool = pool
+
+    @app.post(_ANALYZE, tags=["Sentiment Analysis"])
+    async def analyze(body: SentimentRequest, request: Request) -> Response:
+        """Reenvia el texto al backend que le toca (o al siguiente sano del anillo)."""
+        payload = body.model_dump(exclude_none=True)
+        headers = _forward_headers(request)
+        key = routing_key(body.text)
+        # Como mucho un intento por backend: cada falla lo saca del anillo
+        for _ in pool.backends:
+            try:
+                backend = pool.pick(key)
+                return _passthrough(await pool.post(backend, _ANALYZE, payload, headers))
+            except NoBackendAvailableError as e:
+                raise _unavailable(e)
+            except _BackendDown:
+                continue
+        raise _unavailable(NoBackendAvailableError(pool.backends))
+
+    @app.post(_ANALYZE_BATCH, tags=["Sentiment Analysis"])
+    async def analyze_batch(body: BatchSentimentRequest, request: Request) -> Response:
+        """Parte el batch por backend, manda los sub-batches en paralelo y rearma el orden."""
+        start = time.perf_counter()
+        base = body.model_dump(exclude_none=True, exclude={"texts"})
+        try:
+            results, error = await _score_batch(
+                pool, list(enumerate(body.texts)), base, _forward_headers(request)
+            )
+        except NoBackendAvailableError as e:
+            raise _unavailable(e)
+        if error is not None:
+            return _passthrough(error)
+        return JSONResponse(
+            {
+                "results": [results[i] for i in range(len(body.texts))],
+                "total_processing_time_ms": round((time.perf_counter() - start) * 1000, 2),
+                "texts_analyzed": len(body.texts),
+            }
+        )
+
+    @app.get(f"{settings.API_V1_PREFIX}/health", response_model=DetailedHealthResponse)
+    async def health() -> DetailedHealthResponse:
+        """Sano si al menos un backend esta en servicio."""
+        backends = pool.status()
+        healthy = sum(b["healthy"] for b in backends)
+        if healthy == len(backends) and backends:
+            overall = "healthy"
+        else:
+            overall = "degraded" if healthy else "unhealthy"
+        return DetailedHealthResponse(
+            status=overall,
+            version=settings.VERSION,
+            components=[
+                ComponentHealth(
+                    name=b["backend"],
+                    status="healthy" if b["healthy"] else "unhealthy",
+                    details=b,
+                )
+                for b in backends
+            ],
+        )
+
+    return app
+
+
+app = create_router_app()
@@ -1,5 +1,16 @@
 """Schemas (Pydantic models) para la API."""
 
+from app.schemas.admin import (
+    AutotunerStatus,
+    ClientQueueStats,
+    MemoryStatus,
+    ModelSwapRequest,
+    ModelSwapStatus,
+    ProfileRequest,
+    ProfileStatus,
+    SchedulerStatus,
+    TracemallocEntry,
+)
 from app.schemas.health import ComponentHealth, DetailedHealthResponse, HealthResponse
 from app.schemas.sentiment import (
     BatchSentimentRequest,
@@ -9,6 +20,7 @@ from app.schemas.sentiment import (
     SentimentRequest,
     SentimentResponse,
     SentimentScore,
+    StoredSentimentResponse,
 )
 
 __all__ = [
@@ -21,7 +33,18 @@ __all__ = [
     "SentimentRequest",
     "SentimentResponse",
     "SentimentScore",
+    "StoredSentimentResponse",
     "BatchSentimentRequest",
     "BatchSentimentResponse",
     "ErrorResponse",
+    # Admin
+    "ModelSwapRequest",
+    "ModelSwapStatus",
+    "ProfileRequest",
+    "ProfileStatus",
+    "MemoryStatus",
+    "TracemallocEntry",
+    "ClientQueueStats",
+    "SchedulerStatus",
+    "AutotunerStatus",
 ]
@@ -0,0 +1,150 @@
+"""
+Schemas para los endpoints de administracion (/admin).
+"""
+
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class ModelSwapRequest(BaseModel):
+    """Request para reemplazar el modelo en caliente."""
+
+    model_name: str = Field(
+        ...,
+        min_length=1,
+        description="Modelo de HuggingFace (o carpeta local) a poner en servicio",
+        examples=["distilbert-base-uncased-finetuned-sst-2-english"],
+    )
+    variant: Literal["default", "quantized"] = Field(
+        default="default", description="default = pesos originales, quantized = Linear en int8"
+    )
+
+    class Config:
+        protected_namespaces = ()  # permite usar campos que empiezan con "model_" sin warning
+
+
+class ModelSwapStatus(BaseModel):
+    """Estado del ultimo hot swap."""
+
+    state: str = Field(..., description="idle / loading / warming / draining / done / failed")
+    current_version: str = Field(..., description="Version del modelo en servicio ahora")
+    model_name: Optional[str] = Field(None, description="Modelo pedido en el ultimo swap")
+    variant: Optional[str] = None
+    previous_version: Optional[str] = Field(None, description="Version que estaba antes del swap")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ProfileRequest(BaseModel):
+    """Request para perfilar el servicio en vivo."""
+
+    mode: Literal["sampling", "deterministic"] = Field(
+        default="sampling",
+        description="sampling = muestrea stacks (bajo overhead), deterministic = cProfile",
+    )
+    requests: Optional[int] = Field(
+        None, ge=1, le=100000, description="Perfilar los proximos N requests"
+    )
+    duration_s: Optional[float] = Field(
+        None, gt=0, le=300, description="Perfilar durante esta ventana de tiempo (segundos)"
+    )
+    interval_ms: float = Field(
+        default=5.0, ge=1, le=100, description="Cada cuanto se toma un sample (modo sampling)"
+    )
+
+    # model_validator revisa el request completo (no un solo campo)
+    @model_validator(mode="after")
+    def requires_requests_or_duration(self) -> "ProfileRequest":
+        if self.requests is None and self.duration_s is None:
+            raise ValueError("Hay que indicar requests, duration_s o ambos")
+        return self
+
+
+class ProfileStatus(BaseModel):
+    """Estado y resultado de la ultima sesion de profiling."""
+
+    state: str = Field(..., description="idle / running / done")
+    mode: Optional[str] = None
+    max_requests: Optional[int] = None
+    duration_s: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    requests_profiled: int = 0
+    samples: Optional[int] = Field(
+        None, description="Samples tomados (sampling) o llamadas registradas (deterministic)"
+    )
+    components: Optional[Dict[str, float]] = Field(
+        None,
+        description="Fraccion del tiempo en preprocessor, tokenizer, forward, response y other",
+    )
+    top_functions: Optional[List[Dict[str, Any]]] = None
+
+
+class MemoryStatus(BaseModel):
+    """Uso de memoria del proceso y estado de la guardia de presupuesto."""
+
+    rss_mb: Optional[float] = Field(None, description="Memoria fisica en uso (RSS)")
+    peak_rss_mb: float = Field(..., description="Pico de RSS desde el arranque")
+    budget_mb: Optional[float] = Field(None, description="MEMORY_BUDGET_MB (None = sin limite)")
+    pressure: str = Field(..., description="ok / high / critical")
+    torch: Optional[Dict[str, float]] = Field(None, description="Allocator de torch (solo con GPU)")
+    top_requests: List[Dict[str, Any]] = Field(
+        ...,
+        description=(
+            "Requests recientes que mas hicieron crecer el RSS (aproximado: incluye lo que "
+            "reservaron los requests concurrentes). Vacio sin MEMORY_BUDGET_MB ni "
+            "MEMORY_TRACK_REQUESTS"
+        ),
+    )
+    events: List[Dict[str, Any]] = Field(..., description="Cambios recientes de presion")
+    gc: Optional[Dict[str, Any]] = Field(
+        None, description="Umbrales del GC, objetos congelados y pausas por generacion"
+    )
+
+
+class TracemallocEntry(BaseModel):
+    """Una linea de codigo y cuanta memoria reservo."""
+
+    location: str
+    size_kb: float
+    count: int
+
+
+class ClientQueueStats(BaseModel):
+    """Metricas de un cliente en la cola de inferencia."""
+
+    weight: float = Field(..., description="Peso del cliente en el reparto (CLIENT_WEIGHTS)")
+    queued: int = Field(..., description="Textos esperando en la cola ahora")
+    served_texts: int = Field(..., description="Textos atendidos")
+    served_tokens: int = Field(..., description="Tokens atendidos (estimados)")
+    queue_wait: Dict[str, Any] = Field(
+        ..., description="Espera en la cola (p50/p99/max en ms) en la ventana LATENCY_WINDOW_S"
+    )
+
+
+class SchedulerStatus(BaseModel):
+    """Estado de la cola de inferencia compartida."""
+
+    queued: int = Field(..., description="Textos en cola (todos los clientes)")
+    clients: Dict[str, ClientQueueStats]
+
+
+class AutotunerStatus(BaseModel):
+    """Estado del autoajuste del micro-batching."""
+
+    enabled: bool = Field(..., description="False si SLO_P99_MS es 0 (valores fijos)")
+    slo_p99_ms: Optional[float] = Field(None, description="Objetivo de p99 (SLO_P99_MS)")
+    max_batch_size: int = Field(..., description="Tamaño maximo de batch vigente")
+    max_wait_ms: float = Field(..., description="Espera vigente para juntar un batch")
+    last_p99_ms: Optional[float] = Field(None, description="p99 del ultimo intervalo evaluado")
+    decisions: Dict[str, int] = Field(
+        default_factory=dict, description="Cantidad de decisiones por tipo"
+    )
+    recent: List[Dict[str, Any]] = Field(
+        default_factory=list, description="Ultimas decisiones (p99, llenado, valores nuevos)"
+    )
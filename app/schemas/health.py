@@ -4,7 +4,7 @@ Definen la FORMA que tienen las respuestas JSON del endpoint /health.
 """
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 # BaseModel = clase base de pydantic para definir "la forma" de un dato
 # Field = permite agregar validaciones y descripciones a cada campo
@@ -39,6 +39,9 @@ class ComponentHealth(BaseModel):
     message: Optional[str] = Field(
         None, description="Mensaje adicional"  # None = si no se pasa, queda vacio
     )
+    details: Optional[Dict[str, Any]] = Field(
+        None, description="Informacion extra del componente (metricas, eventos, etc)"
+    )
 
 
 # Schema para la respuesta DETALLADA que incluye el estado de cada componente
@@ -40,6 +40,11 @@ class SentimentRequest(BaseModel):
         examples=["en", "es"],
     )
 
+    model: Optional[str] = Field(
+        default=None,  # si no se pide, el modelo lo elige el idioma (o el default)
+        description="Modelo a usar explicitamente (debe estar habilitado en la configuracion)",
+    )
+
     # Validador personalizado: se ejecuta ANTES de aceptar el valor de "text"
     @field_validator("text")
     @classmethod
@@ -94,6 +99,18 @@ class SentimentResponse(BaseModel):
 
     model_version: str = Field(..., description="Version del modelo usado")
 
+    # Si el resultado se reutilizo de un texto casi identico (sin correr el modelo)
+    near_duplicate: bool = Field(
+        default=False, description="True = resultado reutilizado de un texto casi identico"
+    )
+    similarity: Optional[float] = Field(
+        default=None, ge=0.0, le=1.0, description="Similitud con el texto reutilizado"
+    )
+    # Con early exit: la capa del modelo donde salio la prediccion (None = early exit apagado)
+    exit_layer: Optional[int] = Field(
+        default=None, description="Capa del modelo donde salio la prediccion (early exit)"
+    )
+
     timestamp: datetime = Field(
         default_factory=lambda: datetime.now(
             timezone.utc
@@ -115,11 +132,30 @@ class SentimentResponse(BaseModel):
                 ],
                 "processing_time_ms": 45.2,
                 "model_version": "distilbert-base-uncased-finetuned-sst-2-english",
+                "near_duplicate": False,
+                "similarity": None,
+                "exit_layer": None,
                 "timestamp": "2024-01-15T10:30:00Z",
             }
         }
 
 
+class StoredSentimentResponse(BaseModel):
+    """
+    Resultado ya calculado, buscado por el hash del texto (GET /analyze/by-hash/{text_hash}).
+    No trae el texto: el servicio solo guarda su hash.
+    """
+
+    text_hash: str = Field(..., description="SHA-256 del texto preprocesado")
+    sentiment: SentimentLabel = Field(..., description="Sentimiento predominante")
+    confidence: float = Field(..., ge=0.0, le=1.0, description="Confianza en la prediccion (0-1)")
+    scores: List[SentimentScore] = Field(..., description="Puntuaciones para cada sentimiento")
+    model_version: str = Field(..., description="Version del modelo usado")
+
+    class Config:
+        protected_namespaces = ()
+
+
 # -------- BATCH: para analizar VARIOS textos de una sola vez --------
 
 
@@ -135,6 +171,8 @@ class BatchSentimentRequest(BaseModel):
 
     language: str = Field(default="en")
 
+    model: Optional[str] = Field(default=None, description="Modelo a usar explicitamente")
+
     # Validador que recorre CADA texto de la lista y lo valida individualmente
     @field_validator("texts")
     @classmethod
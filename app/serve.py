@@ -0,0 +1,236 @@
+"""
+Lanzador pre-fork: carga el modelo UNA vez y despues forkea los workers.
+
+Con `uvicorn --workers N` cada worker importa torch y carga el modelo por su cuenta: N veces
+el tiempo de arranque y N copias privadas de los pesos. Aca el proceso maestro:
+  1. importa la app y carga el modelo (con 1 thread de torch: sin pool de OpenMP antes del fork)
+  2. corre un warm-up, hace gc.collect() y gc.freeze(): todo lo que vive hasta ahora queda
+     fuera del GC. Si no, el GC de cada worker recorre (y escribe) esos objetos y rompe el
+     copy-on-write: las paginas de memoria compartidas se terminan copiando en cada worker
+  3. abre el socket de escucha y forkea N workers que atienden en ese mismo socket.
+     Los pesos del modelo quedan compartidos (copy-on-write) entre todos los workers
+  4. supervisa: si un worker muere, lo reemplaza (con espera creciente si muere enseguida)
+
+Cuantos workers y cuantos threads de torch por worker lo decide el plan de CPU (cores del
+contenedor y CPU_PROFILE, ver app/ml/cpu_planner.py), salvo que se pasen a mano.
+
+Uso:
+    python -m app.serve [--workers 4] [--torch-threads 2] [--port 8000]
+    python -m app.serve --calibrate    # mide el modelo, guarda el mejor plan y sale
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import torch
+import uvicorn
+
+from app.config import settings
+from app.core import get_logger, setup_logging, stop_logging
+from app.ml import cpu_planner
+
+logger = get_logger(__name__)
+
+# Un worker que muere antes de esto se considera un crash al arrancar: se espera antes de
+# reemplazarlo (cada vez mas, hasta _MAX_BACKOFF_S) para no quedar en un loop de forks
+_MIN_UPTIME_S = 10.0
+_MAX_BACKOFF_S = 30.0
+
+
+def _listen(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Socket de escucha compartido: lo heredan todos los workers y el kernel reparte conexiones."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Proceso maestro: forkea los workers, los vigila y los reemplaza si mueren."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, torch_threads: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.torch_threads = torch_threads
+
+        self._children: Dict[int, float] = {}  # pid → momento en que arranco
+        self._crashes = 0  # crashes seguidos al arrancar (para la espera creciente)
+        self._stopping = False
+
+    # ---- Workers ----
+
+    def _spawn(self) -> None:
+        # El hilo de logging no sobrevive al fork (y su lock podria quedar tomado en el hijo):
+        # se frena antes y cada proceso arma el suyo despues
+        stop_logging()
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()  # nunca vuelve
+        setup_logging()
+        self._children[pid] = time.monotonic()
+        logger.info("Worker %d iniciado (%d threads de torch)", pid, self.torch_threads)
+
+    def _run_worker(self) -> None:
+        """Codigo del hijo: configura el proceso y corre uvicorn sobre el socket heredado."""
+        exit_code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)  # uvicorn instala los suyos
+            setup_logging()
+            gc.enable()
+            torch.set_num_threads(self.torch_threads)
+
+            config = uvicorn.Config(self.app, log_config=None, lifespan="on")
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException as e:  # el hijo nunca debe volver al loop del maestro
+            logger.exception("Worker %d termino con error: %s", os.getpid(), e)
+            exit_code = 1
+        finally:
+            stop_logging()
+            os._exit(exit_code)
+
+    def _reap(self) -> None:
+        """Junta los workers que terminaron y los reemplaza."""
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+
+            uptime = time.monotonic() - started
+            logger.warning(
+                "Worker %d murio (status %s) despues de %.1fs: se reemplaza",
+                pid,
+                os.waitstatus_to_exitcode(status),
+                uptime,
+            )
+            self._crashes = self._crashes + 1 if uptime < _MIN_UPTIME_S else 0
+            if self._crashes:
+                time.sleep(min(_MAX_BACKOFF_S, 2 ** (self._crashes - 1)))
+            if not self._stopping:
+                self._spawn()
+
+    # ---- Ciclo de vida ----
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        while not self._stopping:
+            self._reap()
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Apagado ordenado: SIGTERM a cada worker (uvicorn termina los requests en curso)."""
+        logger.info("Apagando %d workers...", len(self._children))
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self._children.pop(pid, None)
+
+        deadline = time.monotonic() + timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._children):  # los que no terminaron a tiempo
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:  # termino justo despues del ultimo _reap
+                pass
+        self.sock.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lanzador pre-fork de la API")
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVE_WORKERS,
+        help="Cantidad de workers (0 = los decide el plan de CPU)",
+    )
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=settings.SERVE_TORCH_THREADS,
+        help="Threads de torch por worker (0 = los decide el plan de CPU)",
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Mide el modelo con distintos threads, guarda el mejor plan en MODEL_CACHE_DIR y sale",
+    )
+    args = parser.parse_args(argv)
+
+    # En el maestro torch usa 1 thread: asi no arranca el pool de OpenMP antes del fork
+    # (un pool heredado por fork puede colgar al hijo). Cada worker fija el suyo
+    torch.set_num_threads(1)
+    # Lo mismo con el pool de threads del tokenizer (Rust): despues del fork no se puede usar
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Sin GC durante la carga: los objetos que se crean ahora viven todo el proceso
+    gc.disable()
+
+    from app.main import app  # importa la app (y con ella el pipeline, los caches, etc.)
+    from app.ml import sentiment_model
+
+    plan = cpu_planner.plan_for_startup(args.workers or None, args.torch_threads or None)
+    start = time.time()
+    sentiment_model.load()
+    sentiment_model.predict_batch(["Warm-up before forking the workers."])
+    logger.info("Modelo cargado en el maestro en %.1fs", time.time() - start)
+
+    if args.calibrate:
+        # Sale despues de calibrar: la calibracion arranca el pool de threads de torch en este
+        # proceso, y el maestro no puede tenerlo antes de forkear
+        plan = cpu_planner.calibrate(sentiment_model, plan.cpus, plan.profile)
+        cpu_planner.save_plan(plan, cpu_planner.plan_path(), settings.MODEL_NAME)
+        logger.info("Plan calibrado guardado en %s: %s", cpu_planner.plan_path(), plan.to_dict())
+        stop_logging()
+        return 0
+
+    # Los workers heredan el plan (el lifespan aplica el resto: pool de threads, batches en vuelo)
+    cpu_planner.active_plan = plan
+
+    gc.collect()
+    gc.freeze()  # lo que existe ahora queda fuera del GC (y sus paginas, compartidas)
+
+    sock = _listen(args.host, args.port)
+    logger.info(
+        "Escuchando en %s:%d con %d workers (%d threads de torch c/u)",
+        args.host,
+        args.port,
+        plan.workers,
+        plan.torch_threads,
+    )
+    Supervisor(app, sock, plan.workers, plan.torch_threads).run()
+    stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Ajuste del garbage collector y medicion de sus pausas.
+Despues de cargar el modelo, el proceso tiene un grafo enorme de objetos que viven para
+siempre (transformers, el tokenizer, los modulos de torch). El GC ciclico lo vuelve a recorrer
+en cada coleccion de generacion 2, y eso aparece como picos de latencia cuando pydantic crea
+muchos objetos por request.
+
+  - tune_gc():  congela (gc.freeze) todo lo que existe despues de la carga: el GC no lo vuelve
+                a recorrer. Y aplica GC_THRESHOLDS (umbrales mas altos = menos colecciones)
+  - GcMonitor:  cuenta las colecciones y mide cada pausa por generacion (gc.callbacks), para
+                comparar el p99 de las pausas antes y despues de tocar la configuracion
+"""
+
+import gc
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.core import get_logger
+from app.services.latency import RollingLatency
+
+logger = get_logger(__name__)
+
+_GENERATIONS = (0, 1, 2)
+
+
+def tune_gc(thresholds: Optional[List[int]] = None, freeze: Optional[bool] = None) -> dict:
+    """
+    Aplica los umbrales y congela el heap actual. Se llama una vez, con el modelo ya cargado.
+    Devuelve lo aplicado (umbrales vigentes y objetos congelados).
+    """
+    thresholds = thresholds if thresholds is not None else settings.GC_THRESHOLDS
+    freeze = freeze if freeze is not None else settings.GC_FREEZE_AFTER_LOAD
+
+    if thresholds:
+        gc.set_threshold(*thresholds)
+    if freeze:
+        # Primero se junta la basura de la carga: congelarla la dejaria viva para siempre
+        gc.collect()
+        gc.freeze()
+
+    applied = {"thresholds": list(gc.get_threshold()), "frozen_objects": gc.get_freeze_count()}
+    logger.info(
+        "GC: umbrales %s, %d objetos congelados", applied["thresholds"], applied["frozen_objects"]
+    )
+    return applied
+
+
+class _GenerationStats:
+    __slots__ = ("collections", "collected", "total_ms", "max_ms", "pauses")
+
+    def __init__(self, window_s: float):
+        self.collections = 0
+        self.collected = 0  # objetos liberados
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.pauses = RollingLatency(window_s, max_samples=1000)
+
+
+class GcMonitor:
+    """Pausas del GC por generacion, medidas con gc.callbacks."""
+
+    def __init__(self, window_s: Optional[float] = None):
+        window_s = window_s or settings.LATENCY_WINDOW_S
+        self._stats: Dict[int, _GenerationStats] = {
+            g: _GenerationStats(window_s) for g in _GENERATIONS
+        }
+        self._started_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+
+    def stop(self) -> None:
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    def _callback(self, phase: str, info: dict) -> None:
+        # Corre adentro de cada coleccion: tiene que ser barato. Las colecciones no se solapan
+        # (las hace el hilo que tiene el GIL), asi que alcanza con un solo "inicio"
+        if phase == "start":
+            self._started_at = time.perf_counter()
+            return
+        if self._started_at is None:
+            return
+        pause_ms = (time.perf_counter() - self._started_at) * 1000
+        self._started_at = None
+
+        stats = self._stats.get(info["generation"])
+        if stats is None:
+            return
+        stats.collections += 1
+        stats.collected += info.get("collected", 0)
+        stats.total_ms += pause_ms
+        stats.max_ms = max(stats.max_ms, pause_ms)
+        stats.pauses.record(pause_ms)
+
+    def stats(self) -> dict:
+        """Por generacion: colecciones, objetos liberados, pausa total/maxima y p50/p99 recientes."""
+        generations = {}
+        for generation, stats in self._stats.items():
+            generations[str(generation)] = {
+                "collections": stats.collections,
+                "collected": stats.collected,
+                "total_ms": round(stats.total_ms, 2),
+                "max_ms": round(stats.max_ms, 2),
+                "recent": stats.pauses.snapshot(),
+            }
+        return {
+            "thresholds": list(gc.get_threshold()),
+            "frozen_objects": gc.get_freeze_count(),
+            "generations": generations,
+        }
+
+
+# Instancia global: la arranca el lifespan, la lee /admin/memory
+gc_monitor = GcMonitor()
@@ -0,0 +1,54 @@
+"""
+Ventanas de latencia con percentiles (p50/p99).
+Registrar una medicion es O(1) (un append a un deque). Los percentiles se calculan aparte,
+en segundo plano, y quedan precalculados para que /health/detailed solo los lea.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.config import settings
+
+# Tope de mediciones guardadas por ventana (con mucho trafico la ventana se acorta sola)
+_MAX_SAMPLES = 10000
+
+
+class RollingLatency:
+    """Latencias de los ultimos window_s segundos."""
+
+    def __init__(self, window_s: float, max_samples: int = _MAX_SAMPLES):
+        self.window_s = window_s
+        # deque con maxlen descarta solo el elemento mas viejo: append es O(1)
+        self._samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        """Registra una medicion (se llama en el camino caliente: tiene que ser barato)."""
+        self._samples.append((time.monotonic(), latency_ms))
+
+    def snapshot(self) -> dict:
+        """Calcula p50/p99/max de la ventana. Se llama en segundo plano, nunca por request."""
+        cutoff = time.monotonic() - self.window_s
+        with self._lock:
+            # Descarta lo que ya salio de la ventana
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = np.fromiter((ms for _, ms in list(self._samples)), dtype=float)
+
+        if values.size == 0:
+            return {"samples": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+
+        p50, p99 = np.percentile(values, [50, 99])
+        return {
+            "samples": int(values.size),
+            "p50_ms": round(float(p50), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(values.max()), 2),
+        }
+
+
+# Latencia de los requests reales (la registra el pipeline)
+traffic_latency = RollingLatency(settings.LATENCY_WINDOW_S)
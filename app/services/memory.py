@@ -0,0 +1,304 @@
+"""
+Instrumentacion de memoria y guardia de presupuesto (RSS).
+Mide cuanta memoria usa el proceso (RSS), el allocator de torch, y cuanto crecio la memoria
+en los requests mas pesados. Si se configura MEMORY_BUDGET_MB, un hilo de fondo vigila el RSS
+y, ANTES de que el kernel mate el proceso (OOM), toma medidas:
+  - high:     achica el tamaño maximo de batch y libera caches (modelos secundarios, etc)
+  - critical: ademas rechaza los requests batch con 503
+"""
+
+import asyncio
+import ctypes
+import gc
+import heapq
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Fracciones del presupuesto que disparan cada nivel
+_HIGH_RATIO = 0.85
+_CRITICAL_RATIO = 0.95
+_RECOVER_RATIO = 0.75  # por debajo de esto se vuelve a "ok" (histeresis: evita oscilar)
+_LEVELS = {"ok": 0, "high": 1, "critical": 2}
+
+# Cuantos requests recientes se guardan para el ranking de los mas pesados
+_RECENT_REQUESTS = 500
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (ValueError, OSError, AttributeError):
+    _PAGE_SIZE = 4096
+
+
+# /proc/self/statm abierto una vez por proceso: (pid, fd). Abrir el archivo en cada lectura
+# cuesta mas que leerlo, y el middleware lo lee dos veces por request
+_statm: Tuple[int, int] = (0, -1)
+
+
+def process_rss_bytes() -> Optional[int]:
+    """RSS actual del proceso (memoria fisica en uso). None si el sistema no lo expone."""
+    global _statm
+    pid, fd = _statm
+    try:
+        # Despues de un fork el fd heredado apunta al statm del padre: se reabre
+        if pid != os.getpid():
+            if fd >= 0:
+                os.close(fd)
+            fd = os.open(f"/proc/{os.getpid()}/statm", os.O_RDONLY)
+            _statm = (os.getpid(), fd)
+        # statm: "tamaño total  residente  ..." en paginas. pread relee desde el principio
+        return int(os.pread(fd, 128, 0).split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss_bytes() -> int:
+    """Pico de RSS desde que arranco el proceso."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En Linux viene en KB, en macOS en bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def torch_memory() -> Optional[Dict[str, float]]:
+    """Memoria del allocator de torch (solo con GPU; en CPU torch no lleva estas cuentas)."""
+    torch = sys.modules.get("torch")  # no se importa torch solo para esto
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return {
+        "allocated_mb": round(torch.cuda.memory_allocated() / 1024 / 1024, 1),
+        "peak_allocated_mb": round(torch.cuda.max_memory_allocated() / 1024 / 1024, 1),
+        "reserved_mb": round(torch.cuda.memory_reserved() / 1024 / 1024, 1),
+    }
+
+
+def _malloc_trim() -> None:
+    """Le pide a glibc que devuelva al sistema la memoria libre (si no, el RSS no baja)."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryGuard:
+    """
+    Vigila el RSS contra MEMORY_BUDGET_MB y expone el estado de presion de memoria.
+    Los demas componentes lo consultan (batch_size_limit, shed_bulk) o registran
+    funciones para liberar memoria (register_shrinker).
+    """
+
+    def __init__(self, budget_mb: Optional[float] = None):
+        if budget_mb is None:
+            budget_mb = settings.MEMORY_BUDGET_MB
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.pressure = "ok"  # ok / high / critical
+
+        self._shrinkers: Dict[str, Callable[[], None]] = {}
+        self._recent: deque = deque(maxlen=_RECENT_REQUESTS)
+        self._events: deque = deque(maxlen=50)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- Acciones de proteccion ----
+
+    @property
+    def shed_bulk(self) -> bool:
+        """True = rechazar los requests batch (la memoria esta por acabarse)."""
+        return self.pressure == "critical"
+
+    def batch_size_limit(self, max_batch_size: int) -> int:
+        """Tamaño de batch permitido segun la presion actual (activaciones ∝ tamaño del batch)."""
+        if self.pressure == "critical":
+            return max(1, max_batch_size // 4)
+        if self.pressure == "high":
+            return max(1, max_batch_size // 2)
+        return max_batch_size
+
+    def register_shrinker(self, name: str, shrink: Callable[[], None]) -> None:
+        """Registra una funcion que libera memoria (ej: vaciar un cache) bajo presion."""
+        self._shrinkers[name] = shrink
+
+    # ---- Vigilancia ----
+
+    def start(self) -> None:
+        """Arranca el hilo que vigila el RSS (solo si hay presupuesto configurado)."""
+        if self.budget_bytes <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="memory-guard", daemon=True)
+        self._thread.start()
+        logger.info("Memory guard activo: presupuesto %d MB", self.budget_bytes // 1024 // 1024)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(settings.MEMORY_CHECK_INTERVAL_S):
+            try:
+                self.check()
+            except Exception as e:  # el guard nunca tiene que morir por un error puntual
+                logger.warning("Memory guard: error revisando memoria: %s", e)
+
+    def check(self, rss: Optional[int] = None) -> str:
+        """Compara el RSS con el presupuesto, actualiza la presion y toma medidas."""
+        if self.budget_bytes <= 0:
+            return self.pressure
+        rss = rss if rss is not None else process_rss_bytes()
+        if rss is None:
+            return self.pressure
+
+        ratio = rss / self.budget_bytes
+        previous = self.pressure
+        if ratio >= _CRITICAL_RATIO:
+            pressure = "critical"
+        elif ratio >= _HIGH_RATIO:
+            pressure = "high"
+        elif ratio < _RECOVER_RATIO or previous == "ok":
+            pressure = "ok"
+        else:
+            pressure = previous if previous != "critical" else "high"
+
+        if pressure != previous:
+            self.pressure = pressure
+            self._record_event(previous, pressure, rss)
+            if pressure != "ok":
+                logger.warning(
+                    "Presion de memoria %s: RSS %.0f MB de %.0f MB",
+                    pressure,
+                    rss / 1024 / 1024,
+                    self.budget_bytes / 1024 / 1024,
+                )
+            else:
+                logger.info("Presion de memoria normalizada: RSS %.0f MB", rss / 1024 / 1024)
+
+        # Al subir de nivel se liberan caches (una vez por subida, no en cada chequeo)
+        if _LEVELS[pressure] > _LEVELS[previous]:
+            self.shrink()
+
+        return self.pressure
+
+    def shrink(self) -> List[str]:
+        """Corre todos los shrinkers registrados y devuelve la memoria libre al sistema."""
+        shrunk = []
+        for name, shrink in list(self._shrinkers.items()):
+            try:
+                shrink()
+                shrunk.append(name)
+            except Exception as e:
+                logger.warning("Memory guard: fallo el shrinker %s: %s", name, e)
+        gc.collect()
+        _malloc_trim()
+        return shrunk
+
+    def _record_event(self, previous: str, pressure: str, rss: int) -> None:
+        self._events.append(
+            {
+                "time": time.time(),
+                "from": previous,
+                "to": pressure,
+                "rss_mb": round(rss / 1024 / 1024, 1),
+            }
+        )
+
+    # ---- Footprint por request ----
+
+    def record_request(
+        self, path: str, rss_before: int, rss_after: int, duration_ms: float
+    ) -> None:
+        """Guarda cuanto crecio el RSS durante un request."""
+        self._recent.append(
+            {
+                "time": time.time(),
+                "path": path,
+                "rss_delta_mb": round((rss_after - rss_before) / 1024 / 1024, 2),
+                "rss_after_mb": round(rss_after / 1024 / 1024, 1),
+                "duration_ms": round(duration_ms, 1),
+            }
+        )
+
+    def top_requests(self, n: int = 10) -> List[dict]:
+        """Los N requests recientes que mas hicieron crecer la memoria."""
+        return heapq.nlargest(n, list(self._recent), key=lambda r: r["rss_delta_mb"])
+
+    # ---- Reporte ----
+
+    def status(self) -> dict:
+        rss = process_rss_bytes()
+        return {
+            "rss_mb": round(rss / 1024 / 1024, 1) if rss is not None else None,
+            "peak_rss_mb": round(peak_rss_bytes() / 1024 / 1024, 1),
+            "budget_mb": round(self.budget_bytes / 1024 / 1024, 1) if self.budget_bytes else None,
+            "pressure": self.pressure,
+            "torch": torch_memory(),
+            "top_requests": self.top_requests(),
+            "events": list(self._events),
+        }
+
+
+async def tracemalloc_top(top: int = 20, duration_s: float = 5.0) -> List[dict]:
+    """
+    Snapshot de tracemalloc: las lineas de codigo que mas memoria reservaron.
+    Si tracemalloc no estaba prendido, lo prende durante duration_s (mientras atiende
+    trafico normal) y lo apaga: tiene overhead, no se deja activo.
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+        await asyncio.sleep(duration_s)
+    try:
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        {
+            "location": str(stat.traceback),
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+
+class MemoryMiddleware:
+    """
+    Middleware ASGI que mide el RSS antes y despues de cada request HTTP,
+    para el ranking de requests mas pesados.
+    La cifra es aproximada: el RSS es del proceso entero, asi que incluye lo que reservaron
+    los requests concurrentes y los hilos de fondo, y el allocator no siempre devuelve memoria.
+    Solo se registra con MEMORY_BUDGET_MB o MEMORY_TRACK_REQUESTS (ver app/main.py).
+    """
+
+    def __init__(self, app, guard: Optional[MemoryGuard] = None):
+        self.app = app
+        self.guard = guard or memory_guard
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        rss_before = process_rss_bytes()
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            rss_after = process_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                self.guard.record_request(
+                    scope["path"], rss_before, rss_after, (time.perf_counter() - start) * 1000
+                )
+
+
+# Instancia global
+memory_guard = MemoryGuard()
@@ -0,0 +1,72 @@
+"""
+Hot swap del modelo en un hilo de fondo.
+Carga el modelo nuevo al lado del actual, lo calienta, lo pone en servicio y libera el viejo
+cuando terminan las predicciones en curso. Guarda el estado para poder consultarlo por la API.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from app.core import get_logger
+from app.ml import SentimentModel, sentiment_model
+
+logger = get_logger(__name__)
+
+
+class ModelSwapper:
+    """Coordina UN hot swap a la vez sobre el modelo default."""
+
+    def __init__(self, model: Optional[SentimentModel] = None):
+        self.model = model or sentiment_model
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status: dict = {"state": "idle"}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> dict:
+        """Estado del ultimo swap + la version que esta en servicio ahora."""
+        with self._lock:
+            return {**self._status, "current_version": self.model.version}
+
+    def start(self, model_name: str, variant: str = "default") -> bool:
+        """Arranca el swap en segundo plano. Devuelve False si ya hay uno en curso."""
+        with self._lock:
+            if self.is_running:
+                return False
+            self._status = {
+                "state": "loading",
+                "model_name": model_name,
+                "variant": variant,
+                "previous_version": self.model.version,
+                "started_at": time.time(),
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(model_name, variant), name="model-swap", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def _set_state(self, state: str) -> None:
+        with self._lock:
+            self._status["state"] = state
+
+    def _run(self, model_name: str, variant: str) -> None:
+        logger.info(f"Hot swap iniciado: {model_name} ({variant})")
+        try:
+            self.model.swap(model_name, variant, on_progress=self._set_state)
+            self._set_state("done")
+        except Exception as e:
+            logger.error(f"Hot swap fallido, sigue en servicio el modelo anterior: {e}")
+            with self._lock:
+                self._status.update(state="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._status["finished_at"] = time.time()
+
+
+# Instancia global
+model_swapper = ModelSwapper()
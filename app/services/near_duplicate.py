@@ -0,0 +1,181 @@
+"""
+Indice de casi-duplicados (MinHash + LSH por bandas).
+Muchos textos no son duplicados exactos pero casi: la misma review con otro nombre de producto,
+el mismo tweet con un emoji de mas. Los caches exactos (por hash del texto) no los encuentran.
+
+Cada texto se resume en una firma MinHash de NUM_PERM valores: la fraccion de valores iguales
+entre dos firmas estima la similitud de Jaccard entre sus conjuntos de "shingles" (palabras y
+pares de palabras). La firma se parte en bandas: dos textos son candidatos si coinciden en al
+menos una banda completa, asi la busqueda no compara contra todo el indice. Despues se
+verifica la similitud estimada contra NEAR_DUP_THRESHOLD.
+
+El indice es un LRU acotado a NEAR_DUP_MAX_ENTRIES textos, en memoria del proceso.
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Firma de 64 valores en 16 bandas de 4: con similitud 0.8 dos textos caen en la misma
+# banda con probabilidad ~0.9999; con similitud 0.3, ~0.12 (candidatos que despues se descartan)
+NUM_PERM = 64
+_BANDS = 16
+_ROWS = NUM_PERM // _BANDS
+
+# Con menos palabras que esto no se buscan casi-duplicados: en textos muy cortos una sola
+# palabra distinta ("good" → "not good") cambia el sentimiento
+_MIN_WORDS = 4
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+# Permutaciones (a*x + b) mod p, fijas: las firmas tienen que ser comparables entre reinicios
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+
+def _shingles(text: str) -> Optional[Set[str]]:
+    """Palabras y pares de palabras del texto (en minuscula). None si es muy corto."""
+    words = _WORDS.findall(text.lower())
+    if len(words) < _MIN_WORDS:
+        return None
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """Firma MinHash del texto (NUM_PERM enteros). None si el texto es muy corto."""
+    shingles = _shingles(text)
+    if shingles is None:
+        return None
+    # crc32 de cada shingle (32 bits) → NUM_PERM permutaciones de una, vectorizado
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Similitud de Jaccard estimada entre dos firmas."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    Indice LRU de textos ya analizados → prediccion, buscable por similitud.
+    Las predicciones se guardan por version de modelo (un hot swap no reutiliza las viejas).
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+        # id de entrada → (version, firma, prediccion); el orden es el del LRU
+        self._entries: "OrderedDict[int, Tuple[str, np.ndarray, dict]]" = OrderedDict()
+        # (version, numero de banda, bytes de la banda) → ids de las entradas con esa banda
+        self._buckets: Dict[Tuple[str, int, bytes], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _bands(signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(_BANDS, _ROWS)]
+
+    def get_many(self, texts: List[str], model_version: str) -> Dict[str, dict]:
+        """
+        Busca un casi-duplicado para cada texto. Devuelve texto → prediccion reutilizada,
+        con "near_duplicate": True y la "similarity" encontrada.
+        """
+        found: Dict[str, dict] = {}
+        for text in texts:
+            signature = minhash(text)
+            if signature is None:
+                continue
+            match = self._best_match(signature, model_version)
+            if match is not None:
+                prediction, score = match
+                found[text] = {**prediction, "near_duplicate": True, "similarity": round(score, 4)}
+        return found
+
+    def _best_match(
+        self, signature: np.ndarray, model_version: str
+    ) -> Optional[Tuple[dict, float]]:
+        with self._lock:
+            self.lookups += 1
+            candidates: Set[int] = set()
+            for i, band in enumerate(self._bands(signature)):
+                candidates |= self._buckets.get((model_version, i, band), set())
+
+            best: Optional[Tuple[int, float]] = None
+            for entry_id in candidates:
+                _, stored, _ = self._entries[entry_id]
+                score = similarity(signature, stored)
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (entry_id, score)
+
+            if best is None:
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best[0])
+            return self._entries[best[0]][2], best[1]
+
+    def put_many(self, predictions: Dict[str, dict], model_version: str) -> None:
+        """Agrega textos recien analizados (los mas viejos salen si se pasa del maximo)."""
+        for text, prediction in predictions.items():
+            signature = minhash(text)
+            if signature is None:
+                continue
+            with self._lock:
+                entry_id = self._next_id
+                self._next_id += 1
+                self._entries[entry_id] = (model_version, signature, prediction)
+                for i, band in enumerate(self._bands(signature)):
+                    self._buckets.setdefault((model_version, i, band), set()).add(entry_id)
+                while len(self._entries) > self.max_entries:
+                    self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, (version, signature, _) = self._entries.popitem(last=False)
+        for i, band in enumerate(self._bands(signature)):
+            key = (version, i, band)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self) -> None:
+        """Vacia el indice (lo usa la guardia de memoria bajo presion)."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "lookups": self.lookups,
+            "hits": self.hits,
+        }
+
+
+def create_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Crea el indice segun la configuracion. Si NEAR_DUP_MAX_ENTRIES es 0, devuelve None."""
+    if settings.NEAR_DUP_MAX_ENTRIES <= 0:
+        return None
+    return NearDuplicateIndex(settings.NEAR_DUP_MAX_ENTRIES, settings.NEAR_DUP_THRESHOLD)
@@ -0,0 +1,388 @@
+"""
+Profiling bajo demanda del servicio en vivo.
+Perfila los proximos N requests o una ventana de tiempo, y devuelve cuanto tiempo se fue en
+cada parte del camino caliente (preprocesamiento, tokenizer, forward del modelo, armado de la
+respuesta) y los stacks colapsados para armar un flamegraph.
+
+Dos modos:
+  - sampling:      un hilo mira los stacks de TODOS los hilos cada interval_ms (sys._current_frames).
+                   Bajo overhead; incluye el hilo de inferencia del micro-batching.
+  - deterministic: cProfile en el hilo del event loop mientras hay requests perfilados en curso,
+                   y uno por cada batch en los hilos de las etapas (tokenizer, forward,
+                   postprocesamiento: ver Profiler.stage). Exacto (cuenta cada llamada), pero
+                   mas caro.
+
+Cuando no hay una sesion activa, el middleware solo revisa un booleano: overhead cero.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Componentes del camino caliente. Para cada sample se recorre el stack desde el frame mas
+# interno hacia afuera y gana el primer componente que coincide.
+COMPONENTS = ("preprocessor", "tokenizer", "forward", "response", "other")
+
+# Frames "hoja" de un hilo que esta esperando (no trabajando): esos samples no se cuentan
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+
+# Funciones que marcan cada componente en el modo deterministic (archivo, funcion)
+_DETERMINISTIC_MARKERS = {
+    "preprocessor": [("preprocessor.py", "preprocess"), ("preprocessor.py", "preprocess_batch")],
+    "tokenizer": [("tokenization_utils_base.py", "__call__")],
+    "forward": [("module.py", "_call_impl")],
+    "response": [("pipeline.py", "_build_response"), ("model.py", "_format_predictions")],
+}
+
+# Stacks mas profundos que esto se recortan (por la raiz) en el formato colapsado
+_MAX_STACK_DEPTH = 128
+
+
+def _component(frames: List[Tuple[str, str]]) -> str:
+    """A que componente pertenece un stack (frames de adentro hacia afuera)."""
+    for filename, function in frames:
+        path = filename.replace("\\", "/")
+        if path.endswith("app/ml/preprocessor.py"):
+            return "preprocessor"
+        if "/tokenization_" in path or "/tokenizers/" in path:
+            return "tokenizer"
+        if "/torch/" in path or "/transformers/models/" in path or path.endswith("compiled.py"):
+            return "forward"
+        if function in ("_build_response", "_format_predictions") or "/pydantic" in path:
+            return "response"
+        if path.endswith("fastapi/routing.py") and function == "serialize_response":
+            return "response"
+    return "other"
+
+
+class Profiler:
+    """
+    Una sesion de profiling a la vez. Se arranca desde /admin/profile y termina sola
+    al completar N requests o al pasar la ventana de tiempo (lo que ocurra primero).
+    """
+
+    def __init__(self):
+        # Lo UNICO que se revisa en cada request cuando no se esta perfilando
+        self.active = False
+
+        self._lock = threading.Lock()
+        self._status: dict = {"state": "idle"}
+        self._mode = "sampling"
+        self._max_requests: Optional[int] = None
+        self._deadline = 0.0
+        self._requests = 0
+        self._inflight = 0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._stage_profiles: List[cProfile.Profile] = []  # de los hilos de las etapas
+        self._stacks: Counter = Counter()
+        self._components: Counter = Counter()
+        self._collapsed = ""
+        self._session = 0  # numero de sesion: un timer viejo no corta una sesion nueva
+
+    # ---- Control de la sesion ----
+
+    def start(
+        self,
+        mode: str = "sampling",
+        requests: Optional[int] = None,
+        duration_s: Optional[float] = None,
+        interval_ms: float = 5.0,
+    ) -> bool:
+        """Arranca una sesion. Devuelve False si ya hay una corriendo."""
+        with self._lock:
+            # Una sesion deterministic puede estar cerrandose todavia (requests en curso)
+            if self.active or self._cprofile is not None:
+                return False
+
+            self._session += 1
+            session = self._session
+            self._mode = mode
+            self._max_requests = requests
+            # Sin ventana explicita, igual hay un tope: nunca queda perfilando para siempre
+            self._deadline = time.monotonic() + (duration_s or 300.0)
+            self._requests = 0
+            self._inflight = 0
+            self._stage_profiles = []
+            self._stacks = Counter()
+            self._components = Counter()
+            self._collapsed = ""
+            self._stop.clear()
+            self._status = {
+                "state": "running",
+                "mode": mode,
+                "max_requests": requests,
+                "duration_s": duration_s,
+                "started_at": time.time(),
+            }
+
+            if mode == "deterministic":
+                self._cprofile = cProfile.Profile()
+            else:
+                self._sampler = threading.Thread(
+                    target=self._sample_loop,
+                    args=(interval_ms / 1000,),
+                    name="profiler-sampler",
+                    daemon=True,
+                )
+                self._sampler.start()
+
+            self.active = True
+
+        # La ventana de tiempo se controla con un timer (el modo deterministic no tiene hilo propio)
+        timer = threading.Timer(
+            max(0.0, self._deadline - time.monotonic()), self._expire, args=(session,)
+        )
+        timer.daemon = True
+        timer.start()
+
+        logger.info(
+            "Profiling iniciado: mode=%s requests=%s duration=%s", mode, requests, duration_s
+        )
+        return True
+
+    def _expire(self, session: int) -> None:
+        """Fin de la ventana de tiempo (si la sesion sigue siendo la misma)."""
+        if session == self._session:
+            self.stop()
+
+    def stop(self) -> None:
+        """Termina la sesion y arma el resultado."""
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            self._stop.set()
+            sampler, self._sampler = self._sampler, None
+            profile = self._cprofile
+            # cProfile solo se puede apagar desde el hilo que lo prendio (el del event loop):
+            # si hay requests perfilados en curso, el ultimo en terminar cierra la sesion
+            if profile is not None and self._inflight > 0:
+                return
+            self._cprofile = None
+            stage_profiles, self._stage_profiles = self._stage_profiles, []
+
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join(timeout=5)
+        self._finish(profile, stage_profiles)
+
+    def _finish(
+        self, profile: Optional[cProfile.Profile], stage_profiles: List[cProfile.Profile]
+    ) -> None:
+        """Arma el resultado de la sesion (cProfile ya tiene que estar apagado)."""
+        if profile is not None:
+            result = self._deterministic_result([profile, *stage_profiles])
+        else:
+            result = self._sampling_result()
+        with self._lock:
+            self._status.update(
+                result,
+                state="done",
+                finished_at=time.time(),
+                requests_profiled=self._requests,
+            )
+        logger.info("Profiling terminado: %d requests perfilados", self._requests)
+
+    def status(self) -> dict:
+        with self._lock:
+            status = dict(self._status)
+            if status["state"] == "running":
+                status["requests_profiled"] = self._requests
+            return status
+
+    def collapsed(self) -> str:
+        """Stacks colapsados del ultimo profiling (formato de flamegraph.pl / speedscope)."""
+        with self._lock:
+            return self._collapsed
+
+    # ---- Hooks por request (los llama el middleware SOLO si active es True) ----
+
+    def request_started(self) -> bool:
+        """Registra un request. Devuelve False si la sesion ya no acepta mas."""
+        with self._lock:
+            if not self.active:
+                return False
+            if self._max_requests is not None and self._requests >= self._max_requests:
+                return False
+            self._requests += 1
+            self._inflight += 1
+            if self._cprofile is not None and self._inflight == 1:
+                self._cprofile.enable()
+            return True
+
+    def request_finished(self) -> None:
+        finished_profile = None
+        stage_profiles: List[cProfile.Profile] = []
+        with self._lock:
+            self._inflight -= 1
+            if self._cprofile is not None and self._inflight == 0:
+                self._cprofile.disable()
+                if not self.active:
+                    # stop() llego mientras habia requests en curso: se cierra aca
+                    finished_profile, self._cprofile = self._cprofile, None
+                    stage_profiles, self._stage_profiles = self._stage_profiles, []
+            done = (
+                self._max_requests is not None
+                and self._requests >= self._max_requests
+                and self._inflight == 0
+            )
+
+        if finished_profile is not None:
+            self._finish(finished_profile, stage_profiles)
+        elif done:
+            self.stop()
+
+    # ---- Hilos de las etapas (modo deterministic) ----
+
+    @contextmanager
+    def stage(self) -> Iterator[None]:
+        """
+        Envuelve el trabajo de un batch en un hilo de StagedInference. cProfile solo ve el
+        hilo que lo prende: con una sesion deterministic, cada batch se perfila con su propio
+        cProfile y al terminar se suma al de la sesion. Sin sesion solo revisa un atributo.
+        """
+        if self._cprofile is None:
+            yield
+            return
+
+        session = self._session
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                # Si la sesion ya termino (o es otra), este batch queda afuera
+                if self._cprofile is not None and self._session == session:
+                    self._stage_profiles.append(profile)
+
+    # ---- Modo sampling ----
+
+    def _sample_loop(self, interval: float) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(interval):
+            if time.monotonic() >= self._deadline:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < _MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    frames.append((code.co_filename, code.co_name))
+                    frame = frame.f_back
+                if not frames:
+                    continue
+                leaf_file, leaf_function = frames[0]
+                if (os.path.basename(leaf_file), leaf_function) in _IDLE_LEAVES:
+                    continue
+
+                self._components[_component(frames)] += 1
+                # Formato colapsado: de la raiz a la hoja, separado por ";"
+                stack = ";".join(f"{os.path.basename(f)}:{fn}" for f, fn in reversed(frames))
+                self._stacks[stack] += 1
+
+    def _sampling_result(self) -> dict:
+        total = sum(self._components.values())
+        self._collapsed = "\n".join(f"{stack} {count}" for stack, count in self._stacks.items())
+
+        # Funciones "hoja" con mas samples (donde realmente se esta gastando el CPU)
+        leaves: Counter = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        return {
+            "samples": total,
+            "components": {
+                name: round(self._components[name] / total, 4) if total else 0.0
+                for name in COMPONENTS
+            },
+            "top_functions": [
+                {"function": function, "samples": count}
+                for function, count in leaves.most_common(20)
+            ],
+        }
+
+    # ---- Modo deterministic ----
+
+    def _deterministic_result(self, profiles: List[cProfile.Profile]) -> dict:
+        # Suma el hilo del event loop y los de las etapas (pstats no acepta un profile vacio)
+        stats = pstats.Stats()
+        for profile in profiles:
+            profile.create_stats()
+            if profile.stats:  # type: ignore[attr-defined]
+                stats.add(profile)
+        # stats.stats: (archivo, linea, funcion) → (llamadas prim., llamadas, tiempo propio, tiempo acumulado, callers)
+        entries = stats.stats  # type: ignore[attr-defined]
+        total = stats.total_tt  # type: ignore[attr-defined]
+
+        components: Dict[str, float] = {name: 0.0 for name in COMPONENTS}
+        for name, markers in _DETERMINISTIC_MARKERS.items():
+            for (filename, _, function), (_, _, _, cumulative, _) in entries.items():
+                if (os.path.basename(filename), function) in markers:
+                    components[name] += cumulative
+        attributed = sum(components.values())
+        components["other"] = max(0.0, total - attributed)
+
+        top = sorted(entries.items(), key=lambda item: item[1][3], reverse=True)[:20]
+        return {
+            "samples": sum(calls for _, calls, _, _, _ in entries.values()),
+            "components": {
+                name: round(seconds / total, 4) if total else 0.0
+                for name, seconds in components.items()
+            },
+            "top_functions": [
+                {
+                    "function": f"{os.path.basename(filename)}:{lineno}:{function}",
+                    "calls": calls,
+                    "self_s": round(own, 6),
+                    "total_s": round(cumulative, 6),
+                }
+                for (filename, lineno, function), (_, calls, own, cumulative, _) in top
+            ],
+        }
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que avisa al profiler cuando empieza/termina cada request HTTP.
+    Es ASGI "puro" (no BaseHTTPMiddleware): sin profiling activo solo agrega un if.
+    """
+
+    def __init__(self, app, profiler: Optional[Profiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.active or scope["type"] != "http" or "/admin/" in scope["path"]:
+            return await self.app(scope, receive, send)
+
+        if not profiler.request_started():
+            return await self.app(scope, receive, send)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            profiler.request_finished()
+
+
+# Instancia global
+request_profiler = Profiler()
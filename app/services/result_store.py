@@ -0,0 +1,370 @@
+"""
+Store persistente de predicciones en disco (SQLite en modo WAL).
+Guarda el resultado de cada texto ya analizado para no volver a correr el modelo.
+A diferencia de un cache en memoria, sobrevive a reinicios y deploys, y lo comparten
+todos los workers de uvicorn que apunten al mismo archivo.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core import get_logger
+from app.schemas import SentimentLabel
+
+logger = get_logger(__name__)
+
+# Cada cuantas escrituras se revisa si el archivo paso el limite de tamaño
+_COMPACT_EVERY_WRITES = 1000
+
+# Grupos de predicciones esperando al hilo escritor. Si se llena (disco trabado), las
+# predicciones nuevas no se guardan: es un cache, el request no espera por el disco
+_MAX_PENDING_WRITES = 1000
+
+
+def text_hash(text: str) -> str:
+    """Hash del contenido del texto (ya preprocesado). Es la clave del store."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """
+    Store clave-valor sobre SQLite.
+    Clave: (hash del texto preprocesado, version del modelo). Valor: la prediccion en JSON.
+
+    - WAL (write-ahead log): los lectores no bloquean al escritor ni entre ellos,
+      asi varios procesos pueden leer el mismo archivo en paralelo.
+    - Cada hilo/proceso usa su propia conexion (las conexiones de sqlite no se comparten).
+    - Si cambia MODEL_NAME (o los modelos por idioma), las filas de modelos que ya no se
+      usan se borran al abrir el store.
+    - Si el archivo pasa max_mb, se borran las entradas mas viejas y se compacta
+      (auto_vacuum incremental: el archivo en disco se achica de verdad).
+    - put_many_background() encola y vuelve: un hilo escritor hace los INSERT y las
+      compactaciones, asi un request nunca espera un lock de escritura ni un VACUUM.
+    """
+
+    def __init__(self, path: str, model_versions: List[str], max_mb: float):
+        self.path = path
+        self.model_versions = sorted(set(model_versions))  # modelos validos (el resto se borra)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self._local = threading.local()  # una conexion por hilo
+        self._init_lock = threading.Lock()
+        self._initialized_pid: Optional[int] = None
+        self._writes = 0
+
+        # Hilo escritor (se arranca con la primera escritura; de nuevo despues de un fork)
+        self._pending: "queue.Queue[Tuple[Dict[str, dict], str]]" = queue.Queue(
+            maxsize=_MAX_PENDING_WRITES
+        )
+        self._writer_pid: Optional[int] = None
+        self._writer_lock = threading.Lock()
+
+    # ---- Conexion ----
+
+    def _connection(self) -> sqlite3.Connection:
+        """Devuelve la conexion del hilo actual (la crea si no existe o si el proceso hizo fork)."""
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == pid:
+            return conn
+
+        # timeout = cuanto espera si otro proceso tiene el lock de escritura
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        # auto_vacuum solo se activa en una base nueva, antes de pasar a WAL y de crear tablas:
+        # sin eso incremental_vacuum no devuelve espacio al disco. En una base existente no hace nada
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # con WAL es seguro y mucho mas rapido que FULL
+        self._local.conn = conn
+        self._local.pid = pid
+
+        with self._init_lock:
+            if self._initialized_pid != pid:
+                self._initialize(conn)
+                self._initialized_pid = pid
+
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection) -> None:
+        """Crea las tablas e invalida las entradas de modelos que ya no estan configurados."""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                text_hash TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (text_hash, model_version)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # BEGIN IMMEDIATE toma el lock de escritura: si dos workers arrancan a la vez,
+        # solo uno hace la invalidacion
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            versions = json.dumps(self.model_versions)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'model_versions'").fetchone()
+            if row is None or row[0] != versions:
+                # model_version puede traer la variante ("modelo:quantized"): se compara el nombre
+                placeholders = ",".join("?" * len(self.model_versions))
+                deleted = conn.execute(
+                    "DELETE FROM results WHERE (CASE WHEN instr(model_version, ':') > 0 "
+                    "THEN substr(model_version, 1, instr(model_version, ':') - 1) "
+                    f"ELSE model_version END) NOT IN ({placeholders})",
+                    self.model_versions,
+                ).rowcount
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('model_versions', ?)",
+                    (versions,),
+                )
+                if deleted:
+                    logger.info(f"Result store: {deleted} entradas invalidadas (cambio de modelo)")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ---- Lectura / escritura ----
+
+    def get(self, text: str, model_version: str) -> Optional[dict]:
+        """Busca la prediccion de un texto. Devuelve None si no esta."""
+        return self.get_many([text], model_version).get(text)
+
+    def get_many(self, texts: List[str], model_version: str) -> Dict[str, dict]:
+        """Busca varias predicciones en una sola query. Devuelve {texto: prediccion} de los encontrados."""
+        if not texts:
+            return {}
+
+        hashes = {text_hash(text): text for text in texts}
+        placeholders = ",".join("?" * len(hashes))
+        try:
+            rows = (
+                self._connection()
+                .execute(
+                    f"SELECT text_hash, payload FROM results "
+                    f"WHERE model_version = ? AND text_hash IN ({placeholders})",
+                    (model_version, *hashes),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            # Un problema con el store nunca debe romper la prediccion: se trata como miss
+            logger.warning(f"Result store: error leyendo: {e}")
+            return {}
+
+        return {hashes[h]: self._decode(payload) for h, payload in rows}
+
+    def get_by_hash(self, digest: str, model_version: str) -> Optional[dict]:
+        """Busca por el hash del texto (text_hash), sin tener el texto. None si no esta."""
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT payload FROM results WHERE model_version = ? AND text_hash = ?",
+                    (model_version, digest),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Result store: error leyendo: {e}")
+            return None
+        return self._decode(row[0]) if row else None
+
+    def put(self, text: str, prediction: dict, model_version: str) -> None:
+        """Guarda la prediccion de un texto."""
+        self.put_many({text: prediction}, model_version)
+
+    def put_many(self, predictions: Dict[str, dict], model_version: str) -> None:
+        """Guarda varias predicciones en una sola transaccion."""
+        if not predictions:
+            return
+
+        now = time.time()
+        rows = [
+            (text_hash(text), model_version, self._encode(prediction), now)
+            for text, prediction in predictions.items()
+        ]
+        conn: Optional[sqlite3.Connection] = None
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (text_hash, model_version, payload, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"Result store: error escribiendo: {e}")
+            # Sin ROLLBACK la conexion queda dentro de la transaccion y todas las escrituras
+            # siguientes de este hilo fallan ("cannot start a transaction within a transaction")
+            if conn is not None and conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            return
+
+        self._writes += len(rows)
+        if self._writes >= _COMPACT_EVERY_WRITES:
+            self._writes = 0
+            self.compact()
+
+    def put_many_background(self, predictions: Dict[str, dict], model_version: str) -> None:
+        """Como put_many(), pero en el hilo escritor: no bloquea a quien llama."""
+        if not predictions:
+            return
+        self._ensure_writer()
+        try:
+            self._pending.put_nowait((predictions, model_version))
+        except queue.Full:
+            logger.warning(
+                "Result store: cola de escritura llena, %d entradas sin guardar", len(predictions)
+            )
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que el hilo escritor guarde todo lo encolado. False si no termino a tiempo."""
+        deadline = time.monotonic() + timeout
+        while self._pending.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _ensure_writer(self) -> None:
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._writer_lock:
+            if self._writer_pid == pid:
+                return
+            # Despues de un fork el hilo del padre no existe: cola y hilo nuevos
+            self._pending = queue.Queue(maxsize=_MAX_PENDING_WRITES)
+            threading.Thread(
+                target=self._write_loop, name="result-store-writer", daemon=True
+            ).start()
+            self._writer_pid = pid
+
+    def _write_loop(self) -> None:
+        pending = self._pending
+        while True:
+            groups = [pending.get()]
+            # Lo que se fue acumulando se guarda en una sola transaccion por version
+            while len(groups) < 64:
+                try:
+                    groups.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            by_version: Dict[str, Dict[str, dict]] = {}
+            for predictions, model_version in groups:
+                by_version.setdefault(model_version, {}).update(predictions)
+            try:
+                for model_version, predictions in by_version.items():
+                    self.put_many(predictions, model_version)
+            except Exception as e:  # el hilo no se puede morir: las proximas escrituras esperan
+                logger.warning(f"Result store: error en el hilo escritor: {e}")
+            finally:
+                for _ in groups:
+                    pending.task_done()
+
+    # ---- Compactacion ----
+
+    def size_bytes(self) -> int:
+        """Tamaño actual de la base (sin contar el WAL)."""
+        conn = self._connection()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def compact(self) -> None:
+        """
+        Si el store paso el limite, borra las entradas mas viejas hasta quedar en ~80%
+        del limite y devuelve las paginas libres al disco.
+        """
+        try:
+            conn = self._connection()
+            size = self.size_bytes()
+            if size <= self.max_bytes:
+                return
+
+            # Estima cuantas filas hay que borrar a partir del tamaño promedio por fila.
+            # Las paginas no se liberan exactamente en proporcion, asi que repite (pocas veces)
+            target = int(self.max_bytes * 0.8)
+            deleted = 0
+            for _ in range(5):
+                count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if count == 0 or size <= target:
+                    break
+                to_delete = max(1, int(count * (size - target) / size))
+                deleted += conn.execute(
+                    "DELETE FROM results WHERE (text_hash, model_version) IN "
+                    "(SELECT text_hash, model_version FROM results ORDER BY created_at LIMIT ?)",
+                    (to_delete,),
+                ).rowcount
+                # executescript corre el pragma hasta el final; execute() libera una sola pagina
+                conn.executescript("PRAGMA incremental_vacuum;")
+                size = self.size_bytes()
+
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Store creado sin auto_vacuum incremental: incremental_vacuum no hace nada.
+                # VACUUM reescribe el archivo (y deja activado el modo incremental para la proxima)
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info(f"Result store compactado: {deleted} entradas eliminadas")
+        except sqlite3.Error as e:
+            logger.warning(f"Result store: error compactando: {e}")
+
+    # ---- Serializacion ----
+
+    @staticmethod
+    def _encode(prediction: dict) -> str:
+        """Prediccion → JSON compacto (los Enum se guardan como su valor)."""
+        return json.dumps(
+            {
+                "sentiment": prediction["sentiment"].value,
+                "confidence": prediction["confidence"],
+                "scores": [[s["label"].value, s["score"]] for s in prediction["scores"]],
+            },
+            separators=(",", ":"),
+        )
+
+    @staticmethod
+    def _decode(payload: str) -> dict:
+        """JSON → prediccion con el mismo formato que devuelve SentimentModel.predict()."""
+        data = json.loads(payload)
+        return {
+            "sentiment": SentimentLabel(data["sentiment"]),
+            "confidence": data["confidence"],
+            "scores": [
+                {"label": SentimentLabel(label), "score": score} for label, score in data["scores"]
+            ],
+            "processing_time_ms": 0.0,  # no hubo inferencia
+        }
+
+
+def create_result_store(model_versions: List[str]) -> Optional[ResultStore]:
+    """Crea el store segun la configuracion. Si RESULT_STORE_PATH no esta definido, devuelve None."""
+    if not settings.RESULT_STORE_PATH:
+        return None
+
+    directory = os.path.dirname(settings.RESULT_STORE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    logger.info(f"Result store persistente activado: {settings.RESULT_STORE_PATH}")
+    return ResultStore(
+        path=settings.RESULT_STORE_PATH,
+        model_versions=model_versions,
+        max_mb=settings.RESULT_STORE_MAX_MB,
+    )
@@ -0,0 +1,207 @@
+"""
+Cache de predicciones en memoria compartida entre procesos.
+Todos los workers de uvicorn del mismo pod mapean el MISMO bloque de memoria
+(multiprocessing.shared_memory), asi un texto analizado por cualquier worker
+es un hit para todos, sin pasar por disco.
+"""
+
+import hashlib
+import math
+import struct
+import time
+import zlib
+from functools import lru_cache
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.core import get_logger
+from app.schemas import SentimentLabel
+
+logger = get_logger(__name__)
+
+# ---- Formato binario ----
+# Header: magic (4 bytes) + cantidad de slots (u32), con padding hasta 64 bytes
+_MAGIC = b"SNTC"
+_HEADER = struct.Struct("<4sI")
+_HEADER_SIZE = 64
+
+# Cada registro ocupa 32 bytes fijos:
+#   Q  = hash del texto (u64, 0 = slot vacio)
+#   I  = tag de version del modelo (crc32 del nombre)
+#   B  = codigo del label ganador
+#   3x = padding
+#   3f = scores float32 por label (NaN = el modelo no tiene ese label)
+#   I  = checksum (crc32 de todo lo anterior)
+_RECORD = struct.Struct("<QIB3x3fI")
+_PAYLOAD_SIZE = _RECORD.size - 4
+
+# Codigo numerico de cada label (la posicion en esta tupla)
+_LABELS = (SentimentLabel.NEGATIVE, SentimentLabel.POSITIVE, SentimentLabel.NEUTRAL)
+_LABEL_CODES = {label: code for code, label in enumerate(_LABELS)}
+
+# Cuantos slots consecutivos se revisan antes de rendirse (open addressing con sondeo lineal)
+_MAX_PROBE = 8
+
+
+@lru_cache(maxsize=64)
+def _version_tag(model_version: str) -> int:
+    """Tag de 32 bits que identifica al modelo dentro de cada registro."""
+    return zlib.crc32(model_version.encode("utf-8"))
+
+
+def _key(text: str, model_version: str) -> int:
+    """
+    Hash de 64 bits del texto + modelo. Nunca devuelve 0 (0 marca un slot vacio).
+    Incluir el modelo hace que el mismo texto de dos modelos distintos caiga en slots distintos.
+    """
+    digest = hashlib.blake2b(
+        text.encode("utf-8"), digest_size=8, key=model_version.encode("utf-8")[:64]
+    ).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedResultCache:
+    """
+    Tabla hash de tamaño fijo con direccionamiento abierto, en memoria compartida.
+
+    Acceso sin locks: cada registro lleva un checksum. Un escritor copia el registro entero
+    de una vez; si un lector justo lo ve a medio escribir (o dos escritores chocan en el mismo
+    slot), el checksum no coincide y el registro se trata como un miss. Como es un cache,
+    perder una entrada de vez en cuando no importa.
+    """
+
+    def __init__(self, name: str, slots: int):
+        self._shm = self._open(name, slots)
+        self._buf = self._shm.buf
+        self.slots = _HEADER.unpack_from(self._buf, 0)[1]
+
+    # ---- Apertura del bloque compartido ----
+
+    @staticmethod
+    def _open(name: str, slots: int) -> shared_memory.SharedMemory:
+        """Crea el bloque compartido, o se conecta al que ya creo otro worker."""
+        size = _HEADER_SIZE + slots * _RECORD.size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _HEADER.pack_into(shm.buf, 0, _MAGIC, slots)
+            logger.info(f"Shared cache creado: {name} ({slots} slots, {size // 1024} KB)")
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name, create=False)
+            # El worker que lo creo puede estar escribiendo el header justo ahora
+            for _ in range(100):
+                if bytes(shm.buf[:4]) == _MAGIC:
+                    break
+                time.sleep(0.01)
+            else:
+                raise RuntimeError(f"El bloque compartido {name} no tiene un header valido")
+            logger.info(f"Conectado al shared cache existente: {name}")
+
+        # Python registra el bloque en su resource_tracker y lo BORRA cuando el proceso termina.
+        # Como lo comparten varios workers, el que muere primero se lo borraria a los demas.
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        return shm
+
+    # ---- Lectura / escritura ----
+
+    def get(self, text: str, model_version: str) -> Optional[dict]:
+        """Busca la prediccion de un texto. Devuelve None si no esta."""
+        key = _key(text, model_version)
+        version_tag = _version_tag(model_version)
+        home = key % self.slots
+
+        for i in range(_MAX_PROBE):
+            offset = _HEADER_SIZE + ((home + i) % self.slots) * _RECORD.size
+            record = _RECORD.unpack_from(self._buf, offset)
+            if record[0] == 0:
+                return None  # slot vacio: el texto no esta
+            if record[0] == key and record[1] == version_tag and self._valid(offset, record):
+                return self._decode(record)
+
+        return None
+
+    def get_many(self, texts: List[str], model_version: str) -> Dict[str, dict]:
+        """Busca varias predicciones. Devuelve {texto: prediccion} de los encontrados."""
+        found = {}
+        for text in texts:
+            prediction = self.get(text, model_version)
+            if prediction is not None:
+                found[text] = prediction
+        return found
+
+    def put(self, text: str, prediction: dict, model_version: str) -> None:
+        """Guarda una prediccion. Si no hay lugar en la zona de sondeo, pisa el slot "home"."""
+        key = _key(text, model_version)
+        version_tag = _version_tag(model_version)
+        home = key % self.slots
+        target = home
+
+        for i in range(_MAX_PROBE):
+            slot = (home + i) % self.slots
+            offset = _HEADER_SIZE + slot * _RECORD.size
+            record = _RECORD.unpack_from(self._buf, offset)
+            # Sirve un slot vacio o el mismo texto (se actualiza en el lugar)
+            if record[0] == 0 or (record[0] == key and record[1] == version_tag):
+                target = slot
+                break
+
+        scores = [math.nan] * len(_LABELS)
+        for s in prediction["scores"]:
+            scores[_LABEL_CODES[s["label"]]] = s["score"]
+
+        payload = struct.pack(
+            "<QIB3x3f", key, version_tag, _LABEL_CODES[prediction["sentiment"]], *scores
+        )
+        record_bytes = payload + struct.pack("<I", zlib.crc32(payload))
+
+        offset = _HEADER_SIZE + target * _RECORD.size
+        self._buf[offset : offset + _RECORD.size] = record_bytes  # una sola copia
+
+    def put_many(self, predictions: Dict[str, dict], model_version: str) -> None:
+        """Guarda varias predicciones."""
+        for text, prediction in predictions.items():
+            self.put(text, prediction, model_version)
+
+    def close(self) -> None:
+        """Desmapea el bloque de este proceso (no lo borra: lo siguen usando los demas)."""
+        self._buf = None
+        self._shm.close()
+
+    # ---- Helpers ----
+
+    def _valid(self, offset: int, record: tuple) -> bool:
+        """Verifica el checksum: detecta registros a medio escribir."""
+        return zlib.crc32(self._buf[offset : offset + _PAYLOAD_SIZE]) == record[-1]
+
+    @staticmethod
+    def _decode(record: tuple) -> dict:
+        """Registro binario → prediccion con el formato de SentimentModel.predict()."""
+        label = _LABELS[record[2]]
+        raw_scores = record[3:6]
+
+        scores = [
+            {"label": _LABELS[code], "score": float(score)}
+            for code, score in enumerate(raw_scores)
+            if not math.isnan(score)
+        ]
+        scores.sort(key=lambda s: s["score"], reverse=True)  # mismo orden que el modelo
+
+        return {
+            "sentiment": label,
+            "confidence": float(raw_scores[record[2]]),
+            "scores": scores,
+            "processing_time_ms": 0.0,  # no hubo inferencia
+        }
+
+
+def create_shared_cache() -> Optional[SharedResultCache]:
+    """Crea/conecta el cache compartido segun la configuracion. Si SHARED_CACHE_SLOTS es 0, devuelve None."""
+    if settings.SHARED_CACHE_SLOTS <= 0:
+        return None
+
+    try:
+        return SharedResultCache(name=settings.SHARED_CACHE_NAME, slots=settings.SHARED_CACHE_SLOTS)
+    except (OSError, RuntimeError) as e:
+        # Sin shared memory (ej: /dev/shm muy chico en Docker) la app sigue andando sin este cache
+        logger.warning(f"No se pudo abrir el shared cache, se desactiva: {e}")
+        return None
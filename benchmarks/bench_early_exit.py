@@ -0,0 +1,127 @@
+"""
+Benchmark: early exit, latencia vs. coincidencia con el modelo completo.
+
+Calibra los clasificadores de las capas intermedias con la mitad del corpus (o usa los ya
+guardados con --saved) y, sobre la otra mitad, corre el modelo completo y el early exit con
+varios umbrales: ms por texto, cuantas predicciones coinciden con el modelo completo, capas
+promedio y en que capa sale cada texto. Sin --corpus usa reseñas sinteticas.
+
+Uso:
+    python -m benchmarks.bench_early_exit [--corpus reviews.jsonl] [--thresholds 0.9,0.95,0.99]
+"""
+
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+
+from app.cli import _read_corpus
+from app.core import stop_logging
+from app.ml import early_exit
+from app.ml.model import sentiment_model
+
+_OPENINGS = ["I", "We", "My wife", "The kids", "Honestly, I"]
+_VERDICTS = [
+    "loved this product",
+    "hated the service",
+    "think the movie was fine",
+    "found it absolutely terrible",
+    "would buy it again",
+    "returned it after a week",
+    "was not impressed by the quality",
+    "had an amazing experience",
+]
+_DETAILS = [
+    "",
+    " and the delivery was fast",
+    " but the packaging was damaged",
+    " because it stopped working after two days",
+    ", the staff was friendly and the price was fair for what you get",
+]
+
+
+def _synthetic_corpus(size: int) -> list:
+    rng = random.Random(0)
+    return [
+        f"{rng.choice(_OPENINGS)} {rng.choice(_VERDICTS)}{rng.choice(_DETAILS)}."
+        for _ in range(size)
+    ]
+
+
+def _run(forward, texts: list, batch_size: int):
+    """Corre todos los textos en batches. Devuelve (ms por texto, logits, capas de salida)."""
+    tokenizer = sentiment_model.pipeline.tokenizer
+    logits, exits, elapsed = [], [], 0.0
+    for start in range(0, len(texts), batch_size):
+        encoded = tokenizer(
+            texts[start : start + batch_size], padding=True, truncation=True, return_tensors="pt"
+        )
+        t0 = time.perf_counter()
+        batch_logits, batch_exits = forward(encoded)
+        elapsed += time.perf_counter() - t0
+        logits.append(batch_logits)
+        exits.append(batch_exits)
+    return elapsed * 1000 / len(texts), np.concatenate(logits), np.concatenate(exits)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="Textos propios (.jsonl, .csv o texto plano)")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--texts", type=int, default=2000, help="Textos a usar del corpus")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--thresholds", default="0.8,0.9,0.95,0.99")
+    parser.add_argument(
+        "--saved", action="store_true", help="Usar los clasificadores guardados (no calibrar)"
+    )
+    args = parser.parse_args()
+
+    stop_logging()
+    logging.disable(logging.WARNING)
+
+    sentiment_model.load()
+    model = sentiment_model.pipeline.model
+    if args.corpus:
+        texts = _read_corpus(args.corpus, args.text_field, args.texts)
+    else:
+        texts = _synthetic_corpus(args.texts)
+
+    if args.saved:
+        heads = early_exit.load_heads(early_exit.heads_path(sentiment_model.model_name), model)
+        if heads is None:
+            raise SystemExit("No hay clasificadores guardados: python -m app.cli early-exit ...")
+        evaluation = texts
+    else:
+        half = len(texts) // 2
+        heads, _ = early_exit.calibrate_heads(sentiment_model.pipeline, texts[:half])
+        evaluation = texts[half:]
+
+    def full_forward(encoded):
+        full = sentiment_model._loaded.forward(encoded)  # type: ignore[union-attr]
+        return full, np.full(len(full), len(model.distilbert.transformer.layer))
+
+    _run(full_forward, evaluation[: args.batch_size], args.batch_size)  # warm-up
+    full_ms, full_logits, _ = _run(full_forward, evaluation, args.batch_size)
+    full_labels = full_logits.argmax(axis=1)
+
+    print(
+        f"{len(evaluation)} textos, batches de {args.batch_size}, "
+        f"clasificadores en las capas {heads.layers}"
+    )
+    print(f"  {'umbral':<8} {'ms/texto':>9} {'speedup':>8} {'coincide':>9} {'capas':>6}  salidas")
+    print(f"  {'completo':<8} {full_ms:9.3f} {1.0:7.2f}x {1.0:9.4f} {'':>6}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        runner = early_exit.EarlyExitRunner(model, heads, threshold)
+        ms, logits, exits = _run(runner.forward, evaluation, args.batch_size)
+        agreement = float((logits.argmax(axis=1) == full_labels).mean())
+        histogram = {int(layer): int(n) for layer, n in zip(*np.unique(exits, return_counts=True))}
+        print(
+            f"  {threshold:<8g} {ms:9.3f} {full_ms / ms:7.2f}x {agreement:9.4f} "
+            f"{exits.mean():6.2f}  {histogram}"
+        )
+
+
+if __name__ == "__main__":
+    main()
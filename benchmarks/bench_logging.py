@@ -0,0 +1,141 @@
+"""
+Benchmark: cuanto le cuesta el logging a cada request.
+
+Corre N requests a /api/v1/sentiment/analyze con un modelo que no hace nada (asi solo se mide
+el overhead de la API) en tres modos:
+  - disabled: logging apagado
+  - sync:     StreamHandler directo (escribe en el hilo del request, como antes)
+  - queued:   setup_logging() (cola en memoria + hilo de fondo)
+Los logs van a un "colector lento" que tarda SINK_DELAY_MS por linea.
+
+Uso:
+    python -m benchmarks.bench_logging [--requests 2000] [--sink-delay-ms 0.2]
+"""
+
+import argparse
+import io
+import logging
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_sentiment_pipeline
+from app.core import setup_logging, stop_logging
+from app.core.logging import TEXT_FORMAT
+from app.main import app
+from app.ml import SentimentPipeline
+from app.schemas import SentimentLabel
+
+
+class _NoOpModel:
+    """Modelo falso: devuelve siempre la misma prediccion sin correr nada."""
+
+    model_name = "noop"
+    version = "noop"
+    is_loaded = True
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def predict(self, text: str) -> dict:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        return self.postprocess(self.encode(texts))
+
+    # Etapas de StagedInference (el micro-batching corre por ahi)
+    def encode(self, texts):
+        return SimpleNamespace(texts=texts, release=lambda: None)
+
+    def forward(self, batch) -> None:
+        pass
+
+    def postprocess(self, batch):
+        return [
+            {
+                "sentiment": SentimentLabel.POSITIVE,
+                "confidence": 0.9,
+                "scores": [
+                    {"label": SentimentLabel.POSITIVE, "score": 0.9},
+                    {"label": SentimentLabel.NEGATIVE, "score": 0.1},
+                ],
+                "processing_time_ms": 0.0,
+                "model_version": self.version,
+            }
+            for _ in batch.texts
+        ]
+
+
+class _SlowSink(io.TextIOBase):
+    """Stream que simula un colector de logs lento."""
+
+    def __init__(self, delay_ms: float):
+        self.delay = delay_ms / 1000
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        self.lines += 1
+        return len(text)
+
+
+def _configure(mode: str, sink: _SlowSink) -> None:
+    root = logging.getLogger()
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.disable(logging.NOTSET)
+
+    if mode == "disabled":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        setup_logging(stream=sink)
+
+
+def _run(client: TestClient, requests: int) -> float:
+    """Devuelve la latencia promedio por request, en ms."""
+    payload = {"text": "I love this product!"}
+    for _ in range(50):  # warm-up
+        client.post("/api/v1/sentiment/analyze", json=payload)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post("/api/v1/sentiment/analyze", json=payload)
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    pipeline = SentimentPipeline(model=_NoOpModel())
+    app.dependency_overrides[get_sentiment_pipeline] = lambda: pipeline
+    client = TestClient(app)
+    # Los logs del cliente de test (httpx) no son parte de la API: no se miden
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = {}
+    for mode in ("disabled", "sync", "queued"):
+        sink = _SlowSink(args.sink_delay_ms)
+        _configure(mode, sink)
+        results[mode] = _run(client, args.requests)
+
+    stop_logging()
+    logging.disable(logging.NOTSET)
+
+    print(f"{args.requests} requests, colector con {args.sink_delay_ms} ms por linea")
+    for mode, latency in results.items():
+        overhead = latency - results["disabled"]
+        print(f"  {mode:<9} {latency:7.3f} ms/request  (+{overhead:.3f} ms por logging)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: overhead del framework por request en /analyze.
+
+Corre N requests secuenciales a POST /api/v1/sentiment/analyze con un modelo que no hace nada,
+hablando ASGI directo (httpx.ASGITransport, sin sockets ni TestClient), asi lo que se mide es
+lo que agregan FastAPI, pydantic, los middlewares, el logging y la cola de micro-batching.
+Como piso se mide una app ASGI minima que devuelve un JSON fijo.
+
+Uso:
+    python -m benchmarks.bench_overhead [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+
+from app.api import dependencies
+from app.core import stop_logging
+from app.main import app
+from app.ml import InferenceBatcher, ModelRegistry, SentimentPipeline
+from benchmarks.bench_logging import _NoOpModel
+
+_PATH = "/api/v1/sentiment/analyze"
+_PAYLOAD = {"text": "I love this product!"}
+
+
+async def _floor_app(scope, receive, send):
+    """App ASGI minima: lee el body y devuelve un JSON fijo (el piso de cualquier framework)."""
+    if scope["type"] != "http":
+        return
+    more = True
+    while more:
+        message = await receive()
+        more = message.get("more_body", False)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b'{"sentiment":"positive"}'})
+
+
+async def _measure(asgi_app, requests: int) -> list:
+    """Latencia de cada request, en microsegundos."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):  # warm-up
+            await client.post(_PATH, json=_PAYLOAD)
+
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.post(_PATH, json=_PAYLOAD)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200, response.text
+        return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Logs como en produccion (a la cola), pero sin escribir nada: no es lo que se mide aca
+    stop_logging()
+    logging.disable(logging.WARNING)
+
+    model = _NoOpModel()
+    registry = ModelRegistry(default_model=model)  # type: ignore[arg-type]
+    # Sin espera de micro-batching: con requests secuenciales solo agregaria latencia fija
+    batcher = InferenceBatcher(registry=registry, max_wait_ms=0)
+    pipeline = SentimentPipeline(model=model, registry=registry, batcher=batcher)  # type: ignore
+    # Se reemplaza el pipeline global (no la dependencia): asi se mide la dependencia real
+    dependencies.sentiment_pipeline = pipeline
+
+    results = {}
+    for name, asgi_app in (("floor", _floor_app), ("api", app)):
+        latencies = asyncio.run(_measure(asgi_app, args.requests))
+        results[name] = (statistics.median(latencies), statistics.quantiles(latencies, n=100)[98])
+
+    print(f"{args.requests} requests secuenciales a {_PATH} (modelo no-op)")
+    for name, (p50, p99) in results.items():
+        print(f"  {name:<6} p50 {p50:8.1f} us   p99 {p99:8.1f} us")
+    print(f"  overhead del framework (p50): {results['api'][0] - results['floor'][0]:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
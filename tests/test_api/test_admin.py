@@ -0,0 +1,201 @@
+"""Tests para los endpoints de administracion /api/v1/admin."""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.ml import sentiment_model
+from app.services.memory import memory_guard
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    """Activa los endpoints de admin con un token de prueba."""
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", ADMIN_TOKEN)
+    return ADMIN_TOKEN
+
+
+class TestModelSwapEndpoint:
+    """Tests para /api/v1/admin/model/swap"""
+
+    def test_admin_disabled_without_token_configured(self, client: TestClient, monkeypatch):
+        """Sin ADMIN_TOKEN configurado los endpoints de admin responden 403."""
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+        response = client.get("/api/v1/admin/model/swap")
+        assert response.status_code == 403
+
+    def test_invalid_token_returns_401(self, client: TestClient, admin_token):
+        response = client.get("/api/v1/admin/model/swap", headers={"X-Admin-Token": "wrong"})
+        assert response.status_code == 401
+
+    def test_swap_keeps_serving_and_reports_version(self, client: TestClient, admin_token):
+        """Un swap se completa en segundo plano y la API sigue respondiendo durante el cambio."""
+        headers = {"X-Admin-Token": admin_token}
+        response = client.post(
+            "/api/v1/admin/model/swap",
+            json={"model_name": sentiment_model.model_name},
+            headers=headers,
+        )
+        assert response.status_code == 202
+
+        # Mientras carga el modelo nuevo, los requests se siguen atendiendo
+        analyze = client.post("/api/v1/sentiment/analyze", json={"text": "I love this!"})
+        assert analyze.status_code == 200
+
+        for _ in range(600):
+            status = client.get("/api/v1/admin/model/swap", headers=headers).json()
+            if status["state"] in {"done", "failed"}:
+                break
+            time.sleep(0.1)
+
+        assert status["state"] == "done"
+        assert status["current_version"] == sentiment_model.version
+
+        analyze = client.post("/api/v1/sentiment/analyze", json={"text": "I love this!"})
+        assert analyze.json()["model_version"] == sentiment_model.version
+
+
+class TestProfileEndpoint:
+    """Tests para /api/v1/admin/profile"""
+
+    @pytest.mark.parametrize("mode", ["sampling", "deterministic"])
+    def test_profiles_next_requests(self, client: TestClient, admin_token, mode):
+        """Perfila N requests y reporta el tiempo por componente."""
+        headers = {"X-Admin-Token": admin_token}
+        response = client.post(
+            "/api/v1/admin/profile",
+            json={"mode": mode, "requests": 3, "interval_ms": 1},
+            headers=headers,
+        )
+        assert response.status_code == 202
+
+        for i in range(3):
+            client.post("/api/v1/sentiment/analyze", json={"text": f"I love this {i}!"})
+
+        status = client.get("/api/v1/admin/profile", headers=headers).json()
+        assert status["state"] == "done"
+        assert status["requests_profiled"] == 3
+        assert set(status["components"]) == {
+            "preprocessor",
+            "tokenizer",
+            "forward",
+            "response",
+            "other",
+        }
+
+    def test_deterministic_sees_the_stage_threads(self, client: TestClient, admin_token):
+        """Tokenizer y forward corren en los hilos de las etapas: tienen que aparecer igual."""
+        headers = {"X-Admin-Token": admin_token}
+        client.post(
+            "/api/v1/admin/profile", json={"mode": "deterministic", "requests": 2}, headers=headers
+        )
+        for i in range(2):
+            client.post("/api/v1/sentiment/analyze", json={"text": f"Stage threads {i}"})
+
+        status = client.get("/api/v1/admin/profile", headers=headers).json()
+        assert status["components"]["tokenizer"] > 0
+        assert status["components"]["forward"] > 0
+
+    def test_requires_requests_or_duration(self, client: TestClient, admin_token):
+        response = client.post(
+            "/api/v1/admin/profile", json={}, headers={"X-Admin-Token": admin_token}
+        )
+        assert response.status_code == 422
+
+
+class TestMemoryEndpoint:
+    """Tests para /api/v1/admin/memory"""
+
+    def test_memory_status(self, client: TestClient, admin_token):
+        client.post("/api/v1/sentiment/analyze", json={"text": "I love this!"})
+        response = client.get("/api/v1/admin/memory", headers={"X-Admin-Token": admin_token})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pressure"] == "ok"
+        assert isinstance(data["top_requests"], list)
+
+    def test_request_tracking_is_off_without_a_budget(self):
+        """Sin MEMORY_BUDGET_MB ni MEMORY_TRACK_REQUESTS no se lee /proc en cada request."""
+        from app.main import app
+        from app.services.memory import MemoryMiddleware
+
+        assert settings.MEMORY_BUDGET_MB == 0 and not settings.MEMORY_TRACK_REQUESTS
+        assert all(m.cls is not MemoryMiddleware for m in app.user_middleware)
+
+    def test_tracemalloc_snapshot(self, client: TestClient, admin_token):
+        response = client.get(
+            "/api/v1/admin/memory/tracemalloc",
+            params={"top": 5, "duration_s": 0.1},
+            headers={"X-Admin-Token": admin_token},
+        )
+        assert response.status_code == 200
+        assert len(response.json()) <= 5
+
+    def test_batch_requests_are_shed_under_critical_pressure(self, client: TestClient, monkeypatch):
+        monkeypatch.setattr(memory_guard, "pressure", "critical")
+        response = client.post("/api/v1/sentiment/analyze/batch", json={"texts": ["I love it"]})
+
+        assert response.status_code == 503
+        assert response.json()["detail"]["error"] == "MEMORY_PRESSURE"
+
+
+class TestSchedulerEndpoint:
+    """Tests para /api/v1/admin/scheduler"""
+
+    def test_reports_per_client_metrics(self, client: TestClient, admin_token):
+        # Texto unico (el cache de resultados no tiene que evitar la cola)
+        text = f"I love this scheduler {time.time()}"
+        client.post(
+            "/api/v1/sentiment/analyze", json={"text": text}, headers={"X-Client-ID": "frontend"}
+        )
+        response = client.get("/api/v1/admin/scheduler", headers={"X-Admin-Token": admin_token})
+
+        assert response.status_code == 200
+        stats = response.json()["clients"]["frontend"]
+        assert stats["served_texts"] >= 1
+        assert stats["served_tokens"] > 0
+        assert stats["queue_wait"]["samples"] >= 1
+
+
+class TestStagesEndpoint:
+    """Tests para /api/v1/admin/stages"""
+
+    def test_reports_stage_utilization(self, client: TestClient, admin_token):
+        client.post(
+            "/api/v1/sentiment/analyze/batch",
+            json={"texts": [f"Stage test number {i} at {time.time()}" for i in range(5)]},
+        )
+        response = client.get("/api/v1/admin/stages", headers={"X-Admin-Token": admin_token})
+
+        assert response.status_code == 200
+        stages = response.json()["microbatch"]
+        assert set(stages) == {"tokenize", "forward", "postprocess"}
+        assert stages["forward"]["texts"] >= 5
+        assert 0.0 <= stages["forward"]["utilization"] <= 1.0
+
+
+class TestAutotunerEndpoint:
+    """Tests para /api/v1/admin/autotuner"""
+
+    def test_reports_fixed_values_when_disabled(self, client: TestClient, admin_token):
+        response = client.get("/api/v1/admin/autotuner", headers={"X-Admin-Token": admin_token})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["enabled"] is False
+        assert body["max_batch_size"] == settings.BATCH_MAX_SIZE
+
+
+class TestMemoryGcStats:
+    """Tests para las pausas del GC en /api/v1/admin/memory"""
+
+    def test_memory_includes_gc_generations(self, client: TestClient, admin_token):
+        response = client.get("/api/v1/admin/memory", headers={"X-Admin-Token": admin_token})
+
+        assert response.status_code == 200
+        assert set(response.json()["gc"]["generations"]) == {"0", "1", "2"}
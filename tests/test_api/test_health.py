@@ -1,7 +1,13 @@
 """Tests para endpoints de health check."""
 
+import json
+
+import pytest
 from fastapi.testclient import TestClient
 
+from app.config import settings
+from app.ml import canary_monitor, head_pruning
+
 
 class TestHealthEndpoints:
     """Tests para los 3 endpoints de health: /health, /health/detailed, /ready."""
@@ -28,6 +34,38 @@ class TestHealthEndpoints:
         assert "components" in data
         assert len(data["components"]) > 0  # al menos el componente ml_model
 
+    def test_detailed_health_reports_canary_and_traffic_latency(self, client: TestClient):
+        """El canary corre en segundo plano; /health/detailed solo lee los percentiles."""
+        client.post("/api/v1/sentiment/analyze", json={"text": "I love this!"})
+        canary_monitor.tick()  # una corrida del canary (lo que hace el hilo de fondo)
+
+        data = client.get("/api/v1/health/detailed").json()
+        latency = next(c for c in data["components"] if c["name"] == "inference_latency")
+
+        assert latency["status"] == "healthy"
+        assert latency["details"]["canary"]["samples"] >= 1
+        assert latency["details"]["canary"]["p99_ms"] > 0
+        assert latency["details"]["traffic"]["samples"] >= 1
+
+    def test_detailed_health_lists_pruned_models(self, client: TestClient, tmp_path, monkeypatch):
+        """Los modelos podados de MODEL_CACHE_DIR aparecen con su speedup medido."""
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        model_dir = tmp_path / "pruned" / "modelo-h40"
+        model_dir.mkdir(parents=True)
+        (model_dir / head_pruning.REPORT_FILE).write_text(
+            json.dumps({"source_model": "modelo", "heads_kept": 40, "speedup": 1.3})
+        )
+        monkeypatch.setattr(head_pruning, "_pruned_models", [])
+        head_pruning.refresh_pruned_models()  # lo hace el arranque de la app
+
+        # El health check no vuelve a leer el disco
+        monkeypatch.setattr(head_pruning, "_scan_pruned_models", lambda: pytest.fail("I/O"))
+        data = client.get("/api/v1/health/detailed").json()
+        pruned = next(c for c in data["components"] if c["name"] == "pruned_models")
+
+        assert pruned["details"]["models"][0]["speedup"] == 1.3
+        assert pruned["details"]["models"][0]["serving"] is False
+
     def test_readiness_check_returns_200_when_model_loaded(self, client: TestClient):
         """GET /api/v1/ready debe retornar 200 cuando el modelo esta cargado."""
         response = client.get("/api/v1/ready")
@@ -0,0 +1,151 @@
+"""Tests para el modo router (hash consistente entre varias instancias de la API)."""
+
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.router_app import BackendPool, HashRing, create_router_app, routing_key
+
+BACKENDS = ["http://api-1:8000", "http://api-2:8000", "http://api-3:8000"]
+
+
+class FakeBackends:
+    """Simula las instancias de la API detras de un httpx.MockTransport."""
+
+    def __init__(self):
+        self.down = set()  # hosts que no aceptan conexiones
+        self.requests = []  # (host, path, body, headers)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.method == "GET":
+            return httpx.Response(200, json={"status": "ready"})
+
+        body = json.loads(request.content)
+        self.requests.append((host, request.url.path, body, request.headers))
+        if body.get("model") == "unknown":
+            return httpx.Response(400, json={"detail": {"error": "UNKNOWN_MODEL"}})
+        if request.url.path.endswith("/batch"):
+            return httpx.Response(
+                200, json={"results": [{"text": t, "backend": host} for t in body["texts"]]}
+            )
+        return httpx.Response(200, json={"text": body["text"], "backend": host})
+
+
+@pytest.fixture
+def backends():
+    return FakeBackends()
+
+
+@pytest.fixture
+def pool(backends):
+    return BackendPool(BACKENDS, transport=httpx.MockTransport(backends.handler))
+
+
+@pytest.fixture
+def router(pool):
+    return TestClient(create_router_app(pool))
+
+
+class TestHashRing:
+    """Tests para el anillo de hash consistente."""
+
+    def test_walk_visits_every_node_once(self):
+        ring = HashRing(BACKENDS, virtual_nodes=64)
+        assert sorted(ring.walk("some text")) == sorted(BACKENDS)
+
+    def test_adding_a_node_moves_few_keys(self):
+        keys = [f"review number {i}" for i in range(2000)]
+        before = HashRing(BACKENDS, virtual_nodes=128)
+        after = HashRing(BACKENDS + ["http://api-4:8000"], virtual_nodes=128)
+
+        moved = sum(next(before.walk(k)) != next(after.walk(k)) for k in keys)
+        # Lo ideal es 1/4 (lo que le toca al nodo nuevo); con round-robin se moveria casi todo
+        assert moved / len(keys) < 0.35
+
+    def test_routing_key_ignores_whitespace(self):
+        assert routing_key("  I love   it\n") == routing_key("I love it")
+
+
+class TestRouterAnalyze:
+    """Tests para POST /analyze a traves del router."""
+
+    def test_same_text_always_goes_to_the_same_backend(self, router, backends):
+        for _ in range(3):
+            response = router.post("/api/v1/sentiment/analyze", json={"text": "Great product"})
+            assert response.status_code == 200
+
+        assert len({host for host, *_ in backends.requests}) == 1
+
+    def test_forwards_client_id(self, router, backends):
+        router.post(
+            "/api/v1/sentiment/analyze",
+            json={"text": "Great product"},
+            headers={"X-Client-ID": "frontend"},
+        )
+        assert backends.requests[0][3]["X-Client-ID"] == "frontend"
+
+    def test_reroutes_around_a_dead_backend(self, router, pool, backends):
+        owner = next(pool.ring.walk(routing_key("Great product")))
+        backends.down.add(httpx.URL(owner).host)
+
+        response = router.post("/api/v1/sentiment/analyze", json={"text": "Great product"})
+
+        assert response.status_code == 200
+        assert response.json()["backend"] != httpx.URL(owner).host
+        assert {b["backend"]: b["healthy"] for b in pool.status()}[owner] is False
+
+    def test_all_backends_down(self, router, backends):
+        backends.down.update(httpx.URL(b).host for b in BACKENDS)
+        response = router.post("/api/v1/sentiment/analyze", json={"text": "Great product"})
+
+        assert response.status_code == 503
+        assert response.json()["detail"]["error"] == "NO_BACKEND_AVAILABLE"
+
+    def test_backend_client_errors_pass_through(self, router):
+        response = router.post(
+            "/api/v1/sentiment/analyze", json={"text": "Great product", "model": "unknown"}
+        )
+        assert response.status_code == 400
+
+
+class TestRouterBatch:
+    """Tests para POST /analyze/batch a traves del router."""
+
+    def test_batch_is_split_by_hash_and_reassembled_in_order(self, router, backends):
+        texts = [f"Review {i}: it was fine" for i in range(30)]
+        response = router.post("/api/v1/sentiment/analyze/batch", json={"texts": texts})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["text"] for r in body["results"]] == texts
+        assert body["texts_analyzed"] == 30
+        # Un sub-batch por backend, en paralelo
+        assert len(backends.requests) == len({host for host, *_ in backends.requests}) > 1
+
+    def test_batch_texts_of_a_dead_backend_go_to_the_others(self, router, backends):
+        backends.down.add("api-2")
+        texts = [f"Review {i}: it was fine" for i in range(30)]
+
+        response = router.post("/api/v1/sentiment/analyze/batch", json={"texts": texts})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["text"] for r in results] == texts
+        assert "api-2" not in {r["backend"] for r in results}
+
+
+async def test_health_check_brings_a_backend_back(pool, backends):
+    backends.down.add("api-1")
+    pool.mark_down("http://api-1:8000", "test")
+    await pool.check_health()
+    assert pool.status()[0]["healthy"] is False
+
+    backends.down.clear()
+    await pool.check_health()
+    assert pool.status()[0]["healthy"] is True
+    await pool.close()
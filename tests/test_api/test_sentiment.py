@@ -5,6 +5,8 @@ Prueba que /analyze y /analyze/batch respondan correctamente para distintos caso
 
 from fastapi.testclient import TestClient
 
+from app.schemas import SentimentResponse
+
 
 # ============================================================
 # Tests para POST /api/v1/sentiment/analyze (un solo texto)
@@ -54,6 +56,15 @@ class TestSentimentAnalyzeEndpoint:
         for field in required_fields:
             assert field in data, f"Missing field: {field}"
 
+    def test_analyze_response_matches_schema(self, client: TestClient):
+        """La respuesta se serializa sin response_model: igual tiene que cumplir el schema."""
+        response = client.post("/api/v1/sentiment/analyze", json={"text": "Great value."})
+
+        assert response.headers["content-type"] == "application/json"
+        parsed = SentimentResponse.model_validate(response.json())
+        assert parsed.text == "Great value."
+        assert set(response.json()) == set(SentimentResponse.model_fields)
+
     def test_analyze_empty_text_returns_422(self, client: TestClient):
         """Texto vacio debe retornar 422: SentimentRequest tiene min_length=1."""
         response = client.post("/api/v1/sentiment/analyze", json={"text": ""})
@@ -127,3 +138,94 @@ class TestSentimentBatchAnalyzeEndpoint:
         data = response.json()
         assert "total_processing_time_ms" in data  # el campo existe en BatchSentimentResponse
         assert data["total_processing_time_ms"] > 0  # y el tiempo siempre es mayor a 0
+
+
+# ============================================================
+# Tests para los GET cacheables (ETag / If-None-Match)
+# ============================================================
+class TestCacheableGet:
+    """Tests para GET /analyze y GET /analyze/by-hash/{text_hash}."""
+
+    def test_get_returns_the_analysis_with_cache_headers(self, client: TestClient):
+        response = client.get("/api/v1/sentiment/analyze", params={"text": "I love this!"})
+
+        assert response.status_code == 200
+        assert response.json()["sentiment"] == "positive"
+        assert response.headers["etag"].startswith('"')  # fuerte: sin W/
+        assert "max-age" in response.headers["cache-control"]
+        assert len(response.headers["x-text-hash"]) == 64
+
+    def test_etag_depends_on_the_preprocessed_text(self, client: TestClient):
+        def etag(text):
+            return client.get("/api/v1/sentiment/analyze", params={"text": text}).headers["etag"]
+
+        assert etag("I love   this!") == etag("I love this!")
+        assert etag("I love this!") != etag("I hate this!")
+
+    def test_if_none_match_returns_304_without_inference(self, client: TestClient, monkeypatch):
+        from app.ml import sentiment_pipeline
+
+        first = client.get("/api/v1/sentiment/analyze", params={"text": "Great product"})
+
+        async def no_inference(*args, **kwargs):
+            raise AssertionError("no deberia correr el modelo")
+
+        monkeypatch.setattr(sentiment_pipeline, "analyze_async", no_inference)
+        response = client.get(
+            "/api/v1/sentiment/analyze",
+            params={"text": "Great product"},
+            headers={"If-None-Match": f'"otro", {first.headers["etag"]}'},
+        )
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == first.headers["etag"]
+
+    def test_get_validates_like_post(self, client: TestClient):
+        response = client.get("/api/v1/sentiment/analyze", params={"text": "   "})
+        assert response.status_code == 422
+
+    def test_by_hash_serves_stored_results(self, client: TestClient, tmp_path, monkeypatch):
+        from app.ml import sentiment_pipeline
+        from app.services.result_store import ResultStore
+
+        store = ResultStore(str(tmp_path / "results.sqlite3"), [], max_mb=10)
+        monkeypatch.setattr(sentiment_pipeline, "result_store", store)
+        first = client.get("/api/v1/sentiment/analyze", params={"text": "Loved the hash test!"})
+        text_hash = first.headers["x-text-hash"]
+        assert store.flush()  # el hilo escritor guarda despues de responder
+
+        response = client.get(f"/api/v1/sentiment/analyze/by-hash/{text_hash}")
+
+        assert response.status_code == 200
+        assert response.json()["sentiment"] == first.json()["sentiment"]
+        assert response.headers["etag"] == first.headers["etag"]
+
+        revalidated = client.get(
+            f"/api/v1/sentiment/analyze/by-hash/{text_hash}",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert revalidated.status_code == 304
+
+    def test_by_hash_unknown_text(self, client: TestClient):
+        response = client.get(f"/api/v1/sentiment/analyze/by-hash/{'0' * 64}")
+
+        assert response.status_code == 404
+        assert response.json()["detail"]["error"] == "RESULT_NOT_FOUND"
+
+    def test_by_hash_unknown_text_with_matching_etag(self, client: TestClient):
+        """Un If-None-Match que coincide no convierte un hash desconocido en 304."""
+        from app.api.v1.endpoints.sentiment import _etag
+        from app.ml import sentiment_model
+
+        text_hash = "0" * 64
+        etag = _etag(text_hash, sentiment_model.version)
+        response = client.get(
+            f"/api/v1/sentiment/analyze/by-hash/{text_hash}", headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == 404
+
+    def test_by_hash_rejects_malformed_hashes(self, client: TestClient):
+        response = client.get("/api/v1/sentiment/analyze/by-hash/not-a-hash")
+        assert response.status_code == 422
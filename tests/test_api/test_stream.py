@@ -0,0 +1,130 @@
+"""Tests para el WebSocket de streaming /api/v1/sentiment/stream."""
+
+from fastapi.testclient import TestClient
+
+from app.ml import sentiment_model
+
+
+class TestSentimentStreamEndpoint:
+    """Tests para WS /api/v1/sentiment/stream"""
+
+    def test_stream_returns_one_result_per_message(self, client: TestClient, sample_texts):
+        """Cada mensaje enviado debe recibir su resultado con el mismo id de correlacion."""
+        texts = sample_texts["positive"] + sample_texts["negative"]
+
+        with client.websocket_connect("/api/v1/sentiment/stream") as websocket:
+            for i, text in enumerate(texts):
+                websocket.send_json({"id": i, "text": text})
+
+            # Los resultados pueden llegar fuera de orden: se indexan por id
+            results = {}
+            for _ in texts:
+                data = websocket.receive_json()
+                results[data["id"]] = data
+
+        assert set(results) == set(range(len(texts)))
+        for data in results.values():
+            assert data["sentiment"] in {"positive", "negative", "neutral"}
+            assert 0.0 <= data["confidence"] <= 1.0
+            assert "model_version" in data
+
+    def test_stream_accepts_plain_text(self, client: TestClient):
+        """Un mensaje que no es JSON se analiza como texto plano (sin id)."""
+        with client.websocket_connect("/api/v1/sentiment/stream") as websocket:
+            websocket.send_text("I love this product!")
+            data = websocket.receive_json()
+
+        assert data["id"] is None
+        assert data["sentiment"] == "positive"
+
+    def test_stream_empty_text_returns_error(self, client: TestClient):
+        """Un texto vacio devuelve un mensaje de error sin cerrar la conexion."""
+        with client.websocket_connect("/api/v1/sentiment/stream") as websocket:
+            websocket.send_json({"id": "a", "text": "   "})
+            error = websocket.receive_json()
+
+            websocket.send_json({"id": "b", "text": "I love this!"})
+            data = websocket.receive_json()
+
+        assert error["id"] == "a"
+        assert error["error"] == "VALIDATION_ERROR"
+        assert data["id"] == "b"
+
+    def test_stream_unexpected_error_replies_for_that_id(self, client: TestClient, monkeypatch):
+        """Un error inesperado del modelo responde INTERNAL_ERROR y la conexion sigue andando."""
+        forward = sentiment_model.forward
+
+        def broken_forward(batch):
+            if any("boom" in text for text in batch.texts):
+                raise RuntimeError("fallo del modelo")
+            return forward(batch)
+
+        monkeypatch.setattr(sentiment_model, "forward", broken_forward)
+
+        with client.websocket_connect("/api/v1/sentiment/stream") as websocket:
+            websocket.send_json({"id": "x", "text": "boom goes the model"})
+            error = websocket.receive_json()
+
+            websocket.send_json({"id": "y", "text": "I love this!"})
+            data = websocket.receive_json()
+
+        assert error == {
+            "id": "x",
+            "error": "INTERNAL_ERROR",
+            "message": "Error interno del servidor",
+        }
+        assert data["id"] == "y" and "sentiment" in data
+
+    def test_stream_binary_frame_returns_error(self, client: TestClient):
+        """Un frame binario responde VALIDATION_ERROR sin cortar la conexion."""
+        with client.websocket_connect("/api/v1/sentiment/stream") as websocket:
+            websocket.send_bytes(b"\x00\x01")
+            error = websocket.receive_json()
+
+            websocket.send_json({"id": "b", "text": "I love this!"})
+            data = websocket.receive_json()
+
+        assert error["error"] == "VALIDATION_ERROR"
+        assert data["id"] == "b"
+
+    def test_stream_error_after_client_left_does_not_escape(self, monkeypatch):
+        """Si el cliente ya se fue cuando llega el error, la tarea termina sin excepcion."""
+        import asyncio
+
+        from app.api.v1.endpoints import sentiment as endpoint
+
+        class GoneWebSocket:
+            """Socket que entrega un texto y falla al responder (el cliente ya cerro)."""
+
+            def __init__(self):
+                self.messages = [{"type": "websocket.receive", "text": '{"id": "x", "text": "a"}'}]
+
+            async def accept(self):
+                pass
+
+            async def receive(self):
+                if self.messages:
+                    return self.messages.pop()
+                await asyncio.sleep(0.05)  # deja terminar la tarea antes de desconectar
+                return {"type": "websocket.disconnect", "code": 1000}
+
+            async def send_json(self, payload):
+                raise RuntimeError('Cannot call "send" once a close message has been sent.')
+
+        class FailingPipeline:
+            async def analyze_text_async(self, *args, **kwargs):
+                raise RuntimeError("fallo del modelo")
+
+        tasks = []
+        create_task = asyncio.create_task
+
+        def tracking_create_task(coro, **kwargs):
+            task = create_task(coro, **kwargs)
+            tasks.append(task)
+            return task
+
+        monkeypatch.setattr(endpoint.asyncio, "create_task", tracking_create_task)
+        asyncio.run(endpoint.stream_sentiment(GoneWebSocket(), FailingPipeline(), "cliente"))
+
+        assert len(tasks) == 1
+        assert tasks[0].done() and tasks[0].exception() is None
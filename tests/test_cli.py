@@ -0,0 +1,153 @@
+"""Tests para el CLI de scoring offline (python -m app.cli score)."""
+
+import json
+
+import pytest
+
+from app import cli
+
+
+def _read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestReadBlocks:
+    """Tests para la lectura por bloques."""
+
+    def test_csv_split_point_keeps_quoted_newlines_together(self):
+        buffer = b'1,"hola\nmundo"\n2,chau\n3,"sin cerrar\n'
+        split = cli._csv_split_point(buffer)
+        assert buffer[:split] == b'1,"hola\nmundo"\n2,chau\n'
+
+    @pytest.mark.parametrize("use_mmap", [True, False])
+    def test_blocks_cover_the_whole_file(self, tmp_path, use_mmap):
+        path = tmp_path / "in.jsonl"
+        lines = [json.dumps({"text": f"texto {i}"}) for i in range(50)]
+        path.write_text("\n".join(lines))  # sin salto de linea final
+
+        blocks = list(cli._read_blocks(str(path), 0, 64, csv_mode=False, use_mmap=use_mmap))
+
+        assert b"".join(block for block, _ in blocks).decode().splitlines() == lines
+        assert blocks[-1][1] == path.stat().st_size
+
+
+class TestScoreCommand:
+    """Tests para el comando score."""
+
+    def test_scores_jsonl_with_ids_and_invalid_lines(self, load_model, tmp_path):
+        source = tmp_path / "in.jsonl"
+        source.write_text(
+            '{"id": "a", "text": "I love this product!"}\n'
+            "esto no es json\n"
+            '{"id": "c", "text": "This is terrible."}\n'
+        )
+        output = tmp_path / "out.jsonl"
+
+        assert (
+            cli.main(["score", str(source), str(output), "--id-field", "id", "--workers", "1"]) == 0
+        )
+
+        rows = _read_jsonl(output)
+        assert [r["row"] for r in rows] == [0, 1, 2]
+        assert rows[0]["id"] == "a" and rows[0]["sentiment"] == "positive"
+        assert "error" in rows[1]
+        assert rows[2]["id"] == "c" and rows[2]["sentiment"] == "negative"
+        assert not (tmp_path / "out.jsonl.checkpoint.json").exists()
+
+    def test_scores_csv_with_multiline_fields(self, load_model, tmp_path):
+        source = tmp_path / "in.csv"
+        source.write_text('id,comment\n1,"I love it,\nreally great"\n2,Awful experience\n')
+        output = tmp_path / "out.csv"
+
+        cli.main(
+            [
+                "score",
+                str(source),
+                str(output),
+                "--text-field",
+                "comment",
+                "--id-field",
+                "id",
+                "--workers",
+                "1",
+            ]
+        )
+
+        lines = output.read_text().splitlines()
+        assert lines[0] == "row,id,sentiment,confidence,error"
+        assert lines[1].startswith("0,1,positive,")
+        assert lines[2].startswith("1,2,negative,")
+
+    @pytest.mark.parametrize(
+        "name, content", [("in.jsonl", ""), ("in.csv", "id,text\n"), ("empty.csv", "")]
+    )
+    def test_empty_input_finishes_without_checkpoint(self, load_model, tmp_path, name, content):
+        source = tmp_path / name
+        source.write_text(content)
+        output = tmp_path / f"out{source.suffix}"
+
+        assert cli.main(["score", str(source), str(output), "--workers", "1"]) == 0
+
+        assert output.exists()
+        assert not (tmp_path / f"{output.name}.checkpoint.json").exists()
+
+    def test_resume_after_failure_continues_from_checkpoint(
+        self, load_model, tmp_path, monkeypatch
+    ):
+        source = tmp_path / "in.jsonl"
+        source.write_text(
+            "".join(json.dumps({"text": f"I love item {i}"}) + "\n" for i in range(30))
+        )
+        output = tmp_path / "out.jsonl"
+        args = ["score", str(source), str(output), "--workers", "1", "--chunk-mb", "0.0002"]
+
+        # Falla en el tercer bloque: los dos primeros quedan escritos y en el checkpoint
+        real_score = cli._score
+        calls = {"n": 0}
+
+        def flaky_score(*a, **kw):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise RuntimeError("corte simulado")
+            return real_score(*a, **kw)
+
+        monkeypatch.setattr(cli, "_score", flaky_score)
+        with pytest.raises(RuntimeError):
+            cli.main(args)
+        checkpoint = json.loads((tmp_path / "out.jsonl.checkpoint.json").read_text())
+        assert 0 < checkpoint["rows"] < 30
+
+        monkeypatch.setattr(cli, "_score", real_score)
+        cli.main(args + ["--resume"])
+
+        rows = _read_jsonl(output)
+        assert [r["row"] for r in rows] == list(range(30))  # cada fila exactamente una vez
+
+
+class TestEarlyExitCommand:
+    """Tests para el comando early-exit (calibracion con textos propios)."""
+
+    def test_reads_corpus_formats(self, tmp_path):
+        plain = tmp_path / "corpus.txt"
+        plain.write_text("I love it\n\n  Awful   experience \n")
+        csv_file = tmp_path / "corpus.csv"
+        csv_file.write_text('id,comment\n1,"I love it"\n2,Awful\n3,Fine\n')
+
+        assert cli._read_corpus(str(plain), "text", None) == ["I love it", "Awful experience"]
+        assert cli._read_corpus(str(csv_file), "comment", 2) == ["I love it", "Awful"]
+
+    def test_saves_heads_for_the_model(self, load_model, tmp_path, monkeypatch):
+        from app.config import settings
+        from app.ml import early_exit
+
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        source = tmp_path / "corpus.txt"
+        source.write_text("".join(f"review {i}: {w}\n" for i in range(40) for w in ("good", "bad")))
+
+        assert cli.main(["early-exit", str(source), "--layers", "2,3"]) == 0
+
+        heads = early_exit.load_heads(
+            early_exit.heads_path(load_model.model_name), load_model.pipeline.model
+        )
+        assert heads is not None and heads.layers == [2, 3]
@@ -0,0 +1,82 @@
+"""Tests para la configuracion de logging (cola en memoria, JSON y sampling)."""
+
+import io
+import json
+import logging
+
+import pytest
+
+from app.config import settings
+from app.core import setup_logging, stop_logging
+from app.core.logging import JsonFormatter, SamplingFilter
+
+
+def _record(name: str, level: int, msg: str = "hola %s", args=("mundo",)) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+@pytest.fixture
+def restore_logging():
+    """Vuelve a dejar el logging como lo configura conftest despues de cada test."""
+    yield
+    setup_logging()
+
+
+class TestSamplingFilter:
+    """Tests para SamplingFilter."""
+
+    def test_drops_sampled_info_but_keeps_warnings(self):
+        sampling = SamplingFilter({"app.ml": 0.0})
+        assert not sampling.filter(_record("app.ml.pipeline", logging.INFO))
+        assert sampling.filter(_record("app.ml.pipeline", logging.WARNING))
+        assert sampling.filter(_record("app.api", logging.INFO))  # sin regla: pasa siempre
+
+    def test_most_specific_rule_wins(self):
+        sampling = SamplingFilter({"app": 0.0, "app.ml.pipeline": 1.0})
+        assert sampling.filter(_record("app.ml.pipeline", logging.INFO))
+        assert not sampling.filter(_record("app.ml.model", logging.INFO))
+
+
+class TestJsonFormatter:
+    """Tests para JsonFormatter."""
+
+    def test_outputs_one_json_object_per_record(self):
+        line = JsonFormatter().format(_record("app.test", logging.INFO))
+        data = json.loads(line)
+        assert data["message"] == "hola mundo"
+        assert data["level"] == "INFO"
+        assert data["logger"] == "app.test"
+
+
+class TestSetupLogging:
+    """Tests para setup_logging() con la cola en memoria."""
+
+    def test_records_are_written_by_background_listener(self, monkeypatch, restore_logging):
+        monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+        stream = io.StringIO()
+        setup_logging(stream=stream)
+
+        logging.getLogger("app.test").warning("valor=%d", 42)
+        stop_logging()  # vacia la cola
+
+        data = json.loads(stream.getvalue().strip())
+        assert data["message"] == "valor=42"
+
+    def test_message_is_not_formatted_in_calling_thread(self, restore_logging):
+        """El mensaje se arma en el hilo de fondo: el registro llega a la cola sin formatear."""
+
+        class Unformattable:
+            calls = 0
+
+            def __str__(self):
+                Unformattable.calls += 1
+                return "x"
+
+        stream = io.StringIO()
+        setup_logging(stream=stream)
+        listener_handler = logging.getLogger().handlers[-1]
+        record = _record("app.test", logging.INFO, "valor=%s", (Unformattable(),))
+        prepared = listener_handler.prepare(record)
+
+        assert prepared.args == record.args
+        assert Unformattable.calls == 0
@@ -0,0 +1,83 @@
+"""Tests para el autoajuste AIMD del micro-batching (BatchAutotuner)."""
+
+import asyncio
+
+from app.ml import InferenceBatcher
+from app.ml.autotuner import BatchAutotuner
+
+
+def _tuner(**kwargs) -> BatchAutotuner:
+    defaults = dict(
+        slo_p99_ms=100.0,
+        max_batch_size=16,
+        max_wait_ms=4.0,
+        interval_s=0,
+        batch_size_ceiling=64,
+        wait_ceiling_ms=10.0,
+    )
+    return BatchAutotuner(**{**defaults, **kwargs})
+
+
+def test_p99_over_slo_decreases_multiplicatively():
+    tuner = _tuner()
+    tuner.observe([50.0] * 30 + [250.0], capacity=16)
+
+    assert tuner.max_batch_size == 12
+    assert tuner.max_wait_ms == 2.0
+    assert tuner.stats()["decisions"]["decrease"] == 1
+
+
+def test_full_batches_with_headroom_grow_the_batch():
+    tuner = _tuner()
+    tuner.observe([20.0] * 32, capacity=32)  # batches llenos (32 textos en 2 × 16)
+
+    assert tuner.max_batch_size == 18
+    assert tuner.max_wait_ms == 4.0
+
+
+def test_partial_batches_with_headroom_wait_longer():
+    tuner = _tuner()
+    tuner.observe([20.0] * 32, capacity=160)  # batches al 20%
+
+    assert tuner.max_batch_size == 16
+    assert tuner.max_wait_ms == 4.5
+
+
+def test_no_decision_without_enough_samples_or_near_the_slo():
+    tuner = _tuner()
+    tuner.observe([500.0] * 5, capacity=16)  # pocas muestras: el intervalo sigue abierto
+    assert tuner.stats()["decisions"]["decrease"] == 0
+
+    tuner = _tuner()
+    tuner.observe([90.0] * 30, capacity=30)  # cerca del objetivo: se mantiene
+    assert (tuner.max_batch_size, tuner.max_wait_ms) == (16, 4.0)
+    assert tuner.stats()["recent"][-1]["action"] == "hold"
+
+
+def test_growth_stops_at_the_ceilings():
+    tuner = _tuner(max_batch_size=63, max_wait_ms=9.8)
+    for _ in range(3):
+        tuner.observe([10.0] * 64, capacity=64)
+    assert tuner.max_batch_size == 64
+
+    for _ in range(3):
+        tuner.observe([10.0] * 20, capacity=200)
+    assert tuner.max_wait_ms == 10.0
+
+
+def test_batcher_uses_and_feeds_the_autotuner(load_model):
+    tuner = _tuner(max_batch_size=4, max_wait_ms=1.0)
+    batcher = InferenceBatcher(autotuner=tuner)
+    texts = [f"Autotuner review {i}: {'great' if i % 2 else 'bad'}" for i in range(24)]
+
+    async def run():
+        results = await asyncio.gather(*(batcher.submit(t) for t in texts))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert len(results) == 24
+    # Cada batch respeto el tamaño del autotuner y le reporto la latencia de sus textos
+    assert batcher.stages.stats()["forward"]["batches"] >= 6
+    assert sum(tuner.stats()["decisions"].values()) >= 1
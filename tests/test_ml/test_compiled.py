@@ -0,0 +1,56 @@
+"""Tests para el modo de ejecucion compilado (TorchScript por bucket de largo)."""
+
+import os
+
+import pytest
+import torch
+
+from app.ml.compiled import CompiledClassifier
+
+
+def _eager_logits(hf_pipeline, texts):
+    """Logits del modelo original, sin padding extra (referencia)."""
+    encoded = hf_pipeline.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+    with torch.inference_mode():
+        return hf_pipeline.model(**encoded).logits
+
+
+@pytest.fixture(scope="module")
+def hf_pipeline(load_model):
+    """El Pipeline de HuggingFace del modelo ya cargado (referencia en modo eager)."""
+    return load_model._loaded.pipeline
+
+
+class TestCompiledClassifier:
+    """Tests para CompiledClassifier."""
+
+    def test_matches_eager_model(self, hf_pipeline, tmp_path):
+        """El grafo compilado tiene que dar los mismos logits que el modelo eager."""
+        compiled = CompiledClassifier(
+            hf_pipeline.model, hf_pipeline.tokenizer, [16], str(tmp_path), "test"
+        )
+        texts = ["I love this product!", "This is the worst thing ever."]
+
+        assert torch.allclose(compiled.logits(texts), _eager_logits(hf_pipeline, texts), atol=1e-4)
+
+    def test_long_text_falls_back_to_eager(self, hf_pipeline, tmp_path):
+        """Un texto mas largo que el bucket mayor se corre en eager y da el mismo resultado."""
+        compiled = CompiledClassifier(
+            hf_pipeline.model, hf_pipeline.tokenizer, [16], str(tmp_path), "test"
+        )
+        texts = ["great " * 40]
+
+        assert torch.allclose(compiled.logits(texts), _eager_logits(hf_pipeline, texts), atol=1e-4)
+
+    def test_artifacts_are_cached_on_disk(self, hf_pipeline, tmp_path):
+        """El grafo se guarda en el cache y el segundo arranque lo reutiliza."""
+        CompiledClassifier(hf_pipeline.model, hf_pipeline.tokenizer, [16], str(tmp_path), "test")
+        artifacts = os.listdir(tmp_path / "compiled")
+        assert len(artifacts) == 1
+
+        mtime = os.path.getmtime(tmp_path / "compiled" / artifacts[0])
+        second = CompiledClassifier(
+            hf_pipeline.model, hf_pipeline.tokenizer, [16], str(tmp_path), "test"
+        )
+        assert 16 in second._graphs
+        assert os.path.getmtime(tmp_path / "compiled" / artifacts[0]) == mtime
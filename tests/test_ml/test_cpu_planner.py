@@ -0,0 +1,145 @@
+"""Tests para el planificador de CPU (workers × threads de torch × batches en vuelo)."""
+
+import asyncio
+
+import anyio.to_thread
+import pytest
+import torch
+
+from app.ml import InferenceBatcher, cpu_planner
+from app.ml.stages import STAGES
+
+
+class TestAvailableCpus:
+    """Tests para la lectura de la cuota del cgroup."""
+
+    def test_cgroup_v2_quota(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("250000 100000\n")
+        assert cpu_planner.cgroup_cpu_quota(str(tmp_path)) == 2.5
+
+    def test_cgroup_v2_without_limit(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        assert cpu_planner.cgroup_cpu_quota(str(tmp_path)) is None
+
+    def test_cgroup_v1_quota(self, tmp_path):
+        (tmp_path / "cpu,cpuacct").mkdir()
+        (tmp_path / "cpu,cpuacct" / "cpu.cfs_quota_us").write_text("150000\n")
+        (tmp_path / "cpu,cpuacct" / "cpu.cfs_period_us").write_text("100000\n")
+        assert cpu_planner.cgroup_cpu_quota(str(tmp_path)) == 1.5
+
+    def test_quota_caps_affinity(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cpu_planner.os, "sched_getaffinity", lambda _: set(range(32)))
+        (tmp_path / "cpu.max").write_text("250000 100000\n")
+
+        assert cpu_planner.available_cpus(str(tmp_path)) == (2, 32, 2.5)
+
+    def test_no_cgroup_uses_affinity(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cpu_planner.os, "sched_getaffinity", lambda _: {0, 1, 2})
+        assert cpu_planner.available_cpus(str(tmp_path)) == (3, 3, None)
+
+
+class TestMakePlan:
+    """Tests para el plan heuristico."""
+
+    def test_latency_profile_uses_few_wide_workers(self):
+        plan = cpu_planner.make_plan(16, "latency")
+        assert (plan.workers, plan.torch_threads) == (4, 4)
+        assert plan.inference_concurrency == len(STAGES)
+
+    def test_throughput_profile_uses_one_worker_per_core(self):
+        plan = cpu_planner.make_plan(8, "throughput")
+        assert (plan.workers, plan.torch_threads) == (8, 1)
+        assert plan.inference_concurrency > len(STAGES)
+
+    def test_fixed_workers_split_the_cores(self):
+        plan = cpu_planner.make_plan(8, "throughput", workers=2)
+        assert (plan.workers, plan.torch_threads, plan.source) == (2, 4, "manual")
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError):
+            cpu_planner.make_plan(4, "fastest")
+
+
+class TestStandaloneWorkers:
+    """Tests para la cantidad de workers con uvicorn suelto (sin python -m app.serve)."""
+
+    def test_single_process_by_default(self, monkeypatch):
+        monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+        assert cpu_planner.standalone_workers(["uvicorn", "app.main:app"]) == 1
+
+    def test_reads_web_concurrency(self, monkeypatch):
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        assert cpu_planner.standalone_workers(["uvicorn", "app.main:app"]) == 4
+
+    def test_command_line_wins_over_the_environment(self, monkeypatch):
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        assert cpu_planner.standalone_workers(["uvicorn", "app.main:app", "--workers", "3"]) == 3
+        assert cpu_planner.standalone_workers(["uvicorn", "app.main:app", "--workers=2"]) == 2
+
+    def test_unknown_count_in_a_child_process_warns(self, monkeypatch):
+        monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+        monkeypatch.setattr(cpu_planner.multiprocessing, "parent_process", lambda: object())
+        warnings = []
+        monkeypatch.setattr(cpu_planner.logger, "warning", lambda *args: warnings.append(args))
+
+        assert cpu_planner.standalone_workers(["-c"]) == 1
+        assert warnings
+
+
+def test_saved_plan_only_applies_to_same_cpus_profile_and_model(tmp_path):
+    path = tmp_path / "cpu_plan.json"
+    plan = cpu_planner.make_plan(4, "latency", torch_threads=2)
+    cpu_planner.save_plan(plan, path, "modelo-a")
+
+    assert cpu_planner.load_plan(path, 4, "latency", "modelo-a") == plan
+    assert cpu_planner.load_plan(path, 8, "latency", "modelo-a") is None
+    assert cpu_planner.load_plan(path, 4, "throughput", "modelo-a") is None
+    assert cpu_planner.load_plan(path, 4, "latency", "modelo-b") is None
+
+
+def test_calibrate_picks_the_best_measured_option(monkeypatch):
+    class FakeModel:
+        def predict_batch(self, texts):
+            return [{}] * len(texts)
+
+    # 2 threads: el doble de rapido por worker, pero entran la mitad de workers
+    measured = {1: (10.0, 100.0), 2: (6.0, 150.0), 4: (5.8, 180.0)}
+
+    def fake_measure(model, threads, rounds):
+        latency, per_worker = measured[threads]
+        return {
+            "torch_threads": threads,
+            "latency_ms": latency,
+            "texts_per_s_per_worker": per_worker,
+        }
+
+    monkeypatch.setattr(cpu_planner, "_measure", fake_measure)
+    threads = torch.get_num_threads()
+    try:
+        latency = cpu_planner.calibrate(FakeModel(), 4, "latency")
+        throughput = cpu_planner.calibrate(FakeModel(), 4, "throughput")
+    finally:
+        torch.set_num_threads(threads)
+
+    # Latencia: 2 y 4 threads estan dentro del 5%; 2 threads rinde mas en total (2 workers)
+    assert (latency.torch_threads, latency.workers, latency.source) == (2, 2, "calibrated")
+    assert len(latency.measurements) == 3
+    # Throughput: 4 workers × 100 textos/s le gana a 2 × 150 y a 1 × 180
+    assert (throughput.torch_threads, throughput.workers) == (1, 4)
+
+
+def test_apply_plan():
+    batcher = InferenceBatcher()
+    plan = cpu_planner.make_plan(2, "latency")
+    threads = torch.get_num_threads()
+
+    async def apply():
+        cpu_planner.apply_plan(plan, batcher)
+        return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+    try:
+        assert asyncio.run(apply()) == plan.threadpool_size
+        assert torch.get_num_threads() == plan.torch_threads
+    finally:
+        torch.set_num_threads(threads)
+    assert batcher.max_inflight == len(STAGES)
@@ -0,0 +1,132 @@
+"""Tests para el early exit (clasificadores en capas intermedias)."""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.ml import early_exit
+from app.ml.model import SentimentModel
+
+_WORDS = "good bad great awful love hate fine movie product service terrible amazing".split()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(0)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(2, 15))) for _ in range(200)]
+
+
+@pytest.fixture(scope="module")
+def calibrated(load_model, corpus):
+    return early_exit.calibrate_heads(load_model.pipeline, corpus, epochs=100)
+
+
+def _encode(pipe, texts):
+    return pipe.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+
+
+class TestCalibration:
+    """Tests para la calibracion contra el modelo completo."""
+
+    def test_one_head_per_intermediate_layer(self, load_model, calibrated):
+        heads, report = calibrated
+        num_layers = len(load_model.pipeline.model.distilbert.transformer.layer)
+        assert heads.layers == list(range(1, num_layers))
+        assert set(report["layer_agreement"]) == {str(d) for d in heads.layers}
+
+    def test_report_covers_every_threshold(self, calibrated):
+        _, report = calibrated
+        for threshold in early_exit.REPORT_THRESHOLDS:
+            cascade = report["thresholds"][str(threshold)]
+            assert sum(cascade["exits"].values()) == report["validation_texts"]
+            assert 0.0 <= cascade["agreement"] <= 1.0
+
+    def test_rejects_the_last_layer(self, load_model, corpus):
+        num_layers = len(load_model.pipeline.model.distilbert.transformer.layer)
+        with pytest.raises(ValueError):
+            early_exit.calibrate_heads(load_model.pipeline, corpus, layers=[num_layers])
+
+    def test_save_and_load(self, load_model, calibrated, tmp_path):
+        heads, report = calibrated
+        path = str(tmp_path / "heads.pt")
+        early_exit.save_heads(heads, path, load_model.model_name, report)
+
+        loaded = early_exit.load_heads(path, load_model.pipeline.model)
+        assert loaded is not None and loaded.layers == heads.layers
+        assert (
+            early_exit.load_heads(str(tmp_path / "missing.pt"), load_model.pipeline.model) is None
+        )
+
+
+class TestRunner:
+    """Tests para el forward pass con salida temprana."""
+
+    def test_unreachable_threshold_matches_the_full_model(self, load_model, calibrated, corpus):
+        pipe = load_model.pipeline
+        encoded = _encode(pipe, corpus[:40])
+        expected = pipe.model(**encoded).logits.detach().numpy()
+
+        runner = early_exit.EarlyExitRunner(pipe.model, calibrated[0], threshold=1.01)
+        logits, exits = runner.forward(encoded)
+
+        np.testing.assert_allclose(logits, expected, atol=1e-5)
+        assert set(exits.tolist()) == {runner.num_layers}
+
+    def test_rows_exit_early_and_keep_their_order(self, load_model, calibrated, corpus):
+        pipe = load_model.pipeline
+        texts = corpus[:40]
+        runner = early_exit.EarlyExitRunner(pipe.model, calibrated[0], threshold=0.5)
+
+        logits, exits = runner.forward(_encode(pipe, texts))
+
+        # Con umbral 0.5 (dos clases) todas salen en la primera capa con clasificador
+        assert set(exits.tolist()) == {1}
+        # Cada fila da lo mismo que corrida sola: las filas retiradas no se mezclan
+        for i in (0, 7, 39):
+            alone, layer = runner.forward(_encode(pipe, [texts[i]]))
+            np.testing.assert_allclose(logits[i], alone[0], atol=1e-5)
+            assert layer[0] == exits[i]
+
+    def test_mixed_exits_match_rows_run_alone(self, load_model, calibrated, corpus):
+        pipe = load_model.pipeline
+        texts = corpus[:40]
+        runner = early_exit.EarlyExitRunner(pipe.model, calibrated[0], threshold=0.97)
+
+        logits, exits = runner.forward(_encode(pipe, texts))
+
+        assert len(set(exits.tolist())) > 1  # salen en capas distintas
+        for i in range(len(texts)):
+            alone, layer = runner.forward(_encode(pipe, [texts[i]]))
+            np.testing.assert_allclose(logits[i], alone[0], atol=1e-4)
+            assert layer[0] == exits[i]
+
+
+class TestModelIntegration:
+    """Tests para el early exit dentro de SentimentModel."""
+
+    def test_predictions_report_the_exit_layer(self, load_model, calibrated, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "EARLY_EXIT_THRESHOLD", 0.5)
+        heads, report = calibrated
+        early_exit.save_heads(
+            heads, early_exit.heads_path(load_model.model_name), load_model.model_name, report
+        )
+
+        loaded = load_model._build(load_model.model_name, "default")
+        assert loaded.early_exit is not None
+        assert loaded.version.endswith("+early-exit@0.5")
+
+        logits, exits = loaded.forward_with_exits(loaded.encode(["I love it", "Awful"]))
+        predictions = SentimentModel._format_predictions(logits, loaded, 1.0, exits)
+        assert [p["exit_layer"] for p in predictions] == [1, 1]
+
+    def test_without_heads_uses_every_layer(self, load_model, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "EARLY_EXIT_THRESHOLD", 0.9)
+
+        loaded = load_model._build(load_model.model_name, "default")
+
+        assert loaded.early_exit is None
+        assert load_model.predict("I love it")["exit_layer"] is None
@@ -0,0 +1,69 @@
+"""Tests para la poda de cabezas de atencion."""
+
+import random
+
+import pytest
+
+from app.config import settings
+from app.ml import head_pruning
+from app.ml.model import SentimentModel
+
+_WORDS = "good bad great awful love hate fine movie product service terrible amazing".split()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(0)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(2, 15))) for _ in range(200)]
+
+
+@pytest.fixture(scope="module")
+def pruned(load_model, corpus):
+    return head_pruning.prune_model(load_model.model_name, corpus, agreement_floor=0.9)
+
+
+class TestPruneModel:
+    """Tests para la eleccion y la poda de cabezas."""
+
+    def test_prunes_heads_above_the_agreement_floor(self, pruned):
+        model, _, report = pruned
+
+        assert report["heads_kept"] < report["heads_total"]
+        assert report["agreement"] >= 0.9
+        kept = sum(layer.attention.n_heads for layer in model.distilbert.transformer.layer)
+        assert kept == report["heads_kept"]
+        assert report["speedup"] > 0
+
+    def test_every_layer_keeps_a_head(self, pruned):
+        model, _, _ = pruned
+        assert all(layer.attention.n_heads >= 1 for layer in model.distilbert.transformer.layer)
+
+    def test_unreachable_floor_prunes_nothing(self, load_model, corpus):
+        _, _, report = head_pruning.prune_model(
+            load_model.model_name, corpus[:60], agreement_floor=1.01
+        )
+        assert report["heads_kept"] == report["heads_total"]
+
+
+class TestSavedModel:
+    """Tests para servir el modelo podado."""
+
+    def test_loads_through_sentiment_model(self, pruned, corpus, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(head_pruning, "_pruned_models", [])
+        path = head_pruning.save_pruned(*pruned)
+
+        model = SentimentModel(path)
+        model.load()
+        layers = model.pipeline.model.distilbert.transformer.layer
+        assert sum(layer.attention.n_heads for layer in layers) == pruned[2]["heads_kept"]
+        assert model.predict("I love it")["model_version"] == path
+
+        listed = head_pruning.list_pruned_models()  # save_pruned refresca la lista
+        assert [m["path"] for m in listed] == [path]
+        assert listed[0]["speedup"] == pruned[2]["speedup"]
+
+    def test_no_pruned_models(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(head_pruning, "_pruned_models", [])
+        assert head_pruning.refresh_pruned_models() == []
@@ -3,8 +3,14 @@ Tests para el pipeline de ML.
 Prueba las 3 capas: TextPreprocessor (limpieza), SentimentModel (prediccion), SentimentPipeline (flujo completo).
 """
 
+import os
+
+import pytest
+
 # Importa los 3 componentes internos del modulo ml para testearlos directamente
+from app.config import settings
 from app.ml import TextPreprocessor, sentiment_model, sentiment_pipeline
+from app.ml.model import SentimentModel
 from app.schemas import SentimentRequest
 
 
@@ -109,6 +115,50 @@ class TestSentimentModel:
         # .value accede al string del Enum: SentimentLabel.POSITIVE.value == "positive"
         assert result["sentiment"].value == "positive"
 
+    def test_memory_is_measured_once_at_load(self, load_model, monkeypatch):
+        """memory_bytes() devuelve lo medido al cargar: no vuelve a recorrer los pesos."""
+        model = sentiment_model._loaded.pipeline.model
+        expected = sum(p.numel() * p.element_size() for p in model.parameters())
+        monkeypatch.setattr(type(model), "parameters", lambda self: pytest.fail("recorrio"))
+
+        assert sentiment_model.memory_bytes() >= expected > 0
+
+    def test_swap_drain_timeout_does_not_break_inflight_predictions(self, load_model):
+        """Si el drain no llega a esperar a una prediccion en curso, esa prediccion termina igual."""
+        # Otra instancia (no el singleton): la barra final es el mismo modelo con otro nombre
+        model = SentimentModel(os.path.join(load_model.model_name, ""))
+        model.load()
+        batch = model.encode(["I love this product!"])  # en vuelo durante el swap
+
+        model.swap(model.model_name, drain_timeout=0.01)
+
+        model.forward(batch)
+        prediction = model.postprocess(batch)[0]
+        batch.release()
+        assert prediction["sentiment"].value == "positive"
+
+    def test_singleton_follows_the_swapped_default(self, monkeypatch):
+        """Despues de un hot swap, el nombre viejo ya no devuelve el singleton (sirve otro modelo)."""
+        monkeypatch.setattr(sentiment_model, "_name", "otro-modelo")  # como tras un swap
+
+        assert SentimentModel("otro-modelo") is sentiment_model
+        assert SentimentModel(settings.MODEL_NAME) is not sentiment_model
+        assert SentimentModel() is sentiment_model
+
+    def test_predict_batch_matches_huggingface_postprocessing(self, load_model):
+        """El postprocesamiento vectorizado debe dar lo mismo que el Pipeline de HuggingFace."""
+        texts = ["I love this product!", "This is the worst thing ever.", "It arrived."]
+        results = sentiment_model.predict_batch(texts)
+        expected = sentiment_model._loaded.pipeline(texts, top_k=None)
+
+        for result, exp in zip(results, expected):
+            # Scores ordenados de mayor a menor y el primero es el sentimiento ganador
+            assert result["scores"][0]["label"] == result["sentiment"]
+            assert result["confidence"] == pytest.approx(exp[0]["score"], abs=1e-5)
+            assert [s["score"] for s in result["scores"]] == pytest.approx(
+                [s["score"] for s in exp], abs=1e-5
+            )
+
 
 # ============================================================
 # Tests para SentimentPipeline (flujo completo: limpieza + prediccion + respuesta)
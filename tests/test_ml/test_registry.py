@@ -0,0 +1,82 @@
+"""Tests para el registro de modelos (ruteo por idioma y desalojo LRU)."""
+
+import pytest
+
+from app.core import UnknownModelError
+from app.ml.registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    """Modelo falso: "pesa" 100 MB una vez cargado y no hace inferencia real."""
+
+    def __init__(self, name: str):
+        self.model_name = name
+        self.is_loaded = False
+
+    def load(self):
+        self.is_loaded = True
+
+    def unload(self):
+        self.is_loaded = False
+
+    def memory_bytes(self) -> int:
+        return 100 * MB if self.is_loaded else 0
+
+
+@pytest.fixture
+def registry():
+    default = FakeModel("default-en")
+    default.load()
+    return ModelRegistry(
+        default_model=default,
+        language_map={"es": "model-es", "fr": "model-fr"},
+        budget_mb=250,
+        model_factory=FakeModel,
+    )
+
+
+class TestModelRegistry:
+    """Tests para ModelRegistry."""
+
+    def test_resolve_by_language(self, registry):
+        """Cada idioma va a su modelo; "es-AR" cae en "es"; los demas al default."""
+        assert registry.resolve("es") == "model-es"
+        assert registry.resolve("es-AR") == "model-es"
+        assert registry.resolve("de") == "default-en"
+
+    def test_explicit_model_wins(self, registry):
+        """Un modelo pedido explicitamente gana sobre el idioma."""
+        assert registry.resolve("es", model="model-fr") == "model-fr"
+
+    def test_unknown_model_raises(self, registry):
+        """Pedir un modelo no habilitado es un error."""
+        with pytest.raises(UnknownModelError):
+            registry.resolve(model="no-existe")
+
+    def test_loads_lazily(self, registry):
+        """Los modelos secundarios se cargan recien al primer uso."""
+        status = {m["model"]: m for m in registry.status()}
+        assert not status["model-es"]["loaded"]
+
+        with registry.use("model-es") as model:
+            assert model.is_loaded
+
+    def test_evicts_least_recently_used(self, registry):
+        """Al pasar el presupuesto se desaloja el menos usado, nunca el default."""
+        registry.get("model-es")
+        registry.get("model-fr")  # default + es + fr = 300 MB > 250 MB
+
+        status = {m["model"]: m for m in registry.status()}
+        assert status["default-en"]["loaded"]
+        assert not status["model-es"]["loaded"]
+        assert status["model-fr"]["loaded"]
+        assert [e["event"] for e in registry.events()] == ["load", "load", "evict"]
+
+    def test_model_in_use_is_not_evicted(self, registry):
+        """Un modelo prestado con use() no se desaloja aunque sea el menos usado."""
+        with registry.use("model-es"):
+            registry.get("model-fr")
+            status = {m["model"]: m for m in registry.status()}
+            assert status["model-es"]["loaded"]
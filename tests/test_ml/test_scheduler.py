@@ -0,0 +1,67 @@
+"""Tests para el reparto justo de la cola de inferencia (FairScheduler)."""
+
+from app.ml.scheduler import FairScheduler, estimate_tokens
+
+
+def _drain(scheduler: FairScheduler) -> list:
+    return [scheduler.pop() for _ in range(len(scheduler))]
+
+
+def test_interactive_text_is_not_stuck_behind_bulk_client():
+    """Un texto interactivo que llega despues de 100 textos bulk sale casi primero."""
+    scheduler = FairScheduler(weights={}, default_weight=1.0)
+    for i in range(100):
+        scheduler.push(f"bulk-{i}", "bulk", cost=20)
+    scheduler.push("interactive", "frontend", cost=20)
+
+    order = _drain(scheduler)
+    assert order.index("interactive") <= 1
+
+
+def test_short_texts_go_before_long_documents():
+    scheduler = FairScheduler(weights={}, default_weight=1.0)
+    scheduler.push("long-doc", "reports", cost=500)
+    scheduler.push("short", "chat", cost=10)
+
+    assert _drain(scheduler) == ["short", "long-doc"]
+
+
+def test_weights_split_tokens_proportionally():
+    """Con los dos clientes siempre en cola, el de peso 3 recibe ~3 veces mas tokens."""
+    scheduler = FairScheduler(weights={"gold": 3.0}, default_weight=1.0)
+    for i in range(400):
+        scheduler.push("gold", "gold", cost=10)
+        scheduler.push("basic", "basic", cost=10)
+
+    first = [scheduler.pop() for _ in range(200)]
+    assert first.count("gold") == 150
+    assert first.count("basic") == 50
+
+
+def test_idle_client_does_not_accumulate_credit():
+    """Un cliente que estuvo inactivo arranca desde el tiempo virtual actual, no desde cero."""
+    scheduler = FairScheduler(weights={}, default_weight=1.0)
+    for _ in range(50):
+        scheduler.push("a", "a", cost=10)
+    for _ in range(40):
+        scheduler.pop()
+
+    for _ in range(20):
+        scheduler.push("b", "b", cost=10)
+    order = _drain(scheduler)
+    # Se alternan: "b" no acapara la cola por haber estado inactivo
+    assert order[:4].count("b") == 2
+
+
+def test_stats_per_client():
+    scheduler = FairScheduler(weights={"frontend": 2.0}, default_weight=1.0)
+    scheduler.push("x", "frontend", cost=estimate_tokens("hello world"))
+    scheduler.push("y", "bulk", cost=7)
+    scheduler.pop()
+
+    stats = scheduler.stats()
+    assert stats["frontend"]["weight"] == 2.0
+    assert stats["frontend"]["served_texts"] == 1
+    assert stats["frontend"]["served_tokens"] == estimate_tokens("hello world")
+    assert stats["bulk"]["queued"] == 1
+    assert stats["frontend"]["queue_wait"]["samples"] == 1
@@ -0,0 +1,71 @@
+"""Tests para la inferencia por etapas solapadas (StagedInference)."""
+
+import threading
+
+import pytest
+
+from app.core import PredictionError
+from app.ml.stages import StagedInference
+
+
+def test_staged_run_matches_single_forward_pass(load_model):
+    texts = [f"Review {i}: {'great' if i % 2 else 'awful'} product" for i in range(40)]
+    stages = StagedInference(queue_size=1)
+
+    staged = stages.run(load_model, texts, batch_size=8)
+    direct = load_model.predict_batch(texts)
+
+    assert [p["sentiment"] for p in staged] == [p["sentiment"] for p in direct]
+    for a, b in zip(staged, direct):
+        assert a["confidence"] == pytest.approx(b["confidence"], abs=1e-4)
+
+    stats = stages.stats()
+    assert stats["tokenize"]["batches"] == 5
+    assert stats["forward"]["texts"] == 40
+
+
+def test_stages_overlap(load_model):
+    """El batch N+1 se tokeniza mientras el batch N todavia esta en el forward."""
+    forward_started = threading.Event()
+    release_forward = threading.Event()
+    tokenized = []
+
+    class SlowForward:
+        def encode(self, texts):
+            tokenized.append(texts[0])
+            return load_model.encode(texts)
+
+        def forward(self, batch):
+            forward_started.set()
+            release_forward.wait(5)
+            load_model.forward(batch)
+
+        def postprocess(self, batch):
+            return load_model.postprocess(batch)
+
+    model = SlowForward()
+    stages = StagedInference(queue_size=2)
+    first = stages.submit(["first"], lambda _: model)
+    second = stages.submit(["second"], lambda _: model)
+
+    assert forward_started.wait(5)
+    # El primero esta trabado en el forward y el segundo ya se tokenizo
+    for _ in range(100):
+        if len(tokenized) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert tokenized == ["first", "second"]
+
+    release_forward.set()
+    assert len(first.result(5)) == 1 and len(second.result(5)) == 1
+
+
+def test_errors_are_reported_and_the_model_released(load_model):
+    def broken_model(_):
+        raise PredictionError("boom")
+
+    stages = StagedInference()
+    with pytest.raises(PredictionError):
+        stages.submit(["text"], broken_model).result(5)
+    # Las etapas siguen andando despues de un error
+    assert len(stages.run(load_model, ["still works"], batch_size=4)) == 1
@@ -0,0 +1,76 @@
+"""Tests para la poda del vocabulario."""
+
+import random
+
+import pytest
+
+from app.config import settings
+from app.ml import vocab_pruning
+from app.ml.model import SentimentModel
+
+_WORDS = "good bad great awful love hate fine movie product service terrible amazing".split()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(0)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(2, 15))) for _ in range(200)]
+
+
+@pytest.fixture(scope="module")
+def pruned(load_model, corpus):
+    return vocab_pruning.prune_vocabulary(load_model.model_name, corpus)
+
+
+class TestPruneVocabulary:
+    """Tests para el vocabulario y los embeddings reducidos."""
+
+    def test_vocabulary_and_embeddings_shrink_together(self, pruned):
+        model, tokenizer, report = pruned
+
+        assert report["vocab_kept"] < report["vocab_full"]
+        assert len(tokenizer) == report["vocab_kept"]
+        assert model.get_input_embeddings().weight.shape[0] == report["vocab_kept"]
+        assert report["memory_saved_bytes"] > 0
+
+    def test_corpus_tokens_keep_their_embeddings(self, load_model, pruned):
+        model, tokenizer, _ = pruned
+        full_tokenizer = load_model.pipeline.tokenizer
+        full_embeddings = load_model.pipeline.model.get_input_embeddings().weight
+
+        for token in full_tokenizer.tokenize("great movie"):
+            new_id = tokenizer.convert_tokens_to_ids(token)
+            old_id = full_tokenizer.convert_tokens_to_ids(token)
+            assert (model.get_input_embeddings().weight[new_id] == full_embeddings[old_id]).all()
+
+    def test_unseen_words_fall_back_to_subwords(self, pruned):
+        _, tokenizer, _ = pruned
+        tokens = tokenizer.tokenize("zebra")
+        assert tokenizer.unk_token not in tokens
+        assert "".join(t.removeprefix("##") for t in tokens) == "zebra"
+
+    def test_agrees_with_the_full_model_on_held_out_text(self, pruned):
+        _, _, report = pruned
+        assert report["agreement"] >= 0.95
+        assert report["validation_texts"] == 40
+
+    def test_max_vocab_caps_corpus_tokens(self, load_model, corpus):
+        tokenizer = load_model.pipeline.tokenizer
+        counts = vocab_pruning.token_frequencies(tokenizer, corpus)
+
+        capped = vocab_pruning.select_tokens(tokenizer, counts, max_vocab=1)
+
+        assert set(tokenizer.all_special_ids) <= set(capped)
+        assert len(capped) < len(vocab_pruning.select_tokens(tokenizer, counts))
+
+
+def test_saved_model_loads_through_sentiment_model(pruned, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_CACHE_DIR", str(tmp_path))
+    path = vocab_pruning.save_pruned(*pruned)
+
+    model = SentimentModel(path)
+    model.load()
+
+    assert len(model.pipeline.tokenizer) == pruned[2]["vocab_kept"]
+    assert model.predict("great movie")["model_version"] == path
+    assert "pruned" in pruned[2]["load_s"]
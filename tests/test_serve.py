@@ -0,0 +1,92 @@
+"""Tests para el lanzador pre-fork (python -m app.serve)."""
+
+import os
+import signal
+import time
+
+from app import serve
+
+
+def _fork_exiting_child(code: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        os._exit(code)
+    return pid
+
+
+class TestSupervisor:
+    """Tests para la supervision de workers (sin levantar uvicorn)."""
+
+    def _supervisor(self, monkeypatch):
+        supervisor = serve.Supervisor(app=None, sock=None, workers=1, torch_threads=1)
+        spawned = []
+        monkeypatch.setattr(supervisor, "_spawn", lambda: spawned.append(True))
+        return supervisor, spawned
+
+    def _wait_reaped(self, supervisor, pid):
+        deadline = time.monotonic() + 5
+        while pid in supervisor._children and time.monotonic() < deadline:
+            supervisor._reap()
+            time.sleep(0.01)
+
+    def test_dead_worker_is_replaced(self, monkeypatch):
+        supervisor, spawned = self._supervisor(monkeypatch)
+        pid = _fork_exiting_child(1)
+        supervisor._children[pid] = time.monotonic() - 60  # vivio bastante: sin espera
+
+        self._wait_reaped(supervisor, pid)
+
+        assert pid not in supervisor._children
+        assert spawned == [True]
+        assert supervisor._crashes == 0
+
+    def test_worker_dying_on_startup_counts_as_crash(self, monkeypatch):
+        supervisor, spawned = self._supervisor(monkeypatch)
+        sleeps = []
+        monkeypatch.setattr(serve.time, "sleep", sleeps.append)
+        pid = _fork_exiting_child(1)
+        supervisor._children[pid] = time.monotonic()
+
+        deadline = time.monotonic() + 5
+        while pid in supervisor._children and time.monotonic() < deadline:
+            supervisor._reap()
+
+        assert spawned == [True]
+        assert supervisor._crashes == 1
+        assert sleeps == [1]
+
+    def test_no_replacement_while_stopping(self, monkeypatch):
+        supervisor, spawned = self._supervisor(monkeypatch)
+        supervisor._stopping = True
+        pid = _fork_exiting_child(0)
+        supervisor._children[pid] = time.monotonic() - 60
+
+        self._wait_reaped(supervisor, pid)
+
+        assert pid not in supervisor._children
+        assert spawned == []
+
+    def test_shutdown_tolerates_a_worker_exiting_before_sigkill(self, monkeypatch):
+        """Un worker que termina entre el ultimo _reap y el SIGKILL no rompe el apagado."""
+
+        class Sock:
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        sent = []
+
+        def kill(pid, sig):
+            sent.append(sig)
+            if sig == signal.SIGKILL:
+                raise ProcessLookupError
+
+        supervisor = serve.Supervisor(app=None, sock=Sock(), workers=1, torch_threads=1)
+        supervisor._children[2**22 + 1] = time.monotonic()  # pid que no es hijo de este proceso
+        monkeypatch.setattr(serve.os, "kill", kill)
+
+        supervisor.shutdown(timeout=0)
+
+        assert sent == [signal.SIGTERM, signal.SIGKILL]
+        assert supervisor.sock.closed
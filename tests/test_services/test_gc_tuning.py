@@ -0,0 +1,47 @@
+"""Tests para el ajuste del GC y la medicion de sus pausas."""
+
+import gc
+
+import pytest
+
+from app.services.gc_tuning import GcMonitor, tune_gc
+
+
+@pytest.fixture
+def restore_gc():
+    thresholds = gc.get_threshold()
+    yield
+    gc.set_threshold(*thresholds)
+    gc.unfreeze()
+
+
+def test_tune_gc_applies_thresholds_and_freezes(restore_gc):
+    applied = tune_gc(thresholds=[5000, 15, 20], freeze=True)
+
+    assert gc.get_threshold() == (5000, 15, 20)
+    assert applied["thresholds"] == [5000, 15, 20]
+    assert applied["frozen_objects"] > 0
+
+
+def test_tune_gc_without_thresholds_keeps_the_defaults(restore_gc):
+    before = gc.get_threshold()
+    tune_gc(thresholds=[], freeze=False)
+    assert gc.get_threshold() == before
+
+
+def test_monitor_counts_pauses_per_generation():
+    monitor = GcMonitor(window_s=60)
+    monitor.start()
+    try:
+        gc.collect(0)
+        gc.collect(2)
+    finally:
+        monitor.stop()
+    gc.collect(2)  # ya sin el callback: no cuenta
+
+    stats = monitor.stats()["generations"]
+    assert stats["0"]["collections"] >= 1
+    assert stats["2"]["collections"] == 1
+    assert stats["2"]["recent"]["samples"] == 1
+    assert stats["2"]["max_ms"] >= 0
+    assert monitor._callback not in gc.callbacks
@@ -0,0 +1,33 @@
+"""Tests para las ventanas de latencia (p50/p99)."""
+
+import time
+
+from app.services.latency import RollingLatency
+
+
+class TestRollingLatency:
+    """Tests para RollingLatency."""
+
+    def test_percentiles(self):
+        window = RollingLatency(window_s=60)
+        for ms in range(1, 101):
+            window.record(float(ms))
+
+        snapshot = window.snapshot()
+        assert snapshot["samples"] == 100
+        assert snapshot["p50_ms"] == 50.5
+        assert 99 <= snapshot["p99_ms"] <= 100
+        assert snapshot["max_ms"] == 100
+
+    def test_old_samples_leave_the_window(self):
+        window = RollingLatency(window_s=0.05)
+        window.record(10.0)
+        time.sleep(0.1)
+        window.record(20.0)
+
+        snapshot = window.snapshot()
+        assert snapshot["samples"] == 1
+        assert snapshot["p50_ms"] == 20.0
+
+    def test_empty_window(self):
+        assert RollingLatency(window_s=60).snapshot()["p50_ms"] is None
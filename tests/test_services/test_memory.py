@@ -0,0 +1,71 @@
+"""Tests para la instrumentacion de memoria y la guardia de presupuesto."""
+
+import asyncio
+
+from app.services.memory import MemoryGuard, MemoryMiddleware, process_rss_bytes
+
+MB = 1024 * 1024
+
+
+class TestMemoryGuard:
+    """Tests para MemoryGuard."""
+
+    def test_pressure_levels_and_hysteresis(self):
+        guard = MemoryGuard(budget_mb=100)
+
+        assert guard.check(rss=50 * MB) == "ok"
+        assert guard.check(rss=90 * MB) == "high"
+        assert guard.check(rss=97 * MB) == "critical"
+        # Bajando, no vuelve a "ok" hasta pasar por debajo del umbral de recuperacion
+        assert guard.check(rss=80 * MB) == "high"
+        assert guard.check(rss=70 * MB) == "ok"
+
+    def test_protective_actions(self):
+        guard = MemoryGuard(budget_mb=100)
+        shrunk = []
+        guard.register_shrinker("cache", lambda: shrunk.append(True))
+
+        guard.check(rss=90 * MB)
+        assert guard.batch_size_limit(32) == 16
+        assert not guard.shed_bulk
+        assert shrunk == [True]  # al subir de nivel se liberan caches
+
+        guard.check(rss=90 * MB)
+        assert shrunk == [True]  # mismo nivel: no se repite
+
+        guard.check(rss=99 * MB)
+        assert guard.batch_size_limit(32) == 8
+        assert guard.shed_bulk
+        assert shrunk == [True, True]
+
+    def test_disabled_without_budget(self):
+        guard = MemoryGuard(budget_mb=0)
+        assert guard.check(rss=10_000 * MB) == "ok"
+        assert guard.batch_size_limit(32) == 32
+
+    def test_top_requests_ranked_by_growth(self):
+        guard = MemoryGuard(budget_mb=0)
+        guard.record_request("/a", 100 * MB, 101 * MB, 5.0)
+        guard.record_request("/b", 100 * MB, 150 * MB, 5.0)
+        guard.record_request("/c", 100 * MB, 110 * MB, 5.0)
+
+        assert [r["path"] for r in guard.top_requests(2)] == ["/b", "/c"]
+
+    def test_middleware_records_http_requests(self):
+        guard = MemoryGuard(budget_mb=0)
+
+        async def app(scope, receive, send):
+            pass
+
+        middleware = MemoryMiddleware(app, guard)
+        asyncio.run(middleware({"type": "http", "path": "/a"}, None, None))
+        asyncio.run(middleware({"type": "websocket", "path": "/ws"}, None, None))
+
+        if process_rss_bytes() is not None:
+            assert [r["path"] for r in guard.top_requests()] == ["/a"]
+
+    def test_status_reports_rss(self):
+        status = MemoryGuard(budget_mb=0).status()
+        assert status["peak_rss_mb"] > 0
+        if process_rss_bytes() is not None:
+            assert status["rss_mb"] > 0
@@ -0,0 +1,59 @@
+"""Tests para el indice de casi-duplicados (MinHash + LSH)."""
+
+from app.ml import SentimentPipeline
+from app.schemas import SentimentRequest
+from app.services.near_duplicate import NearDuplicateIndex, minhash, similarity
+
+REVIEW = "The battery life of this phone is amazing and the screen looks great"
+PREDICTION = {"sentiment": "positive", "confidence": 0.9, "scores": [], "processing_time_ms": 1.0}
+
+
+def test_similar_texts_have_similar_signatures():
+    near = minhash(REVIEW + " 😍")
+    other = minhash("Terrible customer support, they never answered my emails at all")
+
+    assert similarity(minhash(REVIEW), near) == 1.0  # el emoji no es una palabra
+    assert similarity(minhash(REVIEW), other) < 0.2
+
+
+def test_short_texts_are_not_indexed():
+    assert minhash("not good") is None
+
+
+def test_reuses_prediction_of_near_duplicate():
+    index = NearDuplicateIndex(max_entries=100, threshold=0.7)
+    index.put_many({REVIEW: PREDICTION}, "v1")
+
+    variant = REVIEW.replace("phone", "tablet")
+    found = index.get_many([variant, "Something completely different was written here"], "v1")
+
+    assert list(found) == [variant]
+    assert found[variant]["near_duplicate"] is True
+    assert 0.7 <= found[variant]["similarity"] < 1.0
+    # Otra version del modelo no reutiliza predicciones viejas
+    assert index.get_many([variant], "v2") == {}
+
+
+def test_index_is_bounded():
+    index = NearDuplicateIndex(max_entries=10, threshold=0.9)
+    texts = [" ".join(f"word{i}x{j}" for j in range(6)) for i in range(50)]
+    for text in texts:
+        index.put_many({text: PREDICTION}, "v1")
+
+    assert len(index) == 10
+    # Las entradas desalojadas tampoco quedan en las bandas
+    assert index.get_many([texts[0]], "v1") == {}
+    assert index.get_many([texts[-1]], "v1")
+
+
+def test_pipeline_marks_reused_results(load_model):
+    pipeline = SentimentPipeline(
+        model=load_model, near_duplicates=NearDuplicateIndex(max_entries=100, threshold=0.7)
+    )
+    first = pipeline.analyze(SentimentRequest(text=REVIEW))
+    second = pipeline.analyze(SentimentRequest(text=REVIEW.replace("phone", "tablet")))
+
+    assert first.near_duplicate is False
+    assert second.near_duplicate is True
+    assert second.sentiment == first.sentiment
+    assert second.similarity is not None
@@ -0,0 +1,140 @@
+"""Tests para el store persistente de predicciones (SQLite)."""
+
+import os
+import sqlite3
+import threading
+
+from app.schemas import SentimentLabel
+from app.services.result_store import ResultStore, text_hash
+
+PREDICTION = {
+    "sentiment": SentimentLabel.POSITIVE,
+    "confidence": 0.9,
+    "scores": [
+        {"label": SentimentLabel.POSITIVE, "score": 0.9},
+        {"label": SentimentLabel.NEGATIVE, "score": 0.1},
+    ],
+    "processing_time_ms": 12.0,
+}
+
+
+class TestResultStore:
+    """Tests para ResultStore."""
+
+    def test_put_and_get_roundtrip(self, tmp_path):
+        """Una prediccion guardada se recupera con los mismos labels y scores."""
+        store = ResultStore(str(tmp_path / "results.sqlite3"), ["model-a"], max_mb=10)
+        store.put("I love this", PREDICTION, "model-a")
+
+        result = store.get("I love this", "model-a")
+
+        assert result is not None
+        assert result["sentiment"] == SentimentLabel.POSITIVE
+        assert result["scores"] == PREDICTION["scores"]
+        assert store.get("otro texto", "model-a") is None
+
+    def test_get_by_hash(self, tmp_path):
+        """El hash del texto alcanza para encontrar la prediccion (sin el texto)."""
+        store = ResultStore(str(tmp_path / "results.sqlite3"), ["model-a"], max_mb=10)
+        store.put("I love this", PREDICTION, "model-a")
+
+        assert store.get_by_hash(text_hash("I love this"), "model-a")["confidence"] == 0.9
+        assert store.get_by_hash(text_hash("I love this"), "model-b") is None
+
+    def test_entries_survive_reopen(self, tmp_path):
+        """Otro proceso/instancia con el mismo modelo ve las entradas guardadas."""
+        path = str(tmp_path / "results.sqlite3")
+        ResultStore(path, ["model-a"], max_mb=10).put("I love this", PREDICTION, "model-a")
+
+        assert ResultStore(path, ["model-a"], max_mb=10).get("I love this", "model-a") is not None
+
+    def test_model_change_invalidates_entries(self, tmp_path):
+        """Si cambia el modelo, las predicciones del anterior ya no se devuelven."""
+        path = str(tmp_path / "results.sqlite3")
+        ResultStore(path, ["model-a"], max_mb=10).put("I love this", PREDICTION, "model-a")
+
+        store_b = ResultStore(path, ["model-b"], max_mb=10)
+
+        assert store_b.get("I love this", "model-b") is None
+        # Y al volver al modelo anterior tampoco estan: fueron borradas
+        assert ResultStore(path, ["model-a"], max_mb=10).get("I love this", "model-a") is None
+
+    def test_models_in_use_are_kept(self, tmp_path):
+        """Las entradas de todos los modelos configurados (ej: por idioma) se conservan."""
+        path = str(tmp_path / "results.sqlite3")
+        ResultStore(path, ["model-a"], max_mb=10).put("hola", PREDICTION, "model-a")
+
+        store = ResultStore(path, ["model-a", "model-es"], max_mb=10)
+
+        assert store.get("hola", "model-a") is not None
+
+    def test_compact_evicts_oldest_entries(self, tmp_path):
+        """Al pasar el limite de tamaño se borran entradas hasta quedar por debajo."""
+        store = ResultStore(str(tmp_path / "results.sqlite3"), ["model-a"], max_mb=0.05)
+        store.put_many({f"viejo {i}": PREDICTION for i in range(500)}, "model-a")
+        store.put_many({f"nuevo {i}": PREDICTION for i in range(10)}, "model-a")
+
+        store.compact()
+
+        assert store.size_bytes() <= store.max_bytes
+        assert store.get("viejo 0", "model-a") is None  # las mas viejas se borran primero
+        assert store.get("nuevo 9", "model-a") is not None
+
+    def test_compact_shrinks_the_file_on_disk(self, tmp_path):
+        path = str(tmp_path / "results.sqlite3")
+        store = ResultStore(path, ["model-a"], max_mb=0.05)
+        store.put_many({f"texto {i}": PREDICTION for i in range(900)}, "model-a")
+        store._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        before = os.path.getsize(path)
+        assert store._connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+        store.compact()
+
+        assert os.path.getsize(path) < before
+        assert os.path.getsize(path) <= store.max_bytes
+
+    def test_compact_shrinks_stores_created_without_auto_vacuum(self, tmp_path):
+        """Un store creado antes de activar auto_vacuum se achica con un VACUUM completo."""
+        path = str(tmp_path / "results.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE legacy (x)")  # la base ya no es nueva: auto_vacuum queda en 0
+        conn.close()
+        store = ResultStore(path, ["model-a"], max_mb=0.05)
+        store.put_many({f"texto {i}": PREDICTION for i in range(900)}, "model-a")
+        store._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        before = os.path.getsize(path)
+
+        store.compact()
+
+        assert os.path.getsize(path) < before
+        assert os.path.getsize(path) <= store.max_bytes
+        assert store._connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def test_write_after_lock_contention_succeeds(self, tmp_path):
+        """Un "database is locked" no deja la conexion trabada dentro de la transaccion."""
+        path = str(tmp_path / "results.sqlite3")
+        store = ResultStore(path, ["model-a"], max_mb=10)
+        store.put("hola", PREDICTION, "model-a")
+        store._connection().execute("PRAGMA busy_timeout = 0")  # falla ya, sin esperar
+
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")  # otro worker tiene el lock de escritura
+        store.put("chau", PREDICTION, "model-a")
+        other.execute("ROLLBACK")
+        other.close()
+
+        assert not store._connection().in_transaction
+        store.put("chau", PREDICTION, "model-a")
+        assert store.get("chau", "model-a") is not None
+
+    def test_background_writes_and_compaction_run_in_the_writer_thread(self, tmp_path):
+        store = ResultStore(str(tmp_path / "results.sqlite3"), ["model-a"], max_mb=10)
+        compacted_in = []
+        store.compact = lambda: compacted_in.append(threading.current_thread().name)
+
+        store.put_many_background({f"texto {i}": PREDICTION for i in range(1000)}, "model-a")
+        assert store.flush()
+
+        assert store.get("texto 999", "model-a") is not None
+        assert compacted_in == ["result-store-writer"]  # nunca en el hilo que pidio guardar
@@ -0,0 +1,74 @@
+"""Tests para el cache de predicciones en memoria compartida."""
+
+import uuid
+
+import pytest
+
+from app.schemas import SentimentLabel
+from app.services.shared_cache import SharedResultCache
+
+PREDICTION = {
+    "sentiment": SentimentLabel.NEGATIVE,
+    "confidence": 0.75,
+    "scores": [
+        {"label": SentimentLabel.NEGATIVE, "score": 0.75},
+        {"label": SentimentLabel.POSITIVE, "score": 0.25},
+    ],
+    "processing_time_ms": 8.0,
+}
+
+
+@pytest.fixture
+def shm_name():
+    """Nombre unico por test; al final borra el bloque de /dev/shm."""
+    name = f"sentiment-test-{uuid.uuid4().hex[:8]}"
+    yield name
+    cache = SharedResultCache(name, slots=1)
+    cache._shm.unlink()
+    cache.close()
+
+
+class TestSharedResultCache:
+    """Tests para SharedResultCache."""
+
+    def test_put_and_get_roundtrip(self, shm_name):
+        """Una prediccion guardada se recupera con el mismo label y scores."""
+        cache = SharedResultCache(shm_name, slots=64)
+        cache.put("I hate this", PREDICTION, "model-a")
+
+        result = cache.get("I hate this", "model-a")
+
+        assert result is not None
+        assert result["sentiment"] == SentimentLabel.NEGATIVE
+        assert result["confidence"] == pytest.approx(0.75)
+        assert [s["label"] for s in result["scores"]] == [
+            SentimentLabel.NEGATIVE,
+            SentimentLabel.POSITIVE,
+        ]
+        assert cache.get("otro texto", "model-a") is None
+
+    def test_second_instance_sees_entries(self, shm_name):
+        """Otra instancia (como otro worker) conectada al mismo bloque ve las entradas."""
+        writer = SharedResultCache(shm_name, slots=64)
+        reader = SharedResultCache(shm_name, slots=999)
+        writer.put("I hate this", PREDICTION, "model-a")
+
+        assert reader.slots == 64  # usa el tamaño del bloque existente
+        assert reader.get("I hate this", "model-a") is not None
+
+    def test_other_model_version_is_a_miss(self, shm_name):
+        """Una entrada de otro modelo no se devuelve."""
+        cache = SharedResultCache(shm_name, slots=64)
+        cache.put("I hate this", PREDICTION, "model-a")
+
+        assert cache.get("I hate this", "model-b") is None
+
+    def test_torn_record_is_a_miss(self, shm_name):
+        """Un registro con checksum invalido (escritura a medias) se trata como miss."""
+        cache = SharedResultCache(shm_name, slots=1)
+        cache.put("I hate this", PREDICTION, "model-a")
+
+        # Corrompe un byte de los scores del unico slot
+        cache._buf[64 + 20] ^= 0xFF
+
+        assert cache.get("I hate this", "model-a") is None